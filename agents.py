@@ -1,21 +1,13 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from crewai import Agent
+import threading
+import functools
 from dotenv import load_dotenv
-import pytz # Added for timestamp helper
-from datetime import datetime # Added for timestamp helper
-# Import tools 
-from tools import (
-    search_tool,
-    pdf_creation_tool,
-    text_to_speech_tool,
-    email_sending_tool,
-    local_save_tool
-)
+
+# Heavy modules (crewai, the LLM client, tools such as Serper/FPDF) are imported
+# only when an agent is actually built, and agents are built on first use, so
+# importing this module is cheap and runs that skip a step never pay for it.
 
 load_dotenv()
-from crewai import Agent, LLM
-from langchain_groq import ChatGroq
 
 
 # api_key = os.getenv("GOOGLE_API_KEY")
@@ -24,28 +16,79 @@ from langchain_groq import ChatGroq
 
 #from langchain_openai import ChatOpenAI 
 #from langchain.chat_models import ChatOpenAI
-
-
-print("Loading environment variables...")
-load_dotenv()
-print("Retrieving API Key...")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not GEMINI_API_KEY:
-    print("\nERROR: GEMINI_API_KEY not found in environment variables.")
-    print("Please ensure you have a .env file with GEMINI_API_KEY=your_key")
-    exit(1)
-else:
-    masked_key = GEMINI_API_KEY[:4] + "****" + GEMINI_API_KEY[-4:]
-    print(f"Found API Key (masked): {masked_key}")
-
-from crewai import Agent, LLM
-print("Initializing LLM...")
-
-llm = LLM(
-    api_key=os.getenv("GEMINI_API_KEY"),
-    model="gemini/gemini-1.5-flash",
-)
+#from langchain_google_genai import ChatGoogleGenerativeAI
+#from langchain_groq import ChatGroq
+
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini/gemini-1.5-flash") # per-agent models: see llm_router.py
+
+@functools.lru_cache(maxsize=None)
+def _check_api_key():
+    # Runs once per process, when the first agent needs an LLM
+    import llm_cache
+    print("Retrieving API Key...")
+    gemini_api_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_api_key and llm_cache.get_cache_mode() == "replay":
+        # Replayed runs answer every prompt from the recorded responses
+        print("No GEMINI_API_KEY set; running in LLM_CACHE=replay mode without LLM access.")
+    elif not gemini_api_key:
+        print("\nERROR: GEMINI_API_KEY not found in environment variables.")
+        print("Please ensure you have a .env file with GEMINI_API_KEY=your_key")
+        exit(1)
+    else:
+        masked_key = gemini_api_key[:4] + "****" + gemini_api_key[-4:]
+        print(f"Found API Key (masked): {masked_key}")
+    return gemini_api_key
+
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """The shared LLM, created (and the API key validated) on first use."""
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            api_key = _check_api_key()
+            from crewai import LLM
+            print("Initializing LLM...")
+            _llm = LLM(
+                api_key=api_key,
+                model=LLM_MODEL,
+            )
+    return _llm
+
+def build_llm(agent_name):
+    """
+    Returns the LLM for one agent: the shared LLM, or a CachedLLM when the
+    response cache (LLM_CACHE) is enabled for this agent, TRACING is on,
+    RATE_LIMIT is on (the default), the agent has its own models (LLM_MODEL_<AGENT>)
+    or it is the Writer with STREAMING on.
+    """
+    import llm_cache
+    import llm_router
+    import tracing
+    import rate_limit
+    import streaming
+    cache_enabled = llm_cache.is_enabled_for(agent_name)
+    models = llm_router.models_for(agent_name, LLM_MODEL)
+    routed = len(models) > 1 or llm_router.LLM_HEDGE_ENABLED
+    # The Writer streams its article so the PDF and audio can start on finished sections (see streaming.py)
+    stream = agent_name == "writer" and streaming.STREAMING_ENABLED and not routed
+    if cache_enabled or tracing.is_enabled() or rate_limit.RATE_LIMIT_ENABLED or routed or stream or models != [LLM_MODEL]:
+        # With the cache off, the CachedLLM only adds the trace span, the rate limiter and routing
+        api_key = _check_api_key()
+        if stream:
+            streaming.install_crewai_listener()
+        return llm_cache.CachedLLM(
+            # Other providers' keys (GROQ_API_KEY, ...) are read from the environment by litellm
+            api_key=api_key if llm_router.provider_of(models[0]) == "gemini" else None,
+            model=models[0],
+            agent_name=agent_name,
+            mode=None if cache_enabled else "off",
+            router=llm_router.ModelRouter(models) if routed else None,
+            stream=stream,
+        )
+    return get_llm()
 
 #from langchain_openai import ChatOpenAI #worked but api quota reached
 #llm = ChatOpenAI(model="gpt-4", temperature=0.2) # Lower temp for manager might be better
@@ -86,14 +129,6 @@ llm = LLM(
 #     print(f"Error initializing LLM: {e}")
 
 
-
-def get_ist_timestamp_str(format_str="%Y%m%d_%H%M"):
-    """Gets the current timestamp in IST as a formatted string."""
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    return now_ist.strftime(format_str)
-
-
 # manager_agent = Agent(
 #     role="Planner", # Changed Role slightly
 #     goal=(
@@ -116,101 +151,186 @@ def get_ist_timestamp_str(format_str="%Y%m%d_%H%M"):
 
 
 
-
 # 2. Researcher Agent
-researcher_agent = Agent(
-    role="Researcher",
-    goal="Gather comprehensive and relevant information on the topic: {topic}.",
-    backstory=(
-        "You are a skilled researcher, adept at using search tools to find "
-        "the most current and accurate information on any given subject. "
-        "You provide detailed findings."
-    ),
-    tools=[search_tool],
-    llm=llm, # Assign the initialized Gemini LLM
-    allow_delegation=False,
-    verbose=True # Keep agent verbose
-)
+def create_researcher_agent(llm):
+    from crewai import Agent
+    from tools import search_tool
+    return Agent(
+        role="Researcher",
+        goal="Gather comprehensive and relevant information on the topic: {topic}.",
+        backstory=(
+            "You are a skilled researcher, adept at using search tools to find "
+            "the most current and accurate information on any given subject. "
+            "You provide detailed findings."
+        ),
+        tools=[search_tool],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
+
+# Researcher for parallel research (RESEARCH_MODE=parallel): the searches already ran, so no tools
+def create_research_synthesizer_agent(llm):
+    from crewai import Agent
+    return Agent(
+        role="Researcher",
+        goal="Turn the gathered search results on {topic} into comprehensive and relevant findings.",
+        backstory=(
+            "You are a skilled researcher, adept at reading many search results at once, "
+            "spotting what is current and well-sourced, and providing detailed findings."
+        ),
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
 
 # 3. Writer Agent
-writer_agent = Agent(
-    role="Content Writer",
-    goal="Synthesize the research findings about {topic} into a clear, detailed, and engaging newsletter article.",
-    backstory=(
-        "You are a talented writer, specialized in transforming research data "
-        "into compelling newsletter content. You focus on clarity and engagement."
-    ),
-    tools=[],
-    llm=llm, # Assign the initialized Gemini LLM
-    allow_delegation=False,
-    verbose=True # Keep agent verbose
-)
+def create_writer_agent(llm):
+    from crewai import Agent
+    return Agent(
+        role="Content Writer",
+        goal="Synthesize the research findings about {topic} into a clear, detailed, and engaging newsletter article.",
+        backstory=(
+            "You are a talented writer, specialized in transforming research data "
+            "into compelling newsletter content. You focus on clarity and engagement."
+        ),
+        tools=[],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
 
 # 4. PDF Creator Agent
-pdf_creator_agent = Agent(
-    role="PDF Document Creator",
-    goal="Generate a PDF document from the provided text content about {topic}. Use the base filename '{base_filename}'. The tool will automatically add a timestamp and '.pdf' extension.",
-    backstory=(
-        "You are a meticulous document specialist. You take text content and instruct the PDF tool "
-        "to create a timestamped PDF file using the provided base filename."
-    ),
-    tools=[pdf_creation_tool],
-    llm=llm, # Assign the initialized Gemini LLM
-    allow_delegation=False,
-    verbose=True # Keep agent verbose
-)
+def create_pdf_creator_agent(llm):
+    from crewai import Agent
+    from tools import pdf_creation_tool
+    return Agent(
+        role="PDF Document Creator",
+        goal="Generate a PDF document from the provided text content about {topic}. Use the base filename '{base_filename}'. The tool will automatically add a timestamp and '.pdf' extension.",
+        backstory=(
+            "You are a meticulous document specialist. You take text content and instruct the PDF tool "
+            "to create a timestamped PDF file using the provided base filename."
+        ),
+        tools=[pdf_creation_tool],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
 
 # 5. Audio Generator Agent
-audio_generator_agent = Agent(
-    role="Audio Summary Generator",
-    goal="Convert the provided text content about {topic} into an MP3 audio file. Use the base filename '{base_filename}'. The tool will automatically add a timestamp and '.mp3' extension.",
-    backstory=(
-        "You are an audio technician. You use text-to-speech technology to create "
-        "clear audio summaries, instructing the tool to save them with a timestamped filename based on the provided base name."
-    ),
-    tools=[text_to_speech_tool],
-    llm=llm, # Assign the initialized Gemini LLM
-    allow_delegation=False,
-    verbose=True # Keep agent verbose
-)
+def create_audio_generator_agent(llm):
+    from crewai import Agent
+    from tools import text_to_speech_tool
+    return Agent(
+        role="Audio Summary Generator",
+        goal="Convert the provided text content about {topic} into an MP3 audio file. Use the base filename '{base_filename}'. The tool will automatically add a timestamp and '.mp3' extension.",
+        backstory=(
+            "You are an audio technician. You use text-to-speech technology to create "
+            "clear audio summaries, instructing the tool to save them with a timestamped filename based on the provided base name."
+        ),
+        tools=[text_to_speech_tool],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
 
 # 6. Email Sender Agent
-email_sender_agent = Agent(
-    role="Email Dispatcher",
-    goal="Compose and send an email to '{recipient}' with the subject '{subject}'. Attach the specified files: {attachment_paths}.",
-    backstory=(
-        "You are a reliable email dispatcher. You carefully compose emails according "
-        "to instructions and ensure all specified attachments (using their full timestamped paths) are included before sending."
-    ),
-    tools=[email_sending_tool],
-    llm=llm, # Assign the initialized Gemini LLM
-    allow_delegation=False,
-    verbose=True # Keep agent verbose
-)
+def create_email_sender_agent(llm):
+    from crewai import Agent
+    from tools import email_sending_tool
+    return Agent(
+        role="Email Dispatcher",
+        goal="Compose and send an email to '{recipient}' with the subject '{subject}'. Attach the specified files: {attachment_paths}.",
+        backstory=(
+            "You are a reliable email dispatcher. You carefully compose emails according "
+            "to instructions and ensure all specified attachments (using their full timestamped paths) are included before sending."
+        ),
+        tools=[email_sending_tool],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
 
 # 7. Local Saver Agent
-local_saver_agent = Agent(
-    role="File Archiver",
-    goal="Confirm the specified file ('{file_path}') exists in the local 'outputs' directory.",
-    backstory=(
-        "You are responsible for archiving files. You verify that files generated "
-        "by other agents exist at their specified timestamped paths in the 'outputs' directory."
-    ),
-    tools=[local_save_tool],
-    llm=llm, # Assign the initialized Gemini LLM
-    allow_delegation=False,
-    verbose=True # Keep agent verbose
-)
-
-# --- Agent List for easy import ---
-specialist_agents = [
-  
-    researcher_agent,
-    writer_agent,
-    pdf_creator_agent,
-    audio_generator_agent,
-    email_sender_agent,
-    local_saver_agent
-]
-
-#  manager_agent,
\ No newline at end of file
+def create_local_saver_agent(llm):
+    from crewai import Agent
+    from tools import local_save_tool
+    return Agent(
+        role="File Archiver",
+        goal="Confirm the specified file ('{file_path}') exists in the local 'outputs' directory.",
+        backstory=(
+            "You are responsible for archiving files. You verify that files generated "
+            "by other agents exist at their specified timestamped paths in the 'outputs' directory."
+        ),
+        tools=[local_save_tool],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True # Keep agent verbose
+    )
+
+# --- Lazy agent sets ---
+AGENT_FACTORIES = {
+    "researcher": create_researcher_agent,
+    "synthesizer": create_research_synthesizer_agent,
+    "writer": create_writer_agent,
+    "pdf": create_pdf_creator_agent,
+    "audio": create_audio_generator_agent,
+    "email": create_email_sender_agent,
+    "saver": create_local_saver_agent,
+}
+
+# Agents that share another agent's LLM settings (LLM_MODEL_<AGENT>, LLM_CACHE_AGENTS)
+LLM_AGENT_NAMES = {"synthesizer": "researcher"}
+
+class SpecialistAgents(dict):
+    """
+    Dict of agents keyed by 'researcher', 'synthesizer', 'writer', 'pdf', 'audio',
+    'email' and 'saver'. Each agent is built the first time it is looked up, so a run that
+    only researches and writes never builds the tool agents or imports their tools.
+    """
+
+    def __init__(self, llm=None):
+        super().__init__()
+        self._llm = llm
+        self._lock = threading.Lock()
+
+    def __missing__(self, name):
+        if name not in AGENT_FACTORIES:
+            raise KeyError(name)
+        with self._lock:
+            if not dict.__contains__(self, name):
+                agent_llm = self._llm if self._llm is not None else build_llm(LLM_AGENT_NAMES.get(name, name))
+                dict.__setitem__(self, name, AGENT_FACTORIES[name](agent_llm))
+            return dict.__getitem__(self, name)
+
+def create_specialist_agents(llm=None):
+    """
+    Returns a fresh, lazily built set of specialist agents. By default each agent
+    gets its LLM from build_llm(); pass `llm` to make all of them share one instance.
+    crewai agents keep per-run executor state, so every concurrent run
+    (e.g. a batch worker) needs its own set.
+    """
+    return SpecialistAgents(llm)
+
+
+# --- Default agents used by interactive runs ---
+default_agents = create_specialist_agents()
+
+_DEFAULT_AGENT_NAMES = {
+    "researcher_agent": "researcher",
+    "writer_agent": "writer",
+    "pdf_creator_agent": "pdf",
+    "audio_generator_agent": "audio",
+    "email_sender_agent": "email",
+    "local_saver_agent": "saver",
+}
+
+def __getattr__(name):
+    # Keeps `from agents import researcher_agent`, `llm` and `specialist_agents` working without building them at import
+    if name in _DEFAULT_AGENT_NAMES:
+        return default_agents[_DEFAULT_AGENT_NAMES[name]]
+    if name == "llm":
+        return get_llm()
+    if name == "specialist_agents":
+        return [default_agents[key] for key in AGENT_FACTORIES]
+    raise AttributeError(f"module 'agents' has no attribute '{name}'")
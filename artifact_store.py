@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import threading
+from datetime import datetime
+import pytz
+from common import env_flag, thread_connection
+from cache_store import CACHE_DIR, make_key
+from mime_stream import file_sha256
+
+# --- Content-addressed artifact store ---
+# Rendered PDFs and MP3s are kept in .cache/artifacts/, keyed by a hash of their
+# input text and render settings (font, layout, TTS backend, ...). When a run asks
+# for an artifact the store already holds, the tools link it into the run's
+# directory instead of rendering or synthesizing it again. Blobs are stored once
+# per content hash, so identical files made under different keys share a blob.
+# A SQLite index records every artifact and every run that used it, for lookups
+# by topic and date (`python artifact_store.py list --topic ...`). Artifacts unused
+# for ARTIFACT_STORE_MAX_AGE_DAYS are collected, then the least recently used
+# ones until the store is under ARTIFACT_STORE_MAX_MB.
+
+ARTIFACT_STORE_ENABLED = env_flag("ARTIFACT_STORE")
+ARTIFACT_STORE_DIR = os.path.join(CACHE_DIR, "artifacts")
+
+
+def link_or_copy(source, target):
+    """Places `source` at `target` atomically, as a hard link when the filesystem allows it."""
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def _parse_date(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return pytz.timezone('Asia/Kolkata').localize(datetime.strptime(value, "%Y-%m-%d")).timestamp()
+
+
+class ArtifactStore:
+    """
+    root: directory holding objects/ and index.sqlite.
+    max_bytes / max_age: retention limits applied by gc() after every put.
+    Artifacts are only ever replaced, never modified in place, so hard links
+    between the store and run directories are safe.
+    """
+
+    def __init__(self, root=ARTIFACT_STORE_DIR, max_bytes=None, max_age=None):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.sqlite")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "puts": 0, "collected": 0}
+        os.makedirs(self.objects_dir, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, sha256 TEXT NOT NULL, ext TEXT NOT NULL,"
+            " size INTEGER NOT NULL, meta TEXT, created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS uses ("
+            " key TEXT NOT NULL, run_id TEXT, topic TEXT, path TEXT, hit INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS artifacts_lru ON artifacts (accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS artifacts_sha ON artifacts (sha256)")
+        conn.execute("CREATE INDEX IF NOT EXISTS uses_topic ON uses (topic, used_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS uses_key ON uses (key)")
+
+    def _connect(self):
+        return thread_connection(self._local, self.index_path)
+
+    def _count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    @staticmethod
+    def key(kind, content, settings):
+        """Key of the artifact rendered from `content` with `settings` (a JSON-serialisable dict)."""
+        return make_key("artifact-v1", kind, content, settings)
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}{ext}")
+
+    def _record_use(self, key, path, hit):
+        from artifacts import current_run_info
+        info = current_run_info()
+        self._connect().execute(
+            "INSERT INTO uses (key, run_id, topic, path, hit, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, info.get("run_id"), info.get("topic"), path, int(hit), time.time()),
+        )
+
+    def materialize(self, key, target_path):
+        """
+        Places the stored artifact for `key` at `target_path`.
+        Returns its metadata dict on a hit, or None if the store does not have it.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT sha256, ext, meta FROM artifacts WHERE key = ?", (key,)).fetchone()
+        blob = self.blob_path(row[0], row[1]) if row else None
+        if blob is None or not os.path.isfile(blob):
+            if row is not None:  # blob removed behind the index's back
+                conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            self._count("misses")
+            return None
+        link_or_copy(blob, target_path)
+        conn.execute("UPDATE artifacts SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self._record_use(key, target_path, hit=True)
+        self._count("hits")
+        return json.loads(row[2] or "{}")
+
+    def put(self, key, kind, source_path, meta=None):
+        """Adds the file at `source_path` as the artifact for `key`, then applies the retention limits."""
+        sha256 = file_sha256(source_path)
+        ext = os.path.splitext(source_path)[1]
+        blob = self.blob_path(sha256, ext)
+        if not os.path.isfile(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            link_or_copy(source_path, blob)
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO artifacts (key, kind, sha256, ext, size, meta, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, sha256, ext, os.path.getsize(blob), json.dumps(meta or {}), now, now),
+        )
+        self._record_use(key, source_path, hit=False)
+        self._count("puts")
+        self.gc()
+
+    def find(self, topic=None, kind=None, since=None, until=None, limit=50):
+        """Uses of stored artifacts, newest first, filtered by topic substring, kind and date ('YYYY-MM-DD' or epoch)."""
+        clauses, params = [], []
+        if topic:
+            clauses.append("u.topic LIKE ?")
+            params.append(f"%{topic}%")
+        if kind:
+            clauses.append("a.kind = ?")
+            params.append(kind)
+        if since is not None:
+            clauses.append("u.used_at >= ?")
+            params.append(_parse_date(since))
+        if until is not None:
+            clauses.append("u.used_at < ?")
+            params.append(_parse_date(until) + (86400 if isinstance(until, str) else 0))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            "SELECT u.used_at, u.topic, u.run_id, u.path, u.hit, a.kind, a.size, a.sha256, a.ext, a.key"
+            f" FROM uses u JOIN artifacts a ON a.key = u.key {where} ORDER BY u.used_at DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [
+            {
+                "used_at": datetime.fromtimestamp(used_at, pytz.timezone('Asia/Kolkata')).strftime("%Y-%m-%d %H:%M:%S"),
+                "topic": topic_, "run_id": run_id, "path": path, "hit": bool(hit), "kind": kind_,
+                "size": size, "blob": self.blob_path(sha256, ext), "key": key,
+            }
+            for used_at, topic_, run_id, path, hit, kind_, size, sha256, ext, key in rows
+        ]
+
+    def gc(self, max_bytes=None, max_age=None):
+        """Drops artifacts unused for max_age seconds, then the least recently used ones above max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        conn = self._connect()
+        doomed = []
+        if max_age:
+            doomed += [row[0] for row in conn.execute(
+                "SELECT key FROM artifacts WHERE accessed_at < ?", (time.time() - max_age,)
+            )]
+        if max_bytes:
+            # Blobs are shared between keys; a blob's size is freed once its last key goes
+            rows = conn.execute("SELECT key, sha256, ext, size FROM artifacts ORDER BY accessed_at ASC").fetchall()
+            keys_per_blob, blob_sizes = {}, {}
+            for key, sha256, ext, size in rows:
+                if key not in doomed:
+                    keys_per_blob[sha256, ext] = keys_per_blob.get((sha256, ext), 0) + 1
+                    blob_sizes[sha256, ext] = size
+            total = sum(blob_sizes.values())
+            for key, sha256, ext, size in rows:
+                if total <= max_bytes:
+                    break
+                if key in doomed:
+                    continue
+                doomed.append(key)
+                keys_per_blob[sha256, ext] -= 1
+                if not keys_per_blob[sha256, ext]:
+                    total -= size
+        freed = 0
+        for key in doomed:
+            row = conn.execute("SELECT sha256, ext FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            conn.execute("DELETE FROM uses WHERE key = ?", (key,))
+            still_used = conn.execute("SELECT 1 FROM artifacts WHERE sha256 = ? AND ext = ? LIMIT 1", row).fetchone()
+            blob = self.blob_path(*row)
+            if not still_used and os.path.isfile(blob):
+                freed += os.path.getsize(blob)
+                os.remove(blob)  # run directories keep their own link to the file
+        if doomed:
+            self._count("collected", len(doomed))
+        return {"collected": len(doomed), "bytes_freed": freed}
+
+    def stats(self):
+        """This process's hit/miss counters plus the number of artifacts and bytes stored."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        artifacts, size = self._connect().execute(
+            "SELECT COUNT(*), (SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, ext, size FROM artifacts))"
+            " FROM artifacts"
+        ).fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(artifacts=artifacts, bytes=size, hit_rate=round(stats["hits"] / lookups, 3) if lookups else 0.0)
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_artifact_store():
+    """Process-wide store, or None when ARTIFACT_STORE=off."""
+    global _store
+    if not ARTIFACT_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(
+                max_bytes=int(os.getenv("ARTIFACT_STORE_MAX_MB", 2048)) * 1024 * 1024,
+                max_age=int(os.getenv("ARTIFACT_STORE_MAX_AGE_DAYS", 30)) * 24 * 60 * 60,
+            )
+    return _store
+
+
+def artifact_store_stats():
+    if _store is None:
+        return {"enabled": ARTIFACT_STORE_ENABLED}
+    return _store.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clean the rendered-artifact store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="Artifacts used by past runs, newest first")
+    list_parser.add_argument("--topic", help="Substring of the run topic")
+    list_parser.add_argument("--kind", choices=("pdf", "mp3"))
+    list_parser.add_argument("--since", help="YYYY-MM-DD")
+    list_parser.add_argument("--until", help="YYYY-MM-DD (inclusive)")
+    list_parser.add_argument("--limit", type=int, default=50)
+    gc_parser = commands.add_parser("gc", help="Apply the retention limits now")
+    gc_parser.add_argument("--max-mb", type=int, help="Size limit (default: ARTIFACT_STORE_MAX_MB)")
+    gc_parser.add_argument("--max-age-days", type=int, help="Age limit (default: ARTIFACT_STORE_MAX_AGE_DAYS)")
+    commands.add_parser("stats", help="Number and size of stored artifacts")
+    args = parser.parse_args(argv)
+
+    store = ArtifactStore(
+        max_bytes=int(os.getenv("ARTIFACT_STORE_MAX_MB", 2048)) * 1024 * 1024,
+        max_age=int(os.getenv("ARTIFACT_STORE_MAX_AGE_DAYS", 30)) * 24 * 60 * 60,
+    )
+    if args.command == "list":
+        for row in store.find(topic=args.topic, kind=args.kind, since=args.since, until=args.until, limit=args.limit):
+            print(f"{row['used_at']}  {row['kind']:<4} {'reused' if row['hit'] else 'new   '} {row['size']:>10}  "
+                  f"{row['topic'] or '-'}  {row['path']}")
+    elif args.command == "gc":
+        result = store.gc(
+            max_bytes=args.max_mb * 1024 * 1024 if args.max_mb is not None else None,
+            max_age=args.max_age_days * 24 * 60 * 60 if args.max_age_days is not None else None,
+        )
+        print(f"Collected {result['collected']} artifacts, freed {result['bytes_freed']} bytes")
+    else:
+        print(json.dumps(store.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
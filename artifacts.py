@@ -0,0 +1,100 @@
+import os
+import json
+import uuid
+import contextvars
+from contextlib import contextmanager
+from common import get_ist_timestamp_str
+from mime_stream import file_sha256
+
+# --- Run-scoped artifacts ---
+# Every run writes into its own directory, outputs/<run_id>/, so concurrent batch
+# and service runs never overwrite each other's files. The directory of the run
+# being executed lives in a context variable: the tools read it to place their
+# files, and the scheduler's task threads inherit it (see tracing.run_in_context).
+# Files are written under a temporary name and renamed into place, and each run
+# ends with a manifest.json listing its files with size and SHA-256.
+
+OUTPUT_ROOT = "outputs"
+MANIFEST_NAME = "manifest.json"
+# Run bookkeeping that the manifest does not list
+BOOKKEEPING_FILES = (MANIFEST_NAME, "checkpoint.json")
+
+_run_output_dir = contextvars.ContextVar("run_output_dir", default=None)
+_run_info = contextvars.ContextVar("run_info", default={})
+
+
+def run_dir(run_id, root=OUTPUT_ROOT):
+    return os.path.join(root, run_id)
+
+
+@contextmanager
+def run_directory(path, **info):
+    """
+    Makes `path` the output directory of everything run inside the block.
+    `info` (run_id, topic, ...) describes the run to code that records its artifacts.
+    """
+    os.makedirs(path, exist_ok=True)
+    token = _run_output_dir.set(path)
+    info_token = _run_info.set(info)
+    try:
+        yield path
+    finally:
+        _run_info.reset(info_token)
+        _run_output_dir.reset(token)
+
+
+def current_output_dir():
+    """Output directory of the current run, or the shared outputs/ folder outside a run."""
+    path = _run_output_dir.get() or OUTPUT_ROOT
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def current_run_info():
+    """The `info` given to run_directory for the current run ({} outside a run)."""
+    return _run_info.get()
+
+
+def is_within_outputs(path, root=OUTPUT_ROOT):
+    """True if `path` resolves (symlinks included) to a location inside the outputs folder."""
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+
+@contextmanager
+def atomic_path(final_path):
+    """
+    Yields a temporary path next to `final_path`; once the block succeeds the file
+    is renamed to `final_path`, so readers never see a half-written artifact.
+    """
+    tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json_atomic(path, data):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2, default=str)
+
+
+def write_manifest(path, run_id, **details):
+    """Writes `path`/manifest.json listing every file of the run with its size and SHA-256, and returns its path."""
+    files = []
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if name in BOOKKEEPING_FILES or name.endswith(".tmp") or not os.path.isfile(file_path):
+            continue
+        files.append({"name": name, "path": file_path, "size": os.path.getsize(file_path), "sha256": file_sha256(file_path)})
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    write_json_atomic(manifest_path, {
+        "run_id": run_id,
+        "written_at": get_ist_timestamp_str("%Y-%m-%d %H:%M:%S"),
+        **details,
+        "artifacts": files,
+    })
+    return manifest_path
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from common import get_ist_timestamp_str
+from main import run_newsletter, output_dir
+from crew_pool import get_crew_pool
+from rate_limit import PRIORITIES, priority
+
+# --- Headless batch mode ---
+# Reads newsletter request specs from a JSONL file, one JSON object per line:
+#   {"topic": "latest AI news", "pdf": true, "audio": false, "email": true,
+#    "recipients": ["a@example.com"], "base_filename": "AI_Weekly", "id": "ai-1"}
+# Only "topic" is required. Each request gets one JSONL result record.
+# "priority" ("interactive" or "batch", the default) orders requests at the shared
+# LLM and search rate limiters (see rate_limit.py).
+# crewai agents are not safe to share between concurrent runs, so every run checks
+# a prebuilt set out of the crew pool (see crew_pool.py); no set serves two runs.
+# PDFs are rendered on a pool of render processes (see pdf_render.py).
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y", "on")
+    return bool(value)
+
+
+def validate_spec(spec):
+    """Returns the error message for an invalid request spec, or None."""
+    if not isinstance(spec, dict):
+        return "Request spec must be a JSON object"
+    if not str(spec.get("topic", "")).strip():
+        return "Request spec is missing 'topic'"
+    if spec.get("priority", "batch") not in PRIORITIES:
+        return f"Request spec 'priority' must be one of {', '.join(PRIORITIES)}"
+    return None
+
+
+def iter_request_specs(path):
+    """Streams (line_number, spec, error) tuples from a JSONL file without loading it into memory."""
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                spec = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            error = validate_spec(spec)
+            yield line_number, spec if isinstance(spec, dict) else None, error
+
+
+def run_request(line_number, spec):
+    """Runs a single request spec and returns its result record. Never raises."""
+    request_id = str(spec.get("id") or spec.get("request_id") or line_number)
+    started = time.perf_counter()
+    record = {"id": request_id, "line": line_number, "topic": spec.get("topic")}
+    try:
+        with priority(spec.get("priority", "batch")), get_crew_pool().agents() as agents:
+            result = run_newsletter(
+                str(spec["topic"]).strip(),
+                do_pdf=_as_bool(spec.get("pdf", False)),
+                do_audio=_as_bool(spec.get("audio", False)),
+                do_email=_as_bool(spec.get("email", False)),
+                recipients=spec.get("recipients"),
+                # Line number keeps runs started in the same minute from sharing a filename
+                base_filename=spec.get("base_filename") or f"NewsLetter_{line_number}",
+                agents=agents,
+                task_workers=spec.get("task_workers"),
+                tool_mode=spec.get("tool_mode"),
+                research_mode=spec.get("research_mode"),
+            )
+        record.update(
+            status="ok",
+            run_id=result["run_id"],
+            output_dir=result["output_dir"],
+            manifest_path=result["manifest_path"],
+            filename_base=result["filename_base"],
+            pdf_path=result["pdf_path"],
+            audio_path=result["audio_path"],
+            email_recipients=result["email_recipients"],
+            coalesced=result["coalesced"],
+            shared_research_run_id=result["shared_research_run_id"],
+            topic_cache=result["topic_cache"],
+            compaction=result["compaction"],
+            research=result["research"],
+            streaming=result["streaming"],
+            final_output=result["final_output"],
+        )
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    record["duration_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(input_path, results_path, workers=4):
+    """
+    Runs every request in `input_path` with at most `workers` newsletters in flight
+    and appends one result record per request to `results_path`.
+    Returns a summary dict with counts and throughput.
+    """
+    from pdf_render import start_render_pool, stop_render_pool
+    workers = max(1, int(workers))
+    get_crew_pool(workers)
+    if workers > 1:
+        start_render_pool()
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    started = time.perf_counter()
+    counts = {"ok": 0, "error": 0}
+
+    with open(results_path, "a", encoding="utf-8") as results_file, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+
+        def write_record(record):
+            counts[record["status"]] += 1
+            results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results_file.flush()
+            done = counts["ok"] + counts["error"]
+            elapsed = time.perf_counter() - started
+            print(f"[{get_ist_timestamp_str('%Y-%m-%d %H:%M:%S')}] Batch: {done} done "
+                  f"({counts['error']} failed), {done / elapsed * 60:.2f} requests/min")
+
+        in_flight = set()
+        for line_number, spec, error in iter_request_specs(input_path):
+            if error:
+                write_record({"id": str(line_number), "line": line_number, "status": "error", "error": error})
+                continue
+            # Keep the queue bounded so huge input files are streamed, not loaded up front
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_record(future.result())
+            in_flight.add(executor.submit(run_request, line_number, spec))
+
+        for future in in_flight:
+            write_record(future.result())
+    stop_render_pool()
+
+    from stats import collect_stats
+    elapsed = time.perf_counter() - started
+    total = counts["ok"] + counts["error"]
+    return {
+        "requests": total,
+        "succeeded": counts["ok"],
+        "failed": counts["error"],
+        "workers": workers,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_min": round(total / elapsed * 60, 2) if elapsed else 0.0,
+        "results_path": results_path,
+        **collect_stats(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate newsletters for every request in a JSONL file.")
+    parser.add_argument("input", nargs="?", default="requests.jsonl", help="JSONL file of request specs (default: requests.jsonl)")
+    parser.add_argument("-o", "--output", help="JSONL file to append result records to (default: outputs/batch_results_<timestamp>.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "4")), help="Number of newsletters to run concurrently (default: BATCH_WORKERS or 4)")
+    args = parser.parse_args(argv)
+
+    results_path = args.output or os.path.join(output_dir, f"batch_results_{get_ist_timestamp_str('%Y%m%d_%H%M%S')}.jsonl")
+    print(f"[{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] Starting batch '{args.input}' with {args.workers} workers -> '{results_path}'")
+    summary = run_batch(args.input, results_path, workers=args.workers)
+
+    print(f"\n--- Batch Finished [{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] ---")
+    print(f"Requests: {summary['requests']} | Succeeded: {summary['succeeded']} | Failed: {summary['failed']}")
+    print(f"Elapsed: {summary['elapsed_s']}s | Throughput: {summary['requests_per_min']} requests/min")
+    from stats import print_stats
+    print_stats(summary)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
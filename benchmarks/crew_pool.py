@@ -0,0 +1,155 @@
+"""
+Per-request setup overhead with and without the warm crew pool (crew_pool.py).
+
+    python -m benchmarks.crew_pool --requests 20 --runs 3 [--json]
+
+"Setup" is everything a request does before its first task starts: getting a set
+of agents (built fresh, or checked out of the pool), their LLM clients and the
+task graph from the tasks.py factories. The pool builds the next set of agents when
+a run checks its worker back in; that time is reported separately. --runs also
+pushes that many full newsletters through each mode with the offline stand-ins of
+benchmarks/stubs.py (after one untimed run, with the search cache off so both
+modes do the same work), and checks that every pooled run starts on agents no
+earlier run has used.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.pipeline import configure_environment, _summary  # noqa: E402
+
+TOPICS = ["latest developments in quantum computing", "AI chips", "renewable energy storage", "space launch market"]
+
+
+def setup_once(mode, pool, index):
+    """Seconds from 'request arrives' to 'task graph ready', and the seconds spent checking the agents back in."""
+    from main import build_newsletter_graph
+    from agents import create_specialist_agents
+    started = time.perf_counter()
+    with pool.agents() if mode == "pooled" else contextlib.nullcontext(create_specialist_agents()) as agents:
+        build_newsletter_graph(TOPICS[index % len(TOPICS)], f"bench_{mode}_{index}", do_pdf=True, do_audio=True,
+                               agents=agents, run_output_dir=os.path.join("outputs", f"{mode}_{index}"))
+        ready = time.perf_counter()
+    return ready - started, time.perf_counter() - ready
+
+
+def leftover_state(agents):
+    """[(agent, attribute)] still holding tool results, cached tool calls, an executor (and its messages), a crew or memory."""
+    leftovers = []
+    for name, agent in agents.items():
+        tools_handler = getattr(agent, "tools_handler", None)
+        state = {
+            "tool_cache": getattr(getattr(tools_handler, "cache", None), "_cache", None),
+            "cache_handler": getattr(getattr(agent, "cache_handler", None), "_cache", None),
+            "tools_results": getattr(agent, "tools_results", None),
+            "agent_executor": getattr(agent, "agent_executor", None),
+            "crew": getattr(agent, "crew", None),
+            "memory": getattr(agent, "memory", None),
+        }
+        leftovers += [f"{name}.{attribute}" for attribute, value in state.items() if value]
+    return leftovers
+
+
+def run_full(mode, pool, llm, runs):
+    """
+    Runs `runs` newsletters. Returns their durations, and for pooled runs the
+    state the runs left on their agents and the agents handed to more than one run.
+    """
+    from main import run_newsletter
+    from agents import create_specialist_agents
+    seconds, left_by_runs, reused, seen = [], set(), [], {}
+    for index in range(runs):
+        started = time.perf_counter()
+        with pool.agents() if mode == "pooled" else contextlib.nullcontext(create_specialist_agents(llm=llm)) as agents:
+            if mode == "pooled":
+                for name, agent in agents.items():
+                    if id(agent) in seen:
+                        reused.append(name)
+                    seen[id(agent)] = agent  # holding on to it keeps its id from being recycled
+            # Agent research mode: the Researcher calls the search tool, so crewai caches its results
+            run_newsletter(TOPICS[index % len(TOPICS)], base_filename=f"bench_{mode}_run_{index}", agents=agents,
+                           research_mode="agent", streaming=False)
+            if mode == "pooled":
+                left_by_runs.update(leftover_state(agents))
+        seconds.append(time.perf_counter() - started)
+    return seconds, sorted(left_by_runs), reused
+
+
+def run(requests=20, runs=0, quiet=True):
+    from benchmarks.stubs import CannedLLM, FakeSerper, SMTPSink
+
+    serper, sink = FakeSerper().start(), SMTPSink().start()
+    previous_cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="newsletter-pool-bench-") as workdir, \
+                contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            # Without the search cache, later runs do not get their searches from earlier ones
+            configure_environment(workdir, serper, sink, search_cache=False)
+            from crew_pool import CrewPool
+            from agents import create_specialist_agents
+
+            # Setup only: agents get their LLMs from build_llm(), as in batch and service runs
+            pool = CrewPool(size=1)
+            warm_up_s = time.perf_counter()
+            pool.warm_up()
+            warm_up_s = time.perf_counter() - warm_up_s
+            setup = {mode: [setup_once(mode, pool, index) for index in range(requests)] for mode in ("fresh", "pooled")}
+            report = {
+                "setup_s": {mode: _summary([ready for ready, _ in values]) for mode, values in setup.items()},
+                "checkin_s": _summary([checkin for _, checkin in setup["pooled"]]),
+                "pool_warm_up_s": round(warm_up_s, 4),
+            }
+
+            if runs:
+                llm = CannedLLM()
+                full_pool = CrewPool(size=1, factory=lambda: create_specialist_agents(llm=llm))
+                run_full("fresh", full_pool, llm, 1)  # imports and first-use setup stay out of both modes' timings
+                full = {mode: run_full(mode, full_pool, llm, runs) for mode in ("fresh", "pooled")}
+                report["run_s"] = {mode: _summary(seconds) for mode, (seconds, _, _) in full.items()}
+                report["state_left_by_runs"] = full["pooled"][1]
+                report["agents_reused"] = full["pooled"][2]
+                report["pool"] = full_pool.stats()
+    finally:
+        os.chdir(previous_cwd)
+        serper.stop()
+        sink.stop()
+
+    fresh, pooled = report["setup_s"]["fresh"]["mean"], report["setup_s"]["pooled"]["mean"]
+    report["setup_saved_s"] = round(fresh - pooled, 4)
+    return dict({"benchmark": "crew_pool", "settings": {"requests": requests, "runs": runs}}, **report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="Timed request setups per mode")
+    parser.add_argument("--runs", type=int, default=0, help="Full offline newsletters per mode (0: setup only)")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own messages")
+    parser.add_argument("--json", action="store_true", help="Print a single JSON object")
+    args = parser.parse_args(argv)
+
+    report = run(args.requests, args.runs, quiet=not args.verbose)
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"Crew pool benchmark ({report['settings']}), pool warm-up {report['pool_warm_up_s']:.3f}s")
+    for mode, s in report["setup_s"].items():
+        print(f"  setup {mode:<7} mean {s['mean'] * 1000:.1f} ms  p50 {s['p50'] * 1000:.1f} ms  p95 {s['p95'] * 1000:.1f} ms")
+    print(f"  saved per request: {report['setup_saved_s'] * 1000:.1f} ms "
+          f"(the pooled worker then spends {report['checkin_s']['mean'] * 1000:.1f} ms building its next agents)")
+    for mode, s in report.get("run_s", {}).items():
+        print(f"  full run {mode:<7} mean {s['mean']:.3f}s  p95 {s['p95']:.3f}s")
+    if "agents_reused" in report:
+        print(f"  state left by a run: {', '.join(report['state_left_by_runs']) or 'none'}")
+        print(f"  agents handed to more than one run: {report['agents_reused'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold-start import time of the entry-point modules, measured with `python -X importtime`.
+
+    python -m benchmarks.import_time --budget-ms 300 --json
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ("main", "batch", "agents", "tasks", "tools", "scheduler")
+
+# "import time: self [us] | cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S.*)$")
+
+
+def measure(module, runs=3):
+    """Imports `module` in fresh interpreters and returns the fastest run's timings."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("GEMINI_API_KEY", "import-time-benchmark")  # agents must not need a real key to import
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1:] or ["unknown error"]
+            return {"module": module, "error": error[0]}
+        entries = []
+        for line in proc.stderr.splitlines():
+            match = _IMPORTTIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+        top_level = [e for e in entries if e[3] == 0]
+        total_us = sum(e[2] for e in top_level)
+        if best is None or total_us < best["total_us"]:
+            best = {"total_us": total_us, "entries": entries, "top_level": top_level}
+
+    slowest = sorted(best["entries"], key=lambda e: e[1], reverse=True)[:10]
+    return {
+        "module": module,
+        "total_ms": round(best["total_us"] / 1000, 1),
+        "modules_imported": len(best["entries"]),
+        "slowest": [{"module": name.strip(), "self_ms": round(own / 1000, 1)} for name, own, _, _ in slowest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module; the fastest counts")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 0)) or None,
+                        help="Fail when any module takes longer to import (default: IMPORT_BUDGET_MS, unset = no budget)")
+    parser.add_argument("--json", action="store_true", help="Print a single JSON object")
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.runs) for module in args.modules]
+    over_budget = [
+        r["module"] for r in results
+        if "error" in r or (args.budget_ms and r["total_ms"] > args.budget_ms)
+    ]
+    report = {"benchmark": "import_time", "budget_ms": args.budget_ms, "results": results, "over_budget": over_budget}
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for r in results:
+            if "error" in r:
+                print(f"{r['module']}: import failed ({r['error']})")
+                continue
+            print(f"{r['module']}: {r['total_ms']} ms, {r['modules_imported']} modules")
+            for entry in r["slowest"][:5]:
+                print(f"    {entry['self_ms']:>8} ms  {entry['module']}")
+        if args.budget_ms:
+            print(f"Budget {args.budget_ms} ms: {'exceeded by ' + ', '.join(over_budget) if over_budget else 'ok'}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+PDF rendering benchmark: pages per second and peak memory.
+
+    python -m benchmarks.pdf_render --docs 40 --workers 4 --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_render import get_pdf_renderer, render_many, stop_render_pool  # noqa: E402
+
+
+def sample_article(sections=6, paragraphs=4):
+    """A Writer-style markdown article with headings, lists and non-latin-1 characters."""
+    parts = ["# Weekly Markets & AI Briefing — “What moved this week”", ""]
+    for section in range(1, sections + 1):
+        parts += [f"## Section {section}: résumé of the week → outlook", ""]
+        for _ in range(paragraphs):
+            parts += [
+                "Central banks held rates steady while **equity markets** rallied 2.4% and the "
+                "euro (€) firmed; analysts expect volatility to ease … though risks remain. " * 3,
+                "",
+            ]
+        parts += ["- Key point with *emphasis*", "- Another point • with a bullet", "1. First step", "2. Second step", ""]
+    return "\n".join(parts)
+
+
+def _rss_mb(peak):
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def run(docs, workers):
+    text = sample_article()
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = [(text, os.path.join(tmp, f"doc_{i}.pdf")) for i in range(docs)]
+
+        # Single process
+        renderer = get_pdf_renderer()
+        started = time.perf_counter()
+        sequential_pages = sum(renderer.render(t, path) for t, path in jobs)
+        sequential_s = time.perf_counter() - started
+
+        # Python heap peak of one document (tracemalloc slows rendering, so it is kept out of the timings)
+        tracemalloc.start()
+        renderer.render(*jobs[0])
+        _, peak_heap = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Process pool
+        started = time.perf_counter()
+        results = render_many(jobs, workers=workers)
+        pool_s = time.perf_counter() - started
+        stop_render_pool()
+        pool_pages = sum(r["pages"] for r in results)
+
+    return {
+        "benchmark": "pdf_render",
+        "docs": docs,
+        "pages_per_doc": sequential_pages // docs,
+        "unicode_font": renderer.font_path,
+        "sequential": {
+            "seconds": round(sequential_s, 3),
+            "pages_per_s": round(sequential_pages / sequential_s, 2),
+            "peak_heap_mb_per_doc": round(peak_heap / 1024 / 1024, 2),
+        },
+        "pool": {
+            "workers": workers,
+            "seconds": round(pool_s, 3),
+            "pages_per_s": round(pool_pages / pool_s, 2),
+        },
+        "peak_rss_mb": _rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+        # The render processes report their own peak (they belong to the fork server, not to this process)
+        "peak_worker_rss_mb": _rss_mb(max(r["peak_rss"] or 0 for r in results)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--json", action="store_true", help="Print a single JSON object")
+    args = parser.parse_args(argv)
+
+    report = run(args.docs, args.workers)
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"Rendered {report['docs']} docs x {report['pages_per_doc']} pages (font: {report['unicode_font'] or 'core latin-1'})")
+    print(f"  sequential: {report['sequential']['pages_per_s']} pages/s, peak heap {report['sequential']['peak_heap_mb_per_doc']} MB per doc")
+    print(f"  {report['pool']['workers']} workers: {report['pool']['pages_per_s']} pages/s")
+    print(f"  peak RSS: {report['peak_rss_mb']} MB (workers {report['peak_worker_rss_mb']} MB)")
+
+
+if __name__ == "__main__":
+    main()
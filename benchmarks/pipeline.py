@@ -0,0 +1,245 @@
+"""
+Offline end-to-end benchmark of the newsletter pipeline built by main.py.
+
+    python -m benchmarks.pipeline --iterations 5 --json -o outputs/bench.json
+
+Gemini, Serper, Google TTS and SMTP are replaced by the local stand-ins in
+benchmarks/stubs.py, and everything runs in a temporary directory, so results
+only depend on the code and can be compared across commits.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Each scenario adds one delivery step to the previous one
+SCENARIOS = {
+    "research_only": {"do_pdf": False, "do_audio": False, "do_email": False},
+    "with_pdf": {"do_pdf": True, "do_audio": False, "do_email": False},
+    "with_audio": {"do_pdf": True, "do_audio": True, "do_email": False},
+    "with_email": {"do_pdf": True, "do_audio": True, "do_email": True},
+}
+RECIPIENTS = ["reader1@example.com", "reader2@example.com", "reader3@example.com"]
+
+
+def configure_environment(workdir, serper, sink, search_cache=True, compaction_budget=None):
+    """Points every external service at the stand-ins. Must run before the repo modules are imported."""
+    if compaction_budget is not None:
+        os.environ["COMPACTION_TOKEN_BUDGET"] = str(compaction_budget)
+    os.environ.update({
+        "GEMINI_API_KEY": "stub",
+        "SERPER_API_KEY": "stub",
+        "SERPER_BASE_URL": serper.url,
+        "SEARCH_CACHE": "on" if search_cache else "off",
+        "LLM_CACHE": "off",
+        # Every iteration must do the full work: no sharing of research or rendered files between runs
+        "COALESCE": "off",
+        "ARTIFACT_STORE": "off",
+        "RESEARCH_MEMORY": "off",
+        "TOPIC_CACHE": "off",
+        "TTS_BACKEND": "null",
+        "SENDER_EMAIL": "benchmark@example.com",
+        "EMAIL_PASSWORD": "",
+        "EMAIL_HOST": sink.host,
+        "EMAIL_PORT": str(sink.port),
+        "EMAIL_USE_TLS": "false",
+        "NEWSLETTER_CACHE_DIR": os.path.join(workdir, ".cache"),
+    })
+    os.chdir(workdir)  # outputs/ and .cache/ are relative to the working directory
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def _summary(values):
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(_percentile(values, 0.5), 4),
+        "p95": round(_percentile(values, 0.95), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(name, flags, llm, serper, sink, topic, iterations, parallel, tool_mode, quiet=True, compaction=True):
+    """Runs one scenario `iterations` times (`parallel` at a time) and returns its metrics."""
+    from main import run_newsletter
+    from agents import create_specialist_agents
+
+    def one_run(index):
+        started = time.perf_counter()
+        result = run_newsletter(
+            topic,
+            recipients=RECIPIENTS,
+            base_filename=f"bench_{name}_{index}",
+            # crewai agents keep per-run state, so concurrent runs need their own set
+            agents=create_specialist_agents(llm=llm),
+            tool_mode=tool_mode,
+            compaction=compaction,
+            **flags,
+        )
+        return time.perf_counter() - started, result["task_timings"], result["compaction"]
+
+    output = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        # Python heap peak of one run (tracemalloc slows everything down, so it is kept out of the timings)
+        tracemalloc.start()
+        one_run("traced")
+        _, peak_heap = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        llm.reset_counters()
+        searches_before, emails_before = serper.requests, sink.messages
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+            runs = list(executor.map(one_run, range(iterations)))
+        wall_s = time.perf_counter() - started
+
+    task_seconds = {}
+    for _, timings, _ in runs:
+        for key, timing in timings.items():
+            task_seconds.setdefault(key, []).append(timing["seconds"])
+    tokens_saved = [stats["tokens_saved"] for _, _, stats in runs if stats]
+    return {
+        "scenario": name,
+        "compaction": compaction,
+        "iterations": iterations,
+        "parallel": parallel,
+        "end_to_end_s": _summary([seconds for seconds, _, _ in runs]),
+        "tasks_s": {key: _summary(values) for key, values in task_seconds.items()},
+        "llm_calls_per_run": round(llm.calls / iterations, 2),
+        "llm_prompt_chars_per_run": round(llm.prompt_chars / iterations),
+        "compaction_tokens_saved_per_run": round(sum(tokens_saved) / len(tokens_saved)) if tokens_saved else 0,
+        "search_requests_per_run": round((serper.requests - searches_before) / iterations, 2),
+        "emails_per_run": round((sink.messages - emails_before) / iterations, 2),
+        "throughput_per_min": round(iterations / wall_s * 60, 2),
+        "peak_heap_mb_per_run": round(peak_heap / 1024 / 1024, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def run(scenarios, iterations=3, parallel=1, llm_latency=0.0, search_latency=0.0, tool_mode="direct",
+        search_cache=True, topic="latest developments in quantum computing", quiet=True,
+        llm_latency_per_1k_tokens=0.0, compaction_modes=(True,), compaction_budget=None):
+    from benchmarks.stubs import CannedLLM, FakeSerper, SMTPSink
+
+    serper, sink = FakeSerper(latency=search_latency).start(), SMTPSink().start()
+    previous_cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="newsletter-bench-") as workdir:
+            configure_environment(workdir, serper, sink, search_cache=search_cache, compaction_budget=compaction_budget)
+            llm = CannedLLM(latency=llm_latency, latency_per_1k_tokens=llm_latency_per_1k_tokens)
+            results = [
+                run_scenario(name, SCENARIOS[name], llm, serper, sink, topic, iterations, parallel, tool_mode, quiet,
+                             compaction=compaction)
+                for name in scenarios
+                for compaction in compaction_modes
+            ]
+            from tools import search_cache_stats
+            cache = search_cache_stats()
+    finally:
+        os.chdir(previous_cwd)
+        serper.stop()
+        sink.stop()
+
+    return {
+        "benchmark": "pipeline",
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "iterations": iterations,
+            "parallel": parallel,
+            "llm_latency_s": llm_latency,
+            "llm_latency_per_1k_tokens_s": llm_latency_per_1k_tokens,
+            "search_latency_s": search_latency,
+            "tool_mode": tool_mode,
+            "search_cache": search_cache,
+            "compaction": list(compaction_modes),
+            "compaction_budget": compaction_budget,
+        },
+        "scenarios": results,
+        "search_cache": cache,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=3, help="Timed runs per scenario")
+    parser.add_argument("--parallel", type=int, default=1, help="Runs in flight at once (throughput)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds the stub LLM sleeps per call")
+    parser.add_argument("--llm-latency-per-1k", type=float, default=0.02, help="Extra seconds the stub LLM sleeps per 1000 prompt tokens")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds the fake Serper sleeps per query")
+    parser.add_argument("--compaction", choices=("on", "off", "both"), default="both", help="Run each scenario with and/or without research compaction")
+    parser.add_argument("--compaction-budget", type=int, help="Token budget for compacted research (default: COMPACTION_TOKEN_BUDGET)")
+    parser.add_argument("--tool-mode", choices=("direct", "llm"), default="direct")
+    parser.add_argument("--no-search-cache", action="store_true", help="Send every search to the fake Serper")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--json", action="store_true", help="Print a single JSON object")
+    parser.add_argument("-o", "--output", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.scenarios,
+        iterations=args.iterations,
+        parallel=args.parallel,
+        llm_latency=args.llm_latency,
+        llm_latency_per_1k_tokens=args.llm_latency_per_1k,
+        compaction_modes={"on": (True,), "off": (False,), "both": (False, True)}[args.compaction],
+        compaction_budget=args.compaction_budget,
+        search_latency=args.search_latency,
+        tool_mode=args.tool_mode,
+        search_cache=not args.no_search_cache,
+        quiet=not args.verbose,
+    )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"Pipeline benchmark @ {report['commit'] or 'unknown commit'} ({report['settings']})")
+    for s in report["scenarios"]:
+        e2e = s["end_to_end_s"]
+        label = f"{s['scenario']} [{'compacted' if s['compaction'] else 'full'}]"
+        print(f"  {label:<26} p50 {e2e['p50']:.3f}s  p95 {e2e['p95']:.3f}s  "
+              f"{s['throughput_per_min']:>7} runs/min  {s['llm_calls_per_run']} LLM calls  "
+              f"heap {s['peak_heap_mb_per_run']} MB  {s['compaction_tokens_saved_per_run']} tokens saved")
+        for key, timing in s["tasks_s"].items():
+            print(f"      {key:<12} {timing['mean']:.3f}s")
+    print(f"  peak RSS {report['scenarios'][-1]['peak_rss_mb'] if report['scenarios'] else '?'} MB, "
+          f"search cache {report['search_cache'].get('hit_rate')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Offline benchmark of LLM routing (llm_router.py): tail latency with and without
+hedged requests, and failover away from a throttled provider.
+
+    python -m benchmarks.routing --calls 200 --concurrency 8 [--json]
+
+Providers are FakeProvider objects with configurable latency, slow-call tail
+and 429 rate, so no crewai, network or API key is needed.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeProvider:
+    """
+    Stand-in for a provider client with crewai LLM's call(). Each call sleeps
+    `latency` seconds, or `slow_latency` for a `slow_fraction` of calls, and
+    raises a 429 for an `error_rate` share of calls.
+    """
+
+    def __init__(self, model, latency=0.05, slow_fraction=0.0, slow_latency=1.0, error_rate=0.0, seed=0):
+        self.model = model
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            draw, slow = self._random.random(), self._random.random() < self.slow_fraction
+        if draw < self.error_rate:
+            time.sleep(self.latency / 5)
+            raise FakeRateLimitError(f"{self.model}: 429 rate limit exceeded")
+        time.sleep(self.slow_latency if slow else self.latency)
+        return f"Final Answer: response from {self.model}"
+
+
+# name -> (models, hedge, {model: FakeProvider settings})
+SCENARIOS = {
+    "single": (["fast/tail"], False, {"fast/tail": {"latency": 0.05, "slow_fraction": 0.1, "slow_latency": 1.0}}),
+    "hedged": (["fast/tail-h", "backup/steady-h"], True, {
+        "fast/tail-h": {"latency": 0.05, "slow_fraction": 0.1, "slow_latency": 1.0},
+        "backup/steady-h": {"latency": 0.08},
+    }),
+    "failover": (["throttled/primary", "backup/steady-f"], False, {
+        "throttled/primary": {"latency": 0.05, "error_rate": 0.5},
+        "backup/steady-f": {"latency": 0.08},
+    }),
+}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_scenario(name, calls, concurrency, quiet=True):
+    import llm_router
+    models, hedge, settings = SCENARIOS[name]
+    providers = {}
+    for seed, model in enumerate(models):
+        providers[model] = FakeProvider(model, seed=seed, **settings[model])
+        llm_router.register_provider(llm_router.provider_of(model), lambda m: providers[m])
+    router = llm_router.ModelRouter(models, hedge=hedge)
+
+    def one_call(index):
+        started = time.perf_counter()
+        try:
+            router.call([{"role": "user", "content": f"question {index}"}])
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        # Warm-up calls give the router the latency history hedging needs
+        for index in range(llm_router.LATENCY_MIN_SAMPLES * 2):
+            one_call(index)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(one_call, range(calls)))
+        wall_s = time.perf_counter() - started
+    latencies = [seconds for seconds, _ in results]
+    stats = llm_router.router_stats()
+    return {
+        "scenario": name,
+        "models": models,
+        "hedge": hedge,
+        "calls": calls,
+        "failed": sum(1 for _, ok in results if not ok),
+        "p50_s": round(_percentile(latencies, 0.5), 4),
+        "p95_s": round(_percentile(latencies, 0.95), 4),
+        "p99_s": round(_percentile(latencies, 0.99), 4),
+        "calls_per_s": round(calls / wall_s, 2),
+        "provider_calls": {model: provider.calls for model, provider in providers.items()},
+        "router": {model: stats[model] for model in models if model in stats},
+    }
+
+
+def run(scenarios, calls=200, concurrency=8, quiet=True):
+    # Generous limits and short backoff, so only the fakes' behaviour shows
+    os.environ.setdefault("LLM_REQUESTS_PER_MIN", "100000")
+    os.environ.setdefault("RATE_LIMIT_BACKOFF_S", "0.05")
+    os.environ.setdefault("LLM_HEDGE_MIN_S", "0.1")
+    return {
+        "benchmark": "routing",
+        "settings": {"calls": calls, "concurrency": concurrency},
+        "scenarios": [run_scenario(name, calls, concurrency, quiet) for name in scenarios],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--calls", type=int, default=200, help="Timed calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once")
+    parser.add_argument("--verbose", action="store_true", help="Show the router's hedge and failover messages")
+    parser.add_argument("--json", action="store_true", help="Print a single JSON object")
+    args = parser.parse_args(argv)
+
+    report = run(args.scenarios, calls=args.calls, concurrency=args.concurrency, quiet=not args.verbose)
+    if args.json:
+        print(json.dumps(report))
+        return
+    for s in report["scenarios"]:
+        print(f"  {s['scenario']:<9} p50 {s['p50_s']:.3f}s  p95 {s['p95_s']:.3f}s  p99 {s['p99_s']:.3f}s  "
+              f"{s['calls_per_s']:>7} calls/s  failed {s['failed']}  provider calls {s['provider_calls']}")
+
+
+if __name__ == "__main__":
+    main()
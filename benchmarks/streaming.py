@@ -0,0 +1,162 @@
+"""
+Offline benchmark of streaming Writer output (streaming.py): time until the PDF and
+the MP3 are ready when they are produced after the article versus pipelined into it.
+
+    python -m benchmarks.streaming --tokens-per-s 400 --tts-latency 0.3 [--json]
+
+The Writer is simulated by feeding an article in token-sized chunks at a fixed rate,
+and speech comes from the null TTS backend with a per-chunk delay standing in for a
+network call, so neither crewai nor network access is needed.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def article(sections=6, paragraphs=3):
+    """A Writer-style markdown article; every paragraph differs, so no TTS chunk repeats."""
+    parts = ["# The Weekly Briefing", ""]
+    for section in range(1, sections + 1):
+        parts += [f"## {section}. What changed this week", ""]
+        for paragraph in range(1, paragraphs + 1):
+            parts += [
+                f"Item {section}.{paragraph}: analysts reported steady progress, with new results, product "
+                "announcements and policy updates shaping the outlook for the months ahead. " * 2,
+                "",
+            ]
+        parts += [f"- Key takeaway {section}", f"- What to watch next in part {section}", ""]
+    return "\n".join(parts)
+
+
+def _simulate_writer(text, source, tokens_per_s, chunk_tokens=8):
+    """Feeds a ReAct-style response to streaming.feed() as an LLM would stream it."""
+    import streaming
+    response = f"Thought: I now know the final answer\nFinal Answer: {text}"
+    chunk_chars = chunk_tokens * 4
+    streaming.begin(source)
+    for start in range(0, len(response), chunk_chars):
+        time.sleep(chunk_tokens / tokens_per_s)
+        streaming.feed(source, response[start:start + chunk_chars])
+
+
+def run_once(mode, index, text, workdir, tokens_per_s, tts_latency):
+    import streaming
+    import tts
+    from pdf_render import get_pdf_renderer
+
+    class SlowNullBackend(tts.NullTTSBackend):
+        # A fresh name per run keeps the chunk cache from carrying over between runs
+        name = f"bench-{mode}-{index}-{time.time_ns()}"
+
+        def synthesize(self, chunk, lang="en"):
+            time.sleep(tts_latency)
+            return super().synthesize(chunk, lang)
+
+    backend = SlowNullBackend()
+    pdf_path = os.path.join(workdir, f"{mode}_{index}.pdf")
+    mp3_path = os.path.join(workdir, f"{mode}_{index}.mp3")
+    source = object()  # stands in for the Writer's LLM
+    stream = streaming.ArticleStream(pdf=True, audio=True, tts_backend=backend) if mode == "streaming" else None
+    ready = {}
+
+    started = time.perf_counter()
+    with streaming.attach(source, stream):
+        _simulate_writer(text, source, tokens_per_s)
+    write_s = time.perf_counter() - started
+    if stream is not None:
+        stream.close(text)
+
+    # The PDF and audio tasks run side by side once the article exists, as in the task graph
+    def pdf_task():
+        ready["pages"] = get_pdf_renderer().render(text, pdf_path)
+        ready["pdf_s"] = time.perf_counter() - started
+
+    def audio_task():
+        ready["chunks"] = tts.synthesize_to_file(text, mp3_path, backend=backend)["chunks"]
+        ready["mp3_s"] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=pdf_task), threading.Thread(target=audio_task)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if stream is not None:
+        stream.discard()
+    return {
+        "write_s": write_s,
+        "pdf_s": ready["pdf_s"],
+        "mp3_s": ready["mp3_s"],
+        "pages": ready["pages"],
+        "mp3_bytes": os.path.getsize(mp3_path),
+        "tts_chunks": ready["chunks"],
+        "sections_streamed": stream.stats["streamed"] if stream is not None else 0,
+    }
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 3)
+
+
+def run(iterations=3, tokens_per_s=400.0, tts_latency=0.3, sections=6, paragraphs=3, quiet=True):
+    with tempfile.TemporaryDirectory(prefix="newsletter-stream-bench-") as workdir, \
+            contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        # The chunk cache location is read when tts.py is imported
+        os.environ["NEWSLETTER_CACHE_DIR"] = os.path.join(workdir, ".cache")
+        text = article(sections, paragraphs)
+        results = {}
+        for mode in ("sequential", "streaming"):
+            runs = [run_once(mode, index, text, workdir, tokens_per_s, tts_latency) for index in range(iterations)]
+            results[mode] = {
+                "write_s": _mean([r["write_s"] for r in runs]),
+                "pdf_ready_s": _mean([r["pdf_s"] for r in runs]),
+                "mp3_ready_s": _mean([r["mp3_s"] for r in runs]),
+                "pdf_after_write_s": _mean([r["pdf_s"] - r["write_s"] for r in runs]),
+                "mp3_after_write_s": _mean([r["mp3_s"] - r["write_s"] for r in runs]),
+                "pages": runs[0]["pages"],
+                "mp3_bytes": runs[0]["mp3_bytes"],
+                "tts_chunks": runs[0]["tts_chunks"],
+                "sections_streamed": runs[0]["sections_streamed"],
+            }
+    return {
+        "benchmark": "streaming",
+        "settings": {"iterations": iterations, "tokens_per_s": tokens_per_s, "tts_latency_s": tts_latency,
+                     "article_chars": len(text)},
+        "modes": results,
+        "same_output": all(results["sequential"][k] == results["streaming"][k] for k in ("pages", "mp3_bytes")),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=3, help="Runs per mode")
+    parser.add_argument("--tokens-per-s", type=float, default=400.0, help="Speed of the simulated Writer")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="Seconds the TTS backend takes per chunk")
+    parser.add_argument("--sections", type=int, default=6, help="Sections in the article")
+    parser.add_argument("--paragraphs", type=int, default=3, help="Paragraphs per section")
+    parser.add_argument("--verbose", action="store_true", help="Show the stream's own messages")
+    parser.add_argument("--json", action="store_true", help="Print a single JSON object")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.tokens_per_s, args.tts_latency, args.sections, args.paragraphs,
+                 quiet=not args.verbose)
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"Streaming benchmark ({report['settings']})")
+    for mode, r in report["modes"].items():
+        print(f"  {mode:<10} writer {r['write_s']:.3f}s  PDF at {r['pdf_ready_s']:.3f}s (+{r['pdf_after_write_s']:.3f}s)  "
+              f"MP3 at {r['mp3_ready_s']:.3f}s (+{r['mp3_after_write_s']:.3f}s)  {r['sections_streamed']} sections streamed")
+    print(f"  same pages and audio length in both modes: {report['same_output']}")
+
+
+if __name__ == "__main__":
+    main()
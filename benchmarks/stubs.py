@@ -0,0 +1,235 @@
+"""
+Local stand-ins for the external services, so the pipeline can be benchmarked offline:
+
+* CannedLLM   - crewai LLM that answers in the ReAct tool-call format without a provider
+* FakeSerper  - HTTP server speaking the Serper search API (set SERPER_BASE_URL to its url)
+* SMTPSink    - SMTP server that accepts and discards every message
+* TTS         - use the built-in null backend (TTS_BACKEND=null, see tts.py)
+"""
+import re
+import json
+import time
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crewai import LLM
+
+# The format instructions crewai puts in every prompt also contain "Observation: the result of the action"
+_OBSERVATION = re.compile(r"^Observation:(?! the result of the action)", re.M)
+_TOOL_NAME = re.compile(r"^Tool Name: (.+)$", re.M)
+# Task descriptions name the topic; agent goals keep an uninterpolated '{topic}'
+_TOPIC = re.compile(r"(?:the topic:|article about) ([^{}\n]+?)\.(?:\s|$)")
+
+
+def _message_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in messages or [])
+
+
+def canned_article(topic, sections=4, paragraphs=3):
+    """A Writer-style markdown newsletter about `topic`."""
+    parts = [f"# {topic.title()}: The Weekly Briefing", ""]
+    for section in range(1, sections + 1):
+        parts += [f"## {section}. What changed in {topic}", ""]
+        for _ in range(paragraphs):
+            parts += [
+                f"Analysts following {topic} reported steady progress this week, with new results, "
+                "product announcements and policy updates shaping the outlook for the months ahead. " * 2,
+                "",
+            ]
+        parts += ["- Key takeaway for readers", "- What to watch next week", ""]
+    return "\n".join(parts)
+
+
+def canned_research(topic, results=10):
+    """A Researcher-style report: findings, then the search snippets it read, many of them near repeats."""
+    parts = [f"Research findings on {topic}:"]
+    parts += [f"- Finding {i}: {topic} saw notable developments (source {i})." for i in range(1, 9)]
+    parts += ["", "Search results reviewed:"]
+    for i in range(1, results + 1):
+        parts += [
+            f"- {topic.title()} - report {i}: Result {i} about {topic}: figures, quotes and analysis from the past week.",
+            f"  Source: https://example.com/{i}",
+        ]
+    parts += ["", "Sources:"] + [f"- https://example.com/{i}" for i in range(1, results + 1)]
+    parts += ["", f"Background: interest in {topic} has grown steadily, and commentators expect "
+              "funding, hiring and regulation to remain the main themes for the rest of the year. " * 6]
+    return "\n".join(parts)
+
+
+class CannedLLM(LLM):
+    """
+    crewai LLM that never calls a provider. When the agent has a search tool it
+    first answers with one Action for it, then with a Final Answer once the
+    Observation is in the conversation. Each call can sleep `latency` seconds
+    to stand in for the provider round trip, plus `latency_per_1k_tokens` for
+    every 1000 prompt tokens (characters / 4), since longer prompts take longer.
+    """
+
+    def __init__(self, latency=0.0, article_sections=4, latency_per_1k_tokens=0.0, **kwargs):
+        kwargs.setdefault("model", "stub/canned")
+        kwargs.setdefault("api_key", "stub")
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.article_sections = article_sections
+        self.calls = 0
+        self.prompt_chars = 0
+        self._calls_lock = threading.Lock()
+
+    def supports_function_calling(self):
+        return False  # keep crewai on the text ReAct loop
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        text = _message_text(messages)
+        with self._calls_lock:
+            self.calls += 1
+            self.prompt_chars += len(text)
+        delay = self.latency + self.latency_per_1k_tokens * len(text) / 4 / 1000
+        if delay:
+            time.sleep(delay)
+
+        topic_match = _TOPIC.search(text)
+        topic = topic_match.group(1).strip() if topic_match else "the topic"
+        search_tools = [name.strip() for name in _TOOL_NAME.findall(text) if "search" in name.lower()]
+        if search_tools and not _OBSERVATION.search(text):
+            return (
+                f"Thought: I should search for recent information about {topic}.\n"
+                f"Action: {search_tools[0]}\n"
+                f"Action Input: {json.dumps({'search_query': topic})}"
+            )
+        if "You are Content Writer" in text:
+            answer = canned_article(topic, sections=self.article_sections)
+        else:
+            answer = canned_research(topic)
+        return f"Thought: I now know the final answer\nFinal Answer: {answer}"
+
+    def reset_counters(self):
+        with self._calls_lock:
+            self.calls = 0
+            self.prompt_chars = 0
+
+
+class _SerperHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            query = json.loads(body or b"{}").get("q", "")
+        except ValueError:
+            query = ""
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        payload = json.dumps({
+            "searchParameters": {"q": query, "type": "search"},
+            "organic": [
+                {
+                    "title": f"{query.title()} - report {i}",
+                    "link": f"https://example.com/{i}",
+                    "snippet": f"Result {i} about {query}: figures, quotes and analysis from the past week.",
+                    "position": i,
+                }
+                for i in range(1, 11)
+            ],
+            "peopleAlsoAsk": [],
+            "relatedSearches": [{"query": f"{query} news"}],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSerper:
+    """Serper-compatible search endpoint on localhost, answering every query with ten canned results."""
+
+    def __init__(self, latency=0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _SerperHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.requests = 0
+        self.httpd.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True, name="fake-serper").start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        self._reply("220 benchmark-sink ESMTP")
+        recipients, size, in_data = 0, 0, False
+        for line in self.rfile:
+            if in_data:
+                if line.rstrip(b"\r\n") == b".":
+                    in_data = False
+                    sink.record(recipients, size)
+                    self._reply("250 OK")
+                else:
+                    size += len(line)
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self._reply("250-benchmark-sink")
+                self._reply("250 8BITMIME")
+            elif command == b"MAIL":
+                recipients = 0
+                self._reply("250 OK")
+            elif command == b"RCPT":
+                recipients += 1
+                self._reply("250 OK")
+            elif command == b"DATA":
+                in_data, size = True, 0
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:  # HELO, RSET, NOOP, ...
+                self._reply("250 OK")
+
+
+class SMTPSink:
+    """Plain-text SMTP server on localhost that counts and discards messages (use with EMAIL_USE_TLS=false)."""
+
+    def __init__(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPSinkHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.host, self.port = self.server.server_address
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, recipients, size):
+        with self._lock:
+            self.messages += max(1, recipients)
+            self.bytes += size
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="smtp-sink").start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
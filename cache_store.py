@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from common import thread_connection
+
+# --- Disk-backed key/value cache ---
+# One SQLite file can hold several namespaces (search results, LLM responses, ...).
+# SQLite's own locking makes a cache file safe to share between threads and
+# between concurrent runs; every thread gets its own connection.
+
+CACHE_DIR = os.getenv("NEWSLETTER_CACHE_DIR", ".cache")
+
+
+def make_key(*parts):
+    """Builds a stable cache key from JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent cache with optional TTL expiry and LRU eviction.
+    ttl: seconds an entry stays valid (None = never expires).
+    max_entries / max_bytes: size limits per namespace; least recently used entries are evicted first.
+    """
+
+    def __init__(self, path, namespace="default", ttl=None, max_entries=None, max_bytes=None):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " size INTEGER NOT NULL, created_at REAL NOT NULL, expires_at REAL,"
+                " accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at)")
+
+    def _connect(self):
+        return thread_connection(self._local, self.path)
+
+    def _count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def get_bytes(self, key):
+        """Returns the cached bytes for `key`, or None on a miss or an expired entry."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._count("expired")
+            self._count("misses")
+            return None
+        conn.execute(
+            "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key),
+        )
+        self._count("hits")
+        return bytes(value)
+
+    def set_bytes(self, key, value, ttl=None):
+        """Stores `value` under `key`, then evicts least recently used entries if over the size limits."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl else None
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, sqlite3.Binary(value), len(value), now, expires_at, now),
+        )
+        self._count("sets")
+        self._evict(conn)
+
+    def get(self, key, default=None):
+        """JSON flavour of get_bytes()."""
+        value = self.get_bytes(key)
+        return default if value is None else json.loads(value.decode("utf-8"))
+
+    def set(self, key, value, ttl=None):
+        """JSON flavour of set_bytes()."""
+        self.set_bytes(key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ttl=ttl)
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+
+    def _evict(self, conn):
+        conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, time.time()),
+        )
+        evicted = 0
+        if self.max_entries:
+            cursor = conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM entries WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+            evicted += max(cursor.rowcount, 0)
+        if self.max_bytes:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+            while total > self.max_bytes:
+                row = conn.execute(
+                    "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed_at ASC LIMIT 1",
+                    (self.namespace,),
+                ).fetchone()
+                if row is None:
+                    break
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, row[0]))
+                total -= row[1]
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def stats(self):
+        """Returns this process's hit/miss counters plus the current entry count and size."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(entries=entries, bytes=size, hit_rate=round(stats["hits"] / lookups, 3) if lookups else 0.0)
+        return stats
@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import uuid
+import threading
+from common import env_flag, get_ist_timestamp_str
+from mime_stream import file_sha256
+from artifacts import run_dir, write_json_atomic
+
+# --- Run checkpoints ---
+# Every newsletter run gets a run ID and a state file, outputs/<run_id>/checkpoint.json
+# (CHECKPOINT_DIR/<run_id>.json when CHECKPOINT_DIR is set).
+# The file holds the run's parameters and, for each finished task, its raw output
+# and the files it produced (path, size, SHA-256). It is rewritten atomically after
+# every task. `python main.py --resume <run_id>` rebuilds the same task graph,
+# reloads the finished outputs and runs only the rest. A finished task whose files
+# are missing or changed is run again, together with every task downstream of it.
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR")
+CHECKPOINTS_ENABLED = env_flag("CHECKPOINTS")
+
+# Files the tools write and report back in their output
+_ARTIFACT_PATH = re.compile(r"[\w./\\:-]+\.(?:pdf|mp3)\b")
+
+
+def new_run_id():
+    return f"{get_ist_timestamp_str('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def checkpoint_path(run_id, directory=None):
+    directory = directory or CHECKPOINT_DIR
+    return os.path.join(directory, f"{run_id}.json") if directory else os.path.join(run_dir(run_id), "checkpoint.json")
+
+
+def find_artifacts(output):
+    """Describes the existing files a task output refers to: [{'path', 'size', 'sha256'}]."""
+    artifacts = []
+    for path in dict.fromkeys(_ARTIFACT_PATH.findall(str(output or ""))):
+        if os.path.isfile(path):
+            artifacts.append({"path": path, "size": os.path.getsize(path), "sha256": file_sha256(path)})
+    return artifacts
+
+
+def artifact_problem(artifact):
+    """Returns why a recorded file can no longer be trusted, or None if it is unchanged."""
+    path = artifact["path"]
+    if not os.path.isfile(path):
+        return f"'{path}' is missing"
+    if os.path.getsize(path) != artifact["size"] or file_sha256(path) != artifact["sha256"]:
+        return f"'{path}' has changed"
+    return None
+
+
+class RunCheckpoint:
+    """State file of one run."""
+
+    def __init__(self, run_id, state, directory=None):
+        self.run_id = run_id
+        self.state = state
+        self.path = checkpoint_path(run_id, directory)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, params, run_id=None, directory=None):
+        """Starts the state file of a new run with the parameters needed to rebuild its task graph."""
+        run_id = run_id or new_run_id()
+        checkpoint = cls(run_id, {
+            "run_id": run_id,
+            "status": "running",
+            "created_at": get_ist_timestamp_str("%Y-%m-%d %H:%M:%S"),
+            "params": params,
+            "tasks": {},
+        }, directory)
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, run_id, directory=None):
+        path = checkpoint_path(run_id, directory)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No checkpoint for run '{run_id}' at {path}")
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(run_id, json.load(file), directory)
+
+    @property
+    def params(self):
+        return self.state["params"]
+
+    def save(self):
+        with self._lock:
+            self.state["updated_at"] = get_ist_timestamp_str("%Y-%m-%d %H:%M:%S")
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            write_json_atomic(self.path, self.state)  # a crash mid-write never leaves a broken state file
+
+    def record_task(self, key, output, timing=None):
+        """Stores a finished task's output and produced files (TaskGraph.run on_task_complete hook)."""
+        with self._lock:
+            self.state["tasks"][key] = {
+                "output": output,
+                "artifacts": find_artifacts(output),
+                "seconds": (timing or {}).get("seconds"),
+                "completed_at": get_ist_timestamp_str("%Y-%m-%d %H:%M:%S"),
+            }
+        self.save()
+
+    def finish(self, status, error=None):
+        with self._lock:
+            self.state["status"] = status
+            if error:
+                self.state["error"] = error
+            else:
+                self.state.pop("error", None)
+        self.save()
+
+    def completed_outputs(self, graph):
+        """
+        Outputs of finished tasks that can be reused for `graph`. Tasks whose files
+        are missing or changed, and everything downstream of them, are left out.
+        Returns (outputs, problems).
+        """
+        tasks = {key: task for key, task in self.state["tasks"].items() if key in graph.nodes}
+        problems = {}
+        for key, task in tasks.items():
+            reasons = [p for p in map(artifact_problem, task.get("artifacts", [])) if p]
+            if reasons:
+                problems[key] = "; ".join(reasons)
+        stale = graph.downstream_of(problems)
+        for key in stale - set(problems):
+            if key in tasks:
+                problems[key] = "upstream task is re-run"
+        return {key: task["output"] for key, task in tasks.items() if key not in stale}, problems
@@ -0,0 +1,139 @@
+import os
+import re
+import time
+import threading
+from common import env_flag
+from topic_cache import TOPIC_CACHE_ENABLED, TOPIC_CACHE_THRESHOLD, similarity
+
+# --- Research coalescing ---
+# Batch and service traffic often asks for the same topic several times with
+# different deliveries (PDF only, audio + email, other recipients). Research and
+# writing only depend on the topic and on how the research is done (research mode,
+# compaction), so requests that match on all three share one research + write pass: the first request (the leader) runs them and
+# publishes their outputs as soon as the writer finishes; requests arriving while
+# it runs, or up to COALESCE_WINDOW_S seconds after, wait for those outputs and
+# run only their own delivery tasks (see TaskGraph.run's `completed`). If the
+# leader fails before writing, or has not written after COALESCE_WAIT_S seconds,
+# waiting requests run research themselves.
+# With TOPIC_CACHE=on, topics that are near-duplicates by topic_cache.similarity
+# ("ai news latest" and "AI news today") share a pass too.
+
+COALESCE_ENABLED = env_flag("COALESCE")
+COALESCE_WINDOW_S = float(os.getenv("COALESCE_WINDOW_S", 600))
+COALESCE_WAIT_S = float(os.getenv("COALESCE_WAIT_S", 900))
+# Task keys whose outputs are shared (build_newsletter_graph's search, research, compact and write nodes)
+SHARED_TASKS = ("search", "research", "compact", "write")
+
+
+def normalize_topic(topic):
+    """Lower-cases the topic and drops punctuation and repeated whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", str(topic).lower()).split())
+
+
+class SharedResearch:
+    """Research and write outputs of one topic, produced by its leader run."""
+
+    def __init__(self, key, run_id):
+        self.key = key
+        self.leader_run_id = run_id
+        self.outputs = None
+        self.error = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def publish(self, task_key, raw_output):
+        """Collects a finished task's output (TaskGraph.run on_task_complete hook) and releases waiters once the article is in."""
+        if task_key not in SHARED_TASKS:
+            return
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.outputs = dict(self.outputs or {}, **{task_key: raw_output})
+            if "write" in self.outputs:  # the writer runs after every other shared task
+                self.finished_at = time.monotonic()
+                self._done.set()
+
+    def fail(self, error):
+        """Releases waiters without outputs. Returns False (and does nothing) once the outputs are published."""
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self.error = error
+            self.finished_at = time.monotonic()
+            self._done.set()
+            return True
+
+    def wait(self, timeout=None):
+        """Blocks until the leader publishes. Returns the outputs, or None if the leader failed or timed out."""
+        self._done.wait(timeout)
+        return self.outputs if self._done.is_set() and self.error is None else None
+
+
+class ResearchCoalescer:
+    """
+    Hands out one SharedResearch per normalized topic, research mode and compaction
+    setting for up to `window` seconds after it finishes.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW_S):
+        self.window = window
+        self._entries = {}  # (research_mode, compaction, normalized topic) -> SharedResearch
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "leaders": 0, "joined_in_flight": 0, "joined_recent": 0, "leader_failed": 0}
+
+    def join(self, topic, run_id, research_mode=None, compaction=None):
+        """
+        Returns (role, entry). role is 'leader' when the caller must run research
+        and publish to entry, 'in_flight' or 'recent' when it can wait for entry.
+        Only runs with the same research_mode and compaction setting share an entry.
+        """
+        variant = (research_mode, bool(compaction))
+        key = normalize_topic(topic)
+        with self._lock:
+            self._stats["requests"] += 1
+            entry = self._entries.get((*variant, key)) or self._similar_entry(variant, key)
+            now = time.monotonic()
+            if entry is not None and entry.finished_at is not None and (
+                    entry.error is not None or now - entry.finished_at > self.window):
+                entry = None  # failed or too old to share
+            if entry is None:
+                entry = self._entries[(*variant, key)] = SharedResearch(key, run_id)
+                self._stats["leaders"] += 1
+                self._forget_expired(now)
+                return "leader", entry
+            role = "in_flight" if entry.finished_at is None else "recent"
+            self._stats[f"joined_{role}"] += 1
+            return role, entry
+
+    def fail(self, entry, error):
+        """Marks the leader of `entry` as failed, so waiting and later requests run research themselves."""
+        if entry.fail(error):
+            with self._lock:
+                self._stats["leader_failed"] += 1
+
+    def _similar_entry(self, variant, key):
+        if not TOPIC_CACHE_ENABLED:
+            return None
+        scored = [(similarity(key, other), entry) for (*other_variant, other), entry in self._entries.items()
+                  if tuple(other_variant) == variant]
+        scored = [item for item in scored if item[0] >= TOPIC_CACHE_THRESHOLD]
+        return max(scored, key=lambda item: item[0])[1] if scored else None
+
+    def _forget_expired(self, now):
+        for key in [k for k, e in self._entries.items() if e.finished_at is not None and now - e.finished_at > self.window]:
+            del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        joined = stats["joined_in_flight"] + stats["joined_recent"]
+        stats["hit_rate"] = round(joined / stats["requests"], 3) if stats["requests"] else 0.0
+        return stats
+
+
+research_coalescer = ResearchCoalescer()
+
+
+def coalesce_stats():
+    return dict(research_coalescer.stats(), enabled=COALESCE_ENABLED, window_s=COALESCE_WINDOW_S, wait_s=COALESCE_WAIT_S)
@@ -0,0 +1,37 @@
+import os
+import sqlite3
+from datetime import datetime
+import pytz
+
+# --- Helpers shared by the pipeline modules ---
+
+# --- Timezone Helper ---
+def get_ist_timestamp_str(format_str="%Y%m%d_%H%M"):
+    """Gets the current timestamp in IST as a formatted string."""
+    ist = pytz.timezone('Asia/Kolkata')
+    now_ist = datetime.now(ist)
+    return now_ist.strftime(format_str)
+
+
+# --- Environment flags ---
+_OFF_VALUES = ("0", "off", "false", "no")
+
+def env_flag(name, default="on"):
+    """Reads an on/off environment variable: anything but 0/off/false/no (case-insensitive) is on."""
+    return os.getenv(name, default).strip().lower() not in _OFF_VALUES
+
+
+# --- SQLite stores ---
+# The caches and stores keep their data in SQLite files shared by threads and by
+# concurrent processes. Each thread gets its own connection; WAL mode lets readers
+# carry on while another connection writes.
+
+def thread_connection(local, path):
+    """The calling thread's connection to the SQLite file `path`, kept on the threading.local `local`."""
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+    return conn
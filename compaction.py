@@ -0,0 +1,153 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from common import env_flag
+
+# --- Research compaction ---
+# The Researcher's report (search snippets, source lists, its own summary) is
+# handed to the Writer as context. Before that, a local step without any LLM
+# shrinks it: passages that repeat an earlier one (same URL and little else, or
+# nearly the same words) are dropped, the rest are ranked against the topic with
+# BM25, and the best ones are kept, in their original order, until
+# COMPACTION_TOKEN_BUDGET is reached. Tokens are estimated as characters / 4,
+# as for the LLM cache's usage numbers. Dropped passages can hold facts the
+# Writer would have used, so the step only runs with COMPACTION=on.
+
+COMPACTION_ENABLED = env_flag("COMPACTION", "off")
+COMPACTION_TOKEN_BUDGET = int(os.getenv("COMPACTION_TOKEN_BUDGET", 1500))
+# Word-shingle Jaccard similarity above which a passage counts as a repeat
+COMPACTION_DUPLICATE_THRESHOLD = float(os.getenv("COMPACTION_DUPLICATE_THRESHOLD", 0.8))
+
+_URL = re.compile(r"https?://[^\s)\]>\"']+")
+_WORD = re.compile(r"\w+")
+_ITEM = re.compile(r"^\s*(?:[-*+\u2022]|\d+[.)])\s+")
+
+
+def estimate_tokens(text):
+    return len(text) // 4
+
+
+def split_passages(text):
+    """Splits a report into paragraphs and list items."""
+    passages, current = [], []
+    for line in str(text or "").replace("\r\n", "\n").split("\n"):
+        if not line.strip() or _ITEM.match(line):
+            if current:
+                passages.append("\n".join(current))
+            current = [line] if line.strip() else []
+        else:
+            current.append(line)
+    if current:
+        passages.append("\n".join(current))
+    return [p.strip() for p in passages if p.strip()]
+
+
+def _words(text):
+    return _WORD.findall(_URL.sub(" ", text).lower())
+
+
+def _shingles(words, size=3):
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def dedupe_passages(passages, threshold=COMPACTION_DUPLICATE_THRESHOLD):
+    """Drops passages that repeat an earlier one. Returns (kept passages, number dropped)."""
+    kept, kept_shingles, seen_urls = [], [], set()
+    for passage in passages:
+        urls = set(_URL.findall(passage))
+        words = _words(passage)
+        # A line that only cites an already-cited source adds nothing
+        if urls and urls <= seen_urls and len(words) <= 12:
+            continue
+        shingles = _shingles(words)
+        if shingles and any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+        seen_urls |= urls
+    return kept, len(passages) - len(kept)
+
+
+class BM25:
+    """Okapi BM25 over a small list of passages."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.terms = [Counter(_words(doc)) for doc in documents]
+        self.lengths = [sum(terms.values()) for terms in self.terms]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter(term for terms in self.terms for term in terms)
+        count = len(documents)
+        self.idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query):
+        query_terms = set(_words(query))
+        scores = []
+        for terms, length in zip(self.terms, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            for term in query_terms & terms.keys():
+                frequency = terms[term]
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+
+def compact(text, topic, budget=None):
+    """
+    Shrinks a research report for the Writer. Returns (compacted text, stats) where
+    stats has passages_in/out, duplicates, tokens_in/out and tokens_saved.
+    """
+    budget = COMPACTION_TOKEN_BUDGET if budget is None else budget
+    passages = split_passages(text)
+    unique, duplicates = dedupe_passages(passages)
+    if sum(estimate_tokens(p) for p in unique) <= budget:
+        chosen = list(range(len(unique)))
+    else:
+        scores = BM25(unique).scores(topic)
+        # Ties keep the report's own order, which usually puts the summary first
+        ranked = sorted(range(len(unique)), key=lambda i: (-scores[i], i))
+        chosen, used = [], 0
+        for index in ranked:
+            tokens = estimate_tokens(unique[index])
+            if used + tokens <= budget:
+                chosen.append(index)
+                used += tokens
+        if not chosen and ranked:  # the best passage alone is over budget
+            unique[ranked[0]] = unique[ranked[0]][:budget * 4]
+            chosen = [ranked[0]]
+    compacted = "\n\n".join(unique[i] for i in sorted(chosen))
+    tokens_in, tokens_out = estimate_tokens(str(text or "")), estimate_tokens(compacted)
+    return compacted, {
+        "passages_in": len(passages),
+        "duplicates": duplicates,
+        "passages_out": len(chosen),
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "tokens_saved": max(0, tokens_in - tokens_out),
+    }
+
+
+_totals = Counter()
+_totals_lock = threading.Lock()
+
+def record_compaction(stats):
+    with _totals_lock:
+        _totals["runs"] += 1
+        for key in ("duplicates", "tokens_in", "tokens_out", "tokens_saved"):
+            _totals[key] += stats[key]
+
+
+def compaction_stats():
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["enabled"] = COMPACTION_ENABLED
+    totals["budget"] = COMPACTION_TOKEN_BUDGET
+    if totals.get("tokens_in"):
+        totals["saved_ratio"] = round(totals["tokens_saved"] / totals["tokens_in"], 3)
+    return totals
@@ -0,0 +1,185 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from common import get_ist_timestamp_str
+from agents import AGENT_FACTORIES, create_specialist_agents
+
+# --- Warm crew pool ---
+# Batch and service workers run one newsletter after another. Instead of every
+# run building its agents (and their LLM clients) while the request waits, a
+# CrewPool keeps up to `size` CrewWorkers, each holding one set of specialist
+# agents built ahead of time. warm_up() builds them before the first request: the
+# agents a run needs (CREW_POOL_AGENTS, by default those of the configured research
+# and tool modes) plus the process-wide Serper tool and PDF renderer. A run checks
+# a worker out, builds its task graph from the tasks.py factories with the
+# worker's agents and checks it back in.
+# A set of agents serves exactly one run. On check-in the worker drops it and
+# builds a new one for its next run, so no crewai state (cached tool results, the
+# agent executor and its messages, the crew link) can reach the next newsletter.
+# Rebuilding costs a few milliseconds: crewai's import, the API key check, the
+# routed LLM clients (llm_router.get_client), the Serper tool and the PDF renderer
+# are process-wide and stay warm. Checkouts never wait: when every worker is busy
+# a new one is built, and workers beyond `size` are dropped when they come back.
+# HTTP connections are not pooled per worker: LLM calls go through litellm's own
+# client, Serper through crewai_tools' requests calls and email through
+# smtp_pool.py, all shared by the whole process.
+
+CREW_POOL_AGENTS = [name.strip() for name in os.getenv("CREW_POOL_AGENTS", "").split(",") if name.strip()]
+
+
+def default_agent_names():
+    """Agents a run builds with the configured RESEARCH_MODE and TOOL_AGENTS_MODE."""
+    if CREW_POOL_AGENTS:
+        return [name for name in CREW_POOL_AGENTS if name in AGENT_FACTORIES]
+    from research import DEFAULT_RESEARCH_MODE
+    from main import DEFAULT_TOOL_AGENTS_MODE
+    names = ["synthesizer" if DEFAULT_RESEARCH_MODE == "parallel" else "researcher", "writer"]
+    if DEFAULT_TOOL_AGENTS_MODE == "llm":
+        names += ["pdf", "audio", "email", "saver"]
+    return names
+
+
+class CrewWorker:
+    """One set of specialist agents at a time, used by one run."""
+
+    def __init__(self, number, factory=create_specialist_agents):
+        self.number = number
+        self.factory = factory
+        self.agents = None
+        self.runs = 0
+
+    def warm(self, names=None):
+        """Builds the agents (and their LLMs) now rather than during the next run. Returns the seconds taken."""
+        started = time.perf_counter()
+        if self.agents is None:
+            self.agents = self.factory()
+        try:
+            for name in default_agent_names() if names is None else names:
+                self.agents[name]  # SpecialistAgents builds an agent on first lookup
+        except BaseException:
+            self.agents = None  # a half-built set is never handed out
+            raise
+        return time.perf_counter() - started
+
+    def discard(self):
+        self.agents = None
+
+
+class CrewPool:
+    """
+    Hands out warm CrewWorkers and keeps up to `size` of them between runs.
+    Workers are built on first use (or by warm_up()) and reused most recently
+    returned first.
+    """
+
+    def __init__(self, size=4, factory=create_specialist_agents):
+        self.size = max(1, int(size))
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"checkouts": 0, "overflow": 0, "builds": 0, "build_failures": 0, "failed_runs": 0, "build_s": 0.0}
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for stat, amount in amounts.items():
+                self._stats[stat] += amount
+
+    def resize(self, size):
+        """Keeps up to `size` workers (the pool never shrinks)."""
+        with self._lock:
+            self.size = max(self.size, int(size))
+
+    def _take(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            self._created += 1
+            if self._created > self.size:
+                self._count(overflow=1)
+            return CrewWorker(self._created, self.factory)
+
+    def _give_back(self, worker, rebuild=False):
+        with self._lock:
+            if self._idle.qsize() >= self.size:
+                self._created -= 1  # a burst is over; its extra worker is not kept
+                return
+        if rebuild:
+            self._rebuild(worker)
+        self._idle.put(worker)
+
+    def _build(self, worker):
+        if worker.agents is None:
+            self._count(builds=1, build_s=worker.warm())
+
+    def _rebuild(self, worker):
+        # A failed build is left to the next checkout, which raises it to its run
+        worker.discard()
+        try:
+            self._build(worker)
+        except Exception as e:
+            self._count(build_failures=1)
+            print(f"[{get_ist_timestamp_str()}] Crew worker {worker.number}: agents not rebuilt ({e})")
+
+    def warm_up(self):
+        """Builds every worker's agents now, e.g. while a service starts."""
+        workers = []
+        while len(workers) < self.size:
+            worker = self._take()
+            self._build(worker)
+            workers.append(worker)
+        for worker in workers:
+            self._give_back(worker)
+        return self
+
+    @contextmanager
+    def agents(self):
+        """Checks out a worker for one run and yields its agents (see agents.create_specialist_agents)."""
+        worker = self._take()
+        try:
+            self._build(worker)
+        except BaseException:
+            self._give_back(worker)
+            raise
+        self._count(checkouts=1)
+        try:
+            yield worker.agents
+        except BaseException:
+            self._count(failed_runs=1)
+            raise
+        finally:
+            # The agents never serve a second run; the worker comes back with a new set
+            worker.runs += 1
+            self._give_back(worker, rebuild=True)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["workers"] = self._created
+        build_s = stats.pop("build_s")
+        stats["mean_build_s"] = round(build_s / stats["builds"], 4) if stats["builds"] else None
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_crew_pool(size=None):
+    """Process-wide crew pool, grown to at least `size` workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CrewPool(size or 1)
+        elif size:
+            _pool.resize(size)
+    return _pool
+
+
+def crew_pool_stats():
+    return _pool.stats() if _pool is not None else {}
@@ -1,32 +1,44 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
-load_dotenv()
 
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY environment variable not set.")
+# Standalone check of the Gemini setup: `python llm.py`.
+# Nothing runs on import, so importing this module never touches the network.
 
-try:
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-pro",
-        google_api_key=api_key
-    )
-    print("LLM Initialized Successfully!")
-    # Now try using the llm, e.g., llm.invoke("Hello")
-except Exception as e:
-    print(f"Error initializing LLM: {e}")
-    # Provide this full error message if you still have problemspytho
+def check_llm(api_key):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    try:
+        llm = ChatGoogleGenerativeAI(
+            model="gemini-pro",
+            google_api_key=api_key
+        )
+        print("LLM Initialized Successfully!")
+        # Now try using the llm, e.g., llm.invoke("Hello")
+        return llm
+    except Exception as e:
+        print(f"Error initializing LLM: {e}")
+        # Provide this full error message if you still have problemspytho
 
 
-from google import genai
+def list_models(api_key):
+    from google import genai
 
-# Initialize the client with your API key
-client = genai.Client(api_key=api_key)
+    # Initialize the client with your API key
+    client = genai.Client(api_key=api_key)
 
-# Retrieve the list of available models
-models = client.models.list()
+    # Retrieve the list of available models
+    models = client.models.list()
 
-# Print the model names
-for model in models:
-    print(model.name)
\ No newline at end of file
+    # Print the model names
+    for model in models:
+        print(model.name)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable not set.")
+
+    check_llm(api_key)
+    list_models(api_key)
@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import threading
+from common import get_ist_timestamp_str
+from crewai import LLM
+from cache_store import CACHE_DIR, DiskCache, make_key
+import tracing
+import rate_limit
+import streaming
+from llm_router import provider_of
+
+# --- Content-addressed LLM response cache ---
+# LLM_CACHE selects the mode (default 'off'):
+#   on      - serve identical prompts from the cache, call the LLM on a miss and store the answer
+#   record  - always call the LLM and (over)write the answer in the cache
+#   replay  - answer only from the cache; a miss raises LLMCacheMiss, the LLM is never called
+# LLM_CACHE_AGENTS limits caching to some agents (comma-separated keys as used by
+# agents.create_specialist_agents(), e.g. 'researcher,writer'); default is all agents.
+# LLM_CACHE_DISABLED_AGENTS excludes agents from caching.
+
+LLM_CACHE_MODES = ("off", "on", "record", "replay")
+
+
+class LLMCacheMiss(RuntimeError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def get_cache_mode():
+    mode = os.getenv("LLM_CACHE", "off").strip().lower()
+    if mode not in LLM_CACHE_MODES:
+        raise ValueError(f"LLM_CACHE must be one of {', '.join(LLM_CACHE_MODES)}, got '{mode}'")
+    return mode
+
+
+def _agent_list(name):
+    return {a.strip() for a in os.getenv(name, "").split(",") if a.strip()}
+
+
+def is_enabled_for(agent_name):
+    """True if the response cache should wrap the LLM of the given agent."""
+    if get_cache_mode() == "off":
+        return False
+    enabled = _agent_list("LLM_CACHE_AGENTS")
+    if enabled and agent_name not in enabled:
+        return False
+    return agent_name not in _agent_list("LLM_CACHE_DISABLED_AGENTS")
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Process-wide response store. LLM_CACHE_PATH points a replay at a specific recording."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = DiskCache(
+                os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm.sqlite")),
+                namespace="responses",
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000)),
+            )
+    return _response_cache
+
+
+# Task descriptions start with a '[YYYYmmdd_HHMM]' creation stamp; it must not
+# stop a retried or replayed run from matching its recorded prompts.
+_TASK_STAMP = re.compile(r"\[\d{8}_\d{4}\]")
+
+def _normalize_messages(messages):
+    if isinstance(messages, str):
+        return _TASK_STAMP.sub("[]", messages)
+    normalized = []
+    for message in messages or []:
+        if isinstance(message, dict):
+            message = dict(message)
+            if isinstance(message.get("content"), str):
+                message["content"] = _TASK_STAMP.sub("[]", message["content"])
+        normalized.append(message)
+    return normalized
+
+
+class CachedLLM(LLM):
+    """
+    crewai LLM whose text responses are memoised on disk, keyed on the model,
+    the prompt messages, the tool schema and the temperature.
+    Calls that let the LLM execute tools itself (available_functions) are never
+    cached, so tool side effects such as writing files still happen.
+    """
+
+    def __init__(self, *args, agent_name=None, mode=None, cache=None, router=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.agent_name = agent_name
+        self.router = router  # llm_router.ModelRouter choosing between the agent's models, if it has several
+        self.cache_mode = mode or get_cache_mode()
+        # mode 'off' keeps only the tracing wrapper (see agents.build_llm)
+        self.response_cache = cache or (get_response_cache() if self.cache_mode != "off" else None)
+
+    def cache_key(self, messages, tools=None):
+        return make_key(
+            "llm-response-v1",
+            self.model,
+            _normalize_messages(messages),
+            tools or [],
+            getattr(self, "temperature", None),
+        )
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        with tracing.span(self.agent_name or self.model, kind="llm", model=self.model) as span:
+            usage_before = dict(getattr(self, "_token_usage", None) or {})
+            response = self._call(span, messages, tools, callbacks, available_functions, **kwargs)
+            if span is not tracing.NULL_SPAN and span.attrs.get("cache") != "hit":
+                _record_usage(span, self, usage_before, messages, response)
+            return response
+
+    def _call(self, span, messages, tools, callbacks, available_functions, **kwargs):
+        if self.cache_mode == "off" or available_functions:
+            span.set(cache="bypass")
+            return self._provider_call(messages, tools, callbacks, available_functions, **kwargs)
+
+        key = self.cache_key(messages, tools)
+        if self.cache_mode in ("on", "replay"):
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                print(f"[{get_ist_timestamp_str()}] LLM cache hit ({self.agent_name or self.model})")
+                span.set(cache="hit")
+                return cached["response"]
+            if self.cache_mode == "replay":
+                raise LLMCacheMiss(f"No recorded LLM response for agent '{self.agent_name}' (key {key[:12]})")
+
+        span.set(cache="miss")
+        response = self._provider_call(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(response, str):
+            self.response_cache.set(key, {"model": self.model, "agent": self.agent_name, "response": response})
+        return response
+
+    def _provider_call(self, messages, tools, callbacks, available_functions, **kwargs):
+        if getattr(self, "stream", False):
+            streaming.begin(self)  # a new response; see streaming.ArticleStream
+        if self.router is not None:
+            return self.router.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs)
+        # Goes through the provider's process-wide limiter, which also retries 429s and 5xx errors
+        limiter = rate_limit.get_limiter(f"llm:{provider_of(self.model)}")
+        prompt_tokens = len(json.dumps(_normalize_messages(messages), default=str)) // 4
+        response = limiter.call(
+            super().call, messages, tokens=prompt_tokens,
+            tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+        )
+        limiter.debit(len(str(response or "")) // 4)
+        return response
+
+
+def _record_usage(span, llm, usage_before, messages, response):
+    # crewai keeps running token totals on the LLM; without them, estimate ~4 characters per token
+    usage_after = getattr(llm, "_token_usage", None) or {}
+    if usage_after.get("prompt_tokens", 0) > usage_before.get("prompt_tokens", 0):
+        span.add("prompt_tokens", usage_after["prompt_tokens"] - usage_before.get("prompt_tokens", 0))
+        span.add("completion_tokens", usage_after.get("completion_tokens", 0) - usage_before.get("completion_tokens", 0))
+        return
+    prompt_chars = len(json.dumps(_normalize_messages(messages), default=str))
+    span.add("prompt_tokens", prompt_chars // 4)
+    span.add("completion_tokens", len(str(response or "")) // 4)
+    span.set(tokens_estimated=True)
+
+
+def llm_cache_stats():
+    """Hit/miss counters of the LLM response cache for this process."""
+    if _response_cache is None:
+        return {"mode": get_cache_mode()}
+    return dict(_response_cache.stats(), mode=get_cache_mode())
@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from common import env_flag, get_ist_timestamp_str
+import tracing
+import rate_limit
+
+# --- LLM routing ---
+# Each agent gets its own model list from the environment:
+#   LLM_MODEL                 default model of every agent (gemini/gemini-1.5-flash)
+#   LLM_MODEL_<AGENT>         comma-separated models for one agent, first = preferred,
+#                             e.g. LLM_MODEL_RESEARCHER=gemini/gemini-1.5-pro,groq/llama3-70b-8192
+#   LLM_FALLBACK_MODELS       models appended to every agent's list for failover
+# Every provider ('gemini', 'groq', ...) has its own rate limiter (rate_limit.py).
+# A model whose provider is cooling down after a 429, or that failed most of its
+# recent calls, is moved to the back; a call that hits a 429 or 5xx moves on to
+# the next model instead of waiting. With LLM_HEDGE=on, a call still running after
+# the model's rolling p95 latency is sent to the next model as well and whichever
+# answers first wins. Calls that run tools themselves (available_functions) are
+# never hedged. Providers are created with crewai's LLM; register_provider() adds
+# others, e.g. the offline fakes in benchmarks/routing.py.
+
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+LLM_HEDGE_ENABLED = env_flag("LLM_HEDGE", "off")
+# Hedge delay: the primary's rolling p95, but never below LLM_HEDGE_MIN_S;
+# LLM_HEDGE_AFTER_S until the model has LATENCY_MIN_SAMPLES calls on record
+LLM_HEDGE_MIN_S = float(os.getenv("LLM_HEDGE_MIN_S", 1.0))
+LLM_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", 10.0))
+LATENCY_WINDOW = 50
+LATENCY_MIN_SAMPLES = 5
+
+
+def provider_of(model):
+    return model.split("/", 1)[0] if "/" in model else model
+
+
+def models_for(agent_name, default):
+    """Preferred model first, then the agent's other models and the global fallbacks."""
+    configured = os.getenv(f"LLM_MODEL_{(agent_name or '').upper()}") or default
+    models = [m.strip() for m in configured.split(",") if m.strip()]
+    return models + [m for m in LLM_FALLBACK_MODELS if m not in models]
+
+
+def _crewai_llm(model):
+    from crewai import LLM
+    # litellm reads the other providers' keys (GROQ_API_KEY, OPENAI_API_KEY, ...) from the environment
+    api_key = os.getenv("GEMINI_API_KEY") if provider_of(model) == "gemini" else None
+    return LLM(model=model, api_key=api_key) if api_key else LLM(model=model)
+
+
+_PROVIDERS = {}
+
+def register_provider(prefix, factory):
+    """Makes models named '<prefix>/...' be built by factory(model) (an object with crewai LLM's call())."""
+    _PROVIDERS[prefix] = factory
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(model):
+    """One client per model for the whole process."""
+    with _clients_lock:
+        if model not in _clients:
+            _clients[model] = _PROVIDERS.get(provider_of(model), _crewai_llm)(model)
+        return _clients[model]
+
+
+class ModelStats:
+    """Rolling latency and error record of one model."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=LATENCY_WINDOW)  # True for success
+        self.counts = {"calls": 0, "errors": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.counts["calls"] += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+            else:
+                self.counts["errors"] += 1
+
+    def count(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def percentile(self, fraction):
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if len(ordered) < LATENCY_MIN_SAMPLES:
+            return None
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def error_rate(self):
+        with self._lock:
+            return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def to_dict(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            counts = dict(self.counts)
+        return dict(counts, p50_s=round(p50, 3) if p50 else None, p95_s=round(p95, 3) if p95 else None,
+                    error_rate=round(self.error_rate(), 3))
+
+
+_model_stats = {}
+_model_stats_lock = threading.Lock()
+
+def stats_for(model):
+    with _model_stats_lock:
+        return _model_stats.setdefault(model, ModelStats())
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_WORKERS", 16)), thread_name_prefix="hedge")
+        return _hedge_pool
+
+
+class ModelRouter:
+    """Sends one agent's LLM calls to the best of its models (see the module comment)."""
+
+    def __init__(self, models, hedge=None):
+        if not models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.models = list(models)
+        self.hedge = LLM_HEDGE_ENABLED if hedge is None else hedge
+
+    def candidates(self):
+        """Models in preference order; throttled and failing ones go last."""
+        def demoted(model):
+            throttled = rate_limit.get_limiter(f"llm:{provider_of(model)}").is_throttled()
+            stats = stats_for(model)
+            failing = len(stats.outcomes) >= LATENCY_MIN_SAMPLES and stats.error_rate() > 0.5
+            return throttled, failing
+        return sorted(self.models, key=lambda model: demoted(model))  # stable: keeps the configured order
+
+    def _attempt(self, model, last, messages, tokens, **kwargs):
+        """One call to `model`; 429s and 5xx are only retried in place when no other model is left."""
+        limiter = rate_limit.get_limiter(f"llm:{provider_of(model)}")
+        started = time.perf_counter()
+        try:
+            response = limiter.call(get_client(model).call, messages, tokens=tokens,
+                                    max_retries=None if last else 0, **kwargs)
+        except Exception:
+            stats_for(model).record(time.perf_counter() - started, ok=False)
+            raise
+        stats_for(model).record(time.perf_counter() - started, ok=True)
+        limiter.debit(len(str(response or "")) // 4)
+        return response
+
+    def _hedged(self, primary, backup, messages, tokens, **kwargs):
+        """Starts `primary`; if it is still running after its p95, starts `backup` too and returns the first answer."""
+        delay = max(LLM_HEDGE_MIN_S, stats_for(primary).percentile(0.95) or LLM_HEDGE_AFTER_S)
+        pool = _get_hedge_pool()
+        attempt = tracing.run_in_context(self._attempt)
+        futures = {pool.submit(attempt, primary, False, messages, tokens, **kwargs): primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            print(f"[{get_ist_timestamp_str()}] {primary} slower than {delay:.1f}s, hedging with {backup}")
+            stats_for(backup).count("hedges")
+            tracing.current_span().set(hedged=backup)
+            futures[pool.submit(attempt, backup, True, messages, tokens, **kwargs)] = backup
+        error = None
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                model = futures.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if model != primary:
+                    stats_for(model).count("hedge_wins")
+                return model, response  # a losing request finishes in the background and is dropped
+        raise error
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        """crewai LLM.call() signature; returns the first successful response."""
+        tokens = len(str(messages)) // 4
+        kwargs.update(tools=tools, callbacks=callbacks, available_functions=available_functions)
+        candidates = self.candidates()
+        span = tracing.current_span()
+        for index, model in enumerate(candidates):
+            remaining = candidates[index + 1:]
+            try:
+                if self.hedge and not available_functions:
+                    # With one model, the hedge is a second request to the same model
+                    backup = remaining[0] if remaining else model
+                    model, response = self._hedged(model, backup, messages, tokens, **kwargs)
+                else:
+                    response = self._attempt(model, not remaining, messages, tokens, **kwargs)
+            except Exception as e:
+                if rate_limit.error_status(e) not in rate_limit.RETRYABLE_STATUSES or not remaining:
+                    raise
+                stats_for(model).count("failovers")
+                print(f"[{get_ist_timestamp_str()}] {model} failed ({rate_limit.error_status(e)}), failing over to {remaining[0]}")
+                continue
+            span.set(routed_model=model, failovers=index)
+            return response
+
+
+def router_stats():
+    """Rolling latency, error and failover/hedge counters per model used in this process."""
+    with _model_stats_lock:
+        models = dict(_model_stats)
+    return dict({model: stats.to_dict() for model, stats in models.items()}, hedging=LLM_HEDGE_ENABLED)
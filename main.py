@@ -1,25 +1,17 @@
 import os
-from crewai import Crew, Process, Task # Task import needed for type hinting if used
+import argparse
 from dotenv import load_dotenv
-from datetime import datetime
-import pytz
+from common import get_ist_timestamp_str
 
 # --- Load Environment Variables ---
 load_dotenv()
 EMAIL_RECIPIENTS = os.getenv("EMAIL_RECIPIENTS", "") # Get email recipients
 if not EMAIL_RECIPIENTS:
     print("Warning: EMAIL_RECIPIENTS not found in .env. Email task will be skipped if requested.")
- 
+
 
 try:
-    from agents import (
-        researcher_agent,
-        writer_agent,
-        pdf_creator_agent,
-        audio_generator_agent,
-        email_sender_agent,
-        local_saver_agent  
-    )
+    from agents import default_agents
 except ImportError as e:
     print(f"FATAL ERROR: Could not import agents from agents.py: {e}")
     exit(1)
@@ -27,173 +19,457 @@ except ImportError as e:
 try:
     from tasks import (
         create_research_task,
+        create_research_synthesis_task,
         create_writing_task,
         create_pdf_task,
         create_audio_task,
         create_email_task,
-        create_save_local_task  
+        create_save_local_task,
+        create_direct_pdf_task,
+        create_direct_audio_task,
+        create_direct_email_task,
+        create_direct_save_local_task,
+        create_direct_compact_task,
+        create_direct_search_task
     )
 except ImportError as e:
     print(f"FATAL ERROR: Could not import task functions from tasks.py: {e}")
     exit(1)
 
-# --- Timezone & Output Setup ---
-def get_ist_timestamp_str(format_str="%Y%m%d_%H%M"):
-    """Gets the current timestamp in IST for unique filenames."""
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    return now_ist.strftime(format_str)
-
-output_dir = "outputs"
-os.makedirs(output_dir, exist_ok=True)
-print(f"Output directory: '{output_dir}'")
-
-# --- Get User Input & Analyze ---
-print(f"\nWelcome! [{datetime.now(pytz.timezone('Asia/Kolkata')).strftime('%Y-%m-%d %H:%M')}]")
-user_prompt = input("Describe newsletter topic & actions:\n> ").lower()
-
-# Basic extraction
-topic = user_prompt.split(",")[0].strip()
-do_pdf = 'pdf' in user_prompt or 'document' in user_prompt
-do_audio = 'audio' in user_prompt or 'mp3' in user_prompt
-do_email = 'email' in user_prompt and EMAIL_RECIPIENTS
-
-base_filename = "NewsLetter"
-timestamp = get_ist_timestamp_str()
-filename_base_ts = f"{base_filename}_{timestamp}" # Base name with timestamp for tools
-
-print(f"Topic: '{topic}' | PDF: {do_pdf} | Audio: {do_audio} | Email: {do_email}")
-print(f"Base filename for tools: '{filename_base_ts}'")
-
-
-email_recipient_list = EMAIL_RECIPIENTS
-
-# --- Calculate expected full paths ---
-expected_pdf_filepath = f"{output_dir}/{filename_base_ts}.pdf" if do_pdf else None
-expected_audio_filepath = f"{output_dir}/{filename_base_ts}.mp3" if do_audio else None
-
-print(f"Topic: '{topic}' | PDF: {do_pdf} | Audio: {do_audio} | Email: {do_email} to {email_recipient_list}")
-print(f"Base filename for tools: '{filename_base_ts}'")
-if expected_pdf_filepath: print(f"Expected PDF Path: {expected_pdf_filepath}")
-if expected_audio_filepath: print(f"Expected Audio Path: {expected_audio_filepath}")
-
-
-# --- Create Task List Sequentially using Imported Functions ---
-tasks_in_sequence = []
-# Use a set for agents to automatically handle uniqueness
-agents_in_crew = {researcher_agent, writer_agent}
-last_task_object = None # Tracks the last task added for context/dependency
-
-# 1. Research Task
-print("Creating Research Task...")
-research_task_obj = create_research_task(researcher_agent, topic)
-tasks_in_sequence.append(research_task_obj)
-last_task_object = research_task_obj
-
-# 2. Write Task
-print("Creating Writing Task...")
-write_task_obj = create_writing_task(writer_agent, topic, context=[last_task_object])
-tasks_in_sequence.append(write_task_obj)
-last_task_object = write_task_obj
-
-# 3. PDF Task (Conditional)
-pdf_task_object = None # Keep track if this task is created
-if do_pdf:
-    print("Creating PDF Task...")
-    agents_in_crew.add(pdf_creator_agent)
-    pdf_task_object = create_pdf_task(
-        agent=pdf_creator_agent,
-        topic=topic,
-        base_filename=filename_base_ts,
-        context=[last_task_object]
-    )
-    tasks_in_sequence.append(pdf_task_object)
-    last_task_object = pdf_task_object
-
-    # 3b. Save PDF Task (Conditional on PDF Task)
-    print("Creating Save PDF Task...")
-    agents_in_crew.add(local_saver_agent)
-    # Assuming create_save_local_task uses 'dependencies' to get the file path
-    save_pdf_task_obj = create_save_local_task(
-        agent=local_saver_agent,
-        file_producing_task=pdf_task_object, # Pass the task object that creates the file
-        context=[last_task_object] # Context from the pdf task itself
-    )
-    tasks_in_sequence.append(save_pdf_task_obj)
-    last_task_object = save_pdf_task_obj # Now this is the last task
-
-# 4. Audio Task (Conditional)
-audio_task_object = None # Keep track if this task is created
-if do_audio:
-    print("Creating Audio Task...")
-    agents_in_crew.add(audio_generator_agent)
-    # Audio task depends on the writer's script output
-    audio_context = [write_task_obj]
-    audio_task_object = create_audio_task(
-        agent=audio_generator_agent,
-        topic=topic,
-        base_filename=filename_base_ts,
-        context=audio_context
+from scheduler import TaskGraph
+from checkpoint import CHECKPOINTS_ENABLED, RunCheckpoint, new_run_id
+from artifacts import OUTPUT_ROOT, run_dir, run_directory, write_manifest
+from coalesce import COALESCE_ENABLED, COALESCE_WAIT_S, SHARED_TASKS, research_coalescer
+from compaction import COMPACTION_ENABLED
+from research import DEFAULT_RESEARCH_MODE, RESEARCH_MODES
+from research_memory import remember_report
+from streaming import STREAMING_ENABLED, ArticleStream, attach as attach_stream
+from topic_cache import TOPIC_CACHE_ENABLED, get_topic_cache
+import tracing
+
+# --- Output Setup ---
+output_dir = OUTPUT_ROOT # each run writes into its own output_dir/<run_id>/ (see artifacts.py)
+
+# 'direct' calls the PDF, audio, save and email tools straight from the graph;
+# 'llm' lets the specialist agents decide the tool calls as before.
+TOOL_AGENTS_MODES = ("direct", "llm")
+DEFAULT_TOOL_AGENTS_MODE = os.getenv("TOOL_AGENTS_MODE", "direct").strip().lower()
+
+
+def parse_recipients(recipients):
+    """Turns a comma-separated string (as in EMAIL_RECIPIENTS) or a list into a clean list of addresses."""
+    if not recipients:
+        return []
+    if isinstance(recipients, str):
+        recipients = recipients.split(",")
+    return [r.strip() for r in recipients if r and r.strip()]
+
+
+# --- Create Task Graph using Imported Functions ---
+def build_newsletter_graph(topic, filename_base_ts, do_pdf=False, do_audio=False, recipients=None, agents=None,
+                           tool_mode=None, run_output_dir=output_dir, compaction=None, research_mode=None):
+    """
+    Builds the task graph for one newsletter.
+    Dependencies come from each task's context links, so the PDF and audio
+    branches only wait for the writer and run side by side.
+    `agents` is a dict as returned by agents.create_specialist_agents().
+    `tool_mode` is 'direct' or 'llm' (see TOOL_AGENTS_MODE).
+    `run_output_dir` is the directory the run's tools write into.
+    `compaction` (default: COMPACTION) puts a local compaction step between research and writing.
+    `research_mode` (default: RESEARCH_MODE) is 'parallel' (concurrent searches, then one
+    synthesis pass by the Researcher) or 'agent' (the Researcher searches on its own).
+    """
+    agents = default_agents if agents is None else agents # A lazily built set is empty until its first lookup
+    recipients = parse_recipients(recipients)
+    tool_mode = tool_mode or DEFAULT_TOOL_AGENTS_MODE
+    if tool_mode not in TOOL_AGENTS_MODES:
+        raise ValueError(f"TOOL_AGENTS_MODE must be one of {', '.join(TOOL_AGENTS_MODES)}, got '{tool_mode}'")
+    direct = tool_mode == "direct"
+    research_mode = research_mode or DEFAULT_RESEARCH_MODE
+    if research_mode not in RESEARCH_MODES:
+        raise ValueError(f"RESEARCH_MODE must be one of {', '.join(RESEARCH_MODES)}, got '{research_mode}'")
+
+    # --- Calculate expected full paths ---
+    expected_pdf_filepath = os.path.join(run_output_dir, f"{filename_base_ts}.pdf") if do_pdf else None
+    expected_audio_filepath = os.path.join(run_output_dir, f"{filename_base_ts}.mp3") if do_audio else None
+    if expected_pdf_filepath: print(f"Expected PDF Path: {expected_pdf_filepath}")
+    if expected_audio_filepath: print(f"Expected Audio Path: {expected_audio_filepath}")
+
+    task_graph = TaskGraph()
+    last_task_object = None # Tracks the last task added for context/dependency
+    delivery_branch_tasks = [] # Last task of each file-producing branch, awaited by email
+
+    # 1. Research Task
+    print("Creating Research Task...")
+    if research_mode == "parallel":
+        # 1a. Search Task: expanded queries run concurrently, results merged and deduplicated
+        search_task_obj = create_direct_search_task(topic)
+        task_graph.add("search", search_task_obj)
+        # The search results reach the synthesizer through the graph edge, not crewai's context
+        research_task_obj = create_research_synthesis_task(agents["synthesizer"], topic)
+        task_graph.add("research", research_task_obj, depends_on=["search"])
+    else:
+        research_task_obj = create_research_task(agents["researcher"], topic)
+        task_graph.add("research", research_task_obj)
+    last_task_object = research_task_obj
+
+    # 1b. Compaction Task: dedupes and trims the research to a token budget before the Writer sees it
+    if COMPACTION_ENABLED if compaction is None else compaction:
+        compact_task_obj = create_direct_compact_task(topic, context=[research_task_obj])
+        task_graph.add("compact", compact_task_obj)
+        last_task_object = compact_task_obj
+
+    # 2. Write Task
+    print("Creating Writing Task...")
+    # crewai only accepts its own Tasks as context, so the edge from compaction (a DirectTask)
+    # is declared on the graph, which hands the Writer its upstream output as context text
+    write_task_obj = create_writing_task(agents["writer"], topic)
+    task_graph.add("write", write_task_obj, depends_on=[task_graph.last_key()])
+    last_task_object = write_task_obj
+
+    # 3. PDF Task (Conditional)
+    if do_pdf:
+        print("Creating PDF Task...")
+        if direct:
+            pdf_task_object = create_direct_pdf_task(base_filename=filename_base_ts, context=[write_task_obj])
+        else:
+            pdf_task_object = create_pdf_task(
+                agent=agents["pdf"],
+                topic=topic,
+                base_filename=filename_base_ts,
+                context=[write_task_obj]
+            )
+        task_graph.add("pdf", pdf_task_object)
+
+        # 3b. Save PDF Task (Conditional on PDF Task)
+        print("Creating Save PDF Task...")
+        if direct:
+            save_pdf_task_obj = create_direct_save_local_task(pdf_task_object, context=[pdf_task_object])
+        else:
+            save_pdf_task_obj = create_save_local_task(
+                agent=agents["saver"],
+                file_producing_task=pdf_task_object, # Pass the task object that creates the file
+                context=[pdf_task_object] # Context from the pdf task itself
+            )
+        task_graph.add("save_pdf", save_pdf_task_obj)
+        delivery_branch_tasks.append(save_pdf_task_obj)
+
+    # 4. Audio Task (Conditional)
+    if do_audio:
+        print("Creating Audio Task...")
+        # Audio task depends on the writer's script output
+        if direct:
+            audio_task_object = create_direct_audio_task(base_filename=filename_base_ts, context=[write_task_obj])
+        else:
+            audio_task_object = create_audio_task(
+                agent=agents["audio"],
+                topic=topic,
+                base_filename=filename_base_ts,
+                context=[write_task_obj]
+            )
+        task_graph.add("audio", audio_task_object)
+
+        # 4b. Save Audio Task (Conditional on Audio Task)
+        print("Creating Save Audio Task...")
+        if direct:
+            save_audio_task_obj = create_direct_save_local_task(audio_task_object, context=[audio_task_object])
+        else:
+            save_audio_task_obj = create_save_local_task(
+                agent=agents["saver"],
+                file_producing_task=audio_task_object, # Pass the audio task object
+                context=[audio_task_object] # Context from the audio task
+            )
+        task_graph.add("save_audio", save_audio_task_obj)
+        delivery_branch_tasks.append(save_audio_task_obj)
+
+    # 5. Email Task (Conditional)
+    if recipients:
+        print("Creating Email Task...")
+        email_subject = f"Newsletter by CrewAI BOT - {get_ist_timestamp_str()}"
+        email_body = f"Hi,\n\nPlease find the newsletter generated from the prompt:  '{topic}'.\n\nBest regards,\nYour CrewAI Bot"
+
+        # Email waits only on the branches whose files it attaches
+        email_context = delivery_branch_tasks or [write_task_obj]
+
+        if direct:
+            # Attachments are the paths returned by the save tasks in the context
+            email_task_obj = create_direct_email_task(
+                recipient_list=recipients,
+                subject=email_subject,
+                body=email_body,
+                context=email_context
+            )
+        else:
+            email_task_obj = create_email_task(
+                agent=agents["email"],
+                recipient_list=recipients,
+                subject=email_subject,
+                body=email_body,
+                # Pass the expected paths directly
+                expected_pdf_path=expected_pdf_filepath,
+                expected_audio_path=expected_audio_filepath,
+                context=email_context
+            )
+        task_graph.add("email", email_task_obj)
+
+    return task_graph
+
+
+def run_newsletter(topic, do_pdf=False, do_audio=False, do_email=False, recipients=None,
+                   base_filename="NewsLetter", agents=None, task_workers=None, tool_mode=None,
+                   checkpoint=None, coalesce=None, compaction=None, research_mode=None, streaming=None,
+                   topic_cache=None):
+    """
+    Builds and runs the task graph for one newsletter.
+    Each run gets a run ID, writes its files into output_dir/<run_id>/ and is
+    checkpointed there (see checkpoint.py); pass the `checkpoint` of an earlier
+    run to continue it (see resume_newsletter()).
+    With `coalesce` (default: COALESCE), runs of the same topic share one research
+    and writing pass and only run their own delivery tasks (see coalesce.py).
+    `compaction` (default: COMPACTION) shrinks the research before writing (see compaction.py).
+    `research_mode` (default: RESEARCH_MODE) picks parallel or agent-driven research (see research.py).
+    With `streaming` (default: STREAMING), PDF layout and speech synthesis start on
+    the Writer's finished sections while it is still writing (see streaming.py).
+    With `topic_cache` (default: TOPIC_CACHE), a recent newsletter on a near-duplicate
+    topic is reused or its research rewritten (see topic_cache.py).
+    Returns a dict with the run ID, its directory and manifest, the base filename, artifact paths,
+    every task's raw output and timing, and the final output.
+    """
+    recipients = parse_recipients(recipients if recipients is not None else EMAIL_RECIPIENTS)
+    if do_email and not recipients:
+        print("Warning: Email requested but no recipients configured. Skipping email task.")
+    email_recipients = recipients if do_email else []
+    tool_mode = tool_mode or DEFAULT_TOOL_AGENTS_MODE
+    compaction = COMPACTION_ENABLED if compaction is None else compaction
+    research_mode = research_mode or DEFAULT_RESEARCH_MODE
+
+    if checkpoint is not None:
+        # A resumed run keeps its filenames so the graph and expected paths match the checkpoint
+        filename_base_ts = checkpoint.params["filename_base"]
+    else:
+        timestamp = get_ist_timestamp_str()
+        filename_base_ts = f"{base_filename}_{timestamp}" # Base name with timestamp for tools
+        if CHECKPOINTS_ENABLED:
+            checkpoint = RunCheckpoint.create({
+                "topic": topic,
+                "do_pdf": do_pdf,
+                "do_audio": do_audio,
+                "email_recipients": email_recipients,
+                "filename_base": filename_base_ts,
+                "tool_mode": tool_mode,
+                "compaction": compaction,
+                "research_mode": research_mode,
+            }, run_id=new_run_id())
+    run_id = checkpoint.run_id if checkpoint is not None else new_run_id()
+    run_output_dir = run_dir(run_id, output_dir)
+
+    print(f"Topic: '{topic}' | PDF: {do_pdf} | Audio: {do_audio} | Email: {bool(email_recipients)} to {email_recipients}")
+    print(f"Base filename for tools: '{filename_base_ts}' | Run ID: {run_id} | Output directory: '{run_output_dir}'")
+
+    task_graph = build_newsletter_graph(
+        topic,
+        filename_base_ts,
+        do_pdf=do_pdf,
+        do_audio=do_audio,
+        recipients=email_recipients,
+        agents=agents,
+        tool_mode=tool_mode,
+        run_output_dir=run_output_dir,
+        compaction=compaction,
+        research_mode=research_mode
     )
-    tasks_in_sequence.append(audio_task_object)
-    last_task_object = audio_task_object # Update last task
-
-    # 4b. Save Audio Task (Conditional on Audio Task)
-    print("Creating Save Audio Task...")
-    agents_in_crew.add(local_saver_agent)
-    save_audio_task_obj = create_save_local_task(
-        agent=local_saver_agent,
-        file_producing_task=audio_task_object, # Pass the audio task object
-        context=[last_task_object] # Context from the audio task
-    )
-    tasks_in_sequence.append(save_audio_task_obj)
-    last_task_object = save_audio_task_obj # Now this is the last task
-
-
 
-
-
-# 5. Email Task (Conditional)
-if do_email:
-    print("Creating Email Task...")
-    agents_in_crew.add(email_sender_agent)
-    email_subject = f"Newsletter by CrewAI BOT - {timestamp}"
-    email_body = f"Hi,\n\nPlease find the newsletter generated from the prompt:  '{topic}'.\n\nBest regards,\nYour CrewAI Bot"
-
-    # Context is the last task that was actually added to the sequence
-    email_context = [last_task_object]
-
-    # Call the MODIFIED create_email_task function
-    email_task_obj = create_email_task(
-        agent=email_sender_agent,
-        recipient_list=EMAIL_RECIPIENTS, # Pass the parsed list
-        subject=email_subject,
-        body=email_body,
-        # Pass the expected paths directly
-        expected_pdf_path=expected_pdf_filepath,
-        expected_audio_path=expected_audio_filepath,
-        context=email_context
+    # --- Run the Task Graph ---
+    agent_roles = sorted({task.agent.role for task in task_graph.nodes.values() if task.agent is not None})
+    print(f"\nRunning task graph with {len(task_graph.nodes)} tasks for agents: {agent_roles}")
+    for task_key, upstream_keys in task_graph.depends_on.items():
+        print(f"  {task_key} <- {', '.join(upstream_keys) or '(start)'}")
+
+    # Outputs of tasks that finished in an earlier attempt of this run
+    completed = {}
+    if checkpoint is not None and checkpoint.state["tasks"]:
+        completed, problems = checkpoint.completed_outputs(task_graph)
+        for task_key, reason in problems.items():
+            print(f"Re-running task '{task_key}': {reason}")
+        print(f"Resuming run '{run_id}', reusing finished tasks: {', '.join(completed) or '(none)'}")
+    resumed_tasks = sorted(completed)
+
+    coalesce = COALESCE_ENABLED if coalesce is None else coalesce
+    coalesced, shared = None, None
+    streaming = STREAMING_ENABLED if streaming is None else streaming
+    article_stream = None
+    # The process-wide cache, or None; an explicit topic_cache=True uses it even with TOPIC_CACHE=off
+    topic_cache = get_topic_cache(force=True) if (TOPIC_CACHE_ENABLED if topic_cache is None else topic_cache) else None
+    topic_match = None
+
+    def on_task_complete(task_key, raw_output, timing):
+        if checkpoint is not None:
+            checkpoint.record_task(task_key, raw_output, timing)
+        if coalesced == "leader":
+            shared.publish(task_key, raw_output)
+        if task_key == "research":
+            # Later runs on related topics get its passages as notes (research_memory.py)
+            remember_report(topic, raw_output)
+        if task_key == "write" and article_stream is not None:
+            # Before the PDF and audio tasks start, so they find the streamed work
+            article_stream.close(raw_output)
+
+    print(f"\n[{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] Kicking off the task graph...")
+    status = "failed"
+    try:
+        # Tools called by the tasks write into run_output_dir; TRACING=on adds trace_<filename_base>.json there
+        with run_directory(run_output_dir, run_id=run_id, topic=topic), tracing.start_trace(filename_base_ts, output_dir=run_output_dir) as trace:
+            shared_keys = [key for key in SHARED_TASKS if key in task_graph.nodes]
+            if topic_cache is not None and shared_keys and not any(key in completed for key in shared_keys):
+                with tracing.span("topic_cache", kind="step") as span:
+                    topic_match = topic_cache.lookup(topic, research_mode, compaction)
+                    # 'refresh' keeps the research but has the article written again
+                    reused_keys = [key for key in shared_keys if topic_match is not None and (topic_match["action"] == "reuse" or key != "write")]
+                    if topic_match is not None and all(key in topic_match["outputs"] for key in reused_keys):
+                        span.set(action=topic_match["action"], similarity=topic_match["similarity"], source_run=topic_match["run_id"])
+                        reused = "research and article; the Writer is skipped" if topic_match["action"] == "reuse" else "research; the article is written again"
+                        print(f"Topic '{topic}' matches '{topic_match['topic']}' of run '{topic_match['run_id']}' "
+                              f"(similarity {topic_match['similarity']}, {topic_match['age_s'] / 60:.0f} min ago): reusing its {reused}")
+                        for task_key in reused_keys:
+                            completed[task_key] = topic_match["outputs"][task_key]
+                            if checkpoint is not None:
+                                checkpoint.record_task(task_key, completed[task_key])
+                    else:
+                        span.set(action="miss")
+                        topic_match = None
+            if coalesce and not all(key in completed for key in shared_keys):
+                coalesced, shared = research_coalescer.join(topic, run_id, research_mode, compaction)
+            if coalesced == "leader":
+                for task_key in SHARED_TASKS:
+                    if task_key in completed:  # reused from this run's checkpoint
+                        shared.publish(task_key, completed[task_key])
+            if coalesced in ("in_flight", "recent"):
+                print(f"Sharing research and writing of run '{shared.leader_run_id}' for topic '{shared.key}' ({coalesced})")
+                with tracing.span("coalesce_wait", kind="step", role=coalesced, leader=shared.leader_run_id):
+                    shared_outputs = shared.wait(COALESCE_WAIT_S)
+                if shared_outputs is None:
+                    reason = "failed before writing" if shared.error is not None else f"has not written after {COALESCE_WAIT_S:.0f} s"
+                    print(f"Run '{shared.leader_run_id}' {reason}; running research here instead.")
+                    coalesced = "fallback"
+                else:
+                    for task_key, raw_output in shared_outputs.items():
+                        completed[task_key] = raw_output
+                        if checkpoint is not None:
+                            checkpoint.record_task(task_key, raw_output)
+            write_task_obj = task_graph.nodes.get("write")
+            if streaming and (do_pdf or do_audio) and write_task_obj is not None and "write" not in completed:
+                article_stream = ArticleStream(pdf=do_pdf, audio=do_audio)
+            writer_llm = getattr(getattr(write_task_obj, "agent", None), "llm", None)
+            with attach_stream(writer_llm, article_stream):
+                task_outputs = task_graph.run(
+                    max_workers=task_workers,
+                    completed=completed,
+                    on_task_complete=on_task_complete
+                )
+        status = "completed"
+    except Exception as e:
+        if checkpoint is not None:
+            checkpoint.finish("failed", f"{type(e).__name__}: {e}")
+            print(f"\nRun '{run_id}' failed. Finished tasks are saved; continue with: python main.py --resume {run_id}")
+        raise
+    finally:
+        if coalesced == "leader":
+            # Runs waiting on this one do their own research if it stopped before writing finished
+            research_coalescer.fail(shared, f"Run '{run_id}' {status} before writing finished")
+        if article_stream is not None:
+            article_stream.discard()
+        manifest_path = write_manifest(run_output_dir, run_id, topic=topic, status=status, filename_base=filename_base_ts)
+    if checkpoint is not None:
+        checkpoint.finish("completed")
+    if topic_cache is not None and "write" in task_graph.nodes and "write" not in completed:
+        # Only articles written by this run; research reused by a refresh keeps its age
+        topic_cache.remember(
+            run_id, topic, {key: task_outputs[key] for key in SHARED_TASKS if key in task_outputs},
+            research_mode, compaction, researched_at=topic_match["researched_at"] if topic_match is not None else None)
+    print(f"\n--- Task Graph Execution Finished [{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] ---")
+
+    return {
+        "run_id": run_id,
+        "topic": topic,
+        "output_dir": run_output_dir,
+        "manifest_path": manifest_path,
+        "filename_base": filename_base_ts,
+        "pdf_path": os.path.join(run_output_dir, f"{filename_base_ts}.pdf") if do_pdf else None,
+        "audio_path": os.path.join(run_output_dir, f"{filename_base_ts}.mp3") if do_audio else None,
+        "email_recipients": email_recipients,
+        "task_outputs": task_outputs,
+        "task_timings": task_graph.timings,
+        "trace_path": trace.path if trace else None,
+        "checkpoint_path": checkpoint.path if checkpoint is not None else None,
+        "resumed_tasks": resumed_tasks,
+        "coalesced": coalesced,
+        "compaction": getattr(task_graph.nodes.get("compact"), "stats", None),
+        "research": getattr(task_graph.nodes.get("search"), "stats", None),
+        "streaming": article_stream.stats if article_stream is not None else None,
+        "shared_research_run_id": shared.leader_run_id if shared is not None else None,
+        "topic_cache": {key: topic_match[key] for key in ("action", "similarity", "run_id", "topic", "age_s")} if topic_match is not None else None,
+        "final_output": task_outputs[task_graph.last_key()],
+    }
+
+
+def resume_newsletter(run_id, agents=None, task_workers=None):
+    """Continues a checkpointed run: finished tasks are reused, the rest of its task graph is run."""
+    checkpoint = RunCheckpoint.load(run_id)
+    params = checkpoint.params
+    return run_newsletter(
+        params["topic"],
+        do_pdf=params["do_pdf"],
+        do_audio=params["do_audio"],
+        do_email=bool(params["email_recipients"]),
+        recipients=params["email_recipients"],
+        agents=agents,
+        task_workers=task_workers,
+        tool_mode=params["tool_mode"],
+        checkpoint=checkpoint,
+        compaction=params.get("compaction", False), # runs checkpointed before compaction existed had none
+        research_mode=params.get("research_mode", "agent") # or before parallel research
     )
-    tasks_in_sequence.append(email_task_obj)
-    # last_task_object = email_task_obj # Update if needed
-
-
-# --- Create and Run the Crew ---
-final_agent_list = list(agents_in_crew)
-print(f"\nCreating crew with {len(tasks_in_sequence)} tasks for agents: {[agent.role for agent in final_agent_list]}")
-
-newsletter_crew = Crew(
-    agents=final_agent_list,
-    tasks=tasks_in_sequence,
-    process=Process.sequential,
-    verbose=1
-)
 
-print(f"\n[{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] Kicking off the crew...")
-result = newsletter_crew.kickoff()
 
-print(f"\n--- Crew Execution Finished [{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] ---")
-print("\nFinal Result (Output of the LAST task):")
-final_output = getattr(result, 'raw', str(result))
-print(final_output)
-print(f"\n--- Check '{output_dir}' directory for generated files. ---")
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a newsletter with a crew of AI agents.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue a failed or interrupted run from its checkpoint")
+    args = parser.parse_args(argv)
+
+    print(f"Output directory: '{output_dir}'")
+
+    # TASK_WORKERS=1 runs the tasks one after another like the old sequential crew
+    task_workers = int(os.getenv("TASK_WORKERS", "0")) or None
+
+    if args.resume:
+        print(f"\nResuming run '{args.resume}' [{get_ist_timestamp_str('%Y-%m-%d %H:%M')}]")
+        result = resume_newsletter(args.resume, task_workers=task_workers)
+    else:
+        # --- Get User Input & Analyze ---
+        print(f"\nWelcome! [{get_ist_timestamp_str('%Y-%m-%d %H:%M')}]")
+        user_prompt = input("Describe newsletter topic & actions:\n> ").lower()
+
+        # Basic extraction
+        topic = user_prompt.split(",")[0].strip()
+        do_pdf = 'pdf' in user_prompt or 'document' in user_prompt
+        do_audio = 'audio' in user_prompt or 'mp3' in user_prompt
+        do_email = 'email' in user_prompt
+
+        result = run_newsletter(
+            topic,
+            do_pdf=do_pdf,
+            do_audio=do_audio,
+            do_email=do_email,
+            task_workers=task_workers
+        )
+
+    print("\nFinal Result (Output of the LAST task):")
+    print(result["final_output"])
+    from stats import print_stats
+    print()
+    print_stats()
+    print(f"\n--- Check '{result['output_dir']}' directory for generated files (listed in {result['manifest_path']}). ---")
+
+
+if __name__ == "__main__":
+    main()
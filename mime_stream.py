@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import uuid
+import base64
+import hashlib
+import smtplib
+import threading
+from email.header import Header
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+from cache_store import CACHE_DIR
+import tracing
+
+# --- Streaming MIME messages ---
+# Attachments are base64-encoded in small chunks into a cache file keyed by the
+# SHA-256 of their content, then streamed to the SMTP socket from that file.
+# Memory stays bounded by the chunk size whatever the attachment size, and a
+# newsletter sent to many recipients (or in many runs) is encoded only once.
+
+MIME_CACHE_DIR = os.path.join(CACHE_DIR, "mime")
+MIME_CACHE_MAX_AGE = int(os.getenv("MIME_CACHE_MAX_AGE_DAYS", 7)) * 24 * 60 * 60
+READ_CHUNK = 57 * 1024  # multiple of 57 raw bytes, so every chunk encodes to whole 76-char lines
+STREAM_CHUNK = 64 * 1024
+CRLF = b"\r\n"
+
+_encode_locks = {}
+_encode_locks_guard = threading.Lock()
+_digest_memo = {}  # (path, size, mtime) -> sha256, saves re-hashing unchanged files
+
+
+def file_sha256(path):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+def _prune_mime_cache():
+    cutoff = time.time() - MIME_CACHE_MAX_AGE
+    for name in os.listdir(MIME_CACHE_DIR):
+        path = os.path.join(MIME_CACHE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def encoded_attachment(path):
+    """Returns the path of the base64 (76-char CRLF lines) encoding of `path`, encoding it on first use."""
+    digest = file_sha256(path)
+    encoded_path = os.path.join(MIME_CACHE_DIR, f"{digest}.b64")
+    if os.path.exists(encoded_path):
+        os.utime(encoded_path)  # keep recently used encodings from being pruned
+        return encoded_path
+
+    with _encode_locks_guard:
+        lock = _encode_locks.setdefault(digest, threading.Lock())
+    with lock:
+        if os.path.exists(encoded_path):
+            return encoded_path
+        os.makedirs(MIME_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{encoded_path}.{uuid.uuid4().hex}.tmp"
+        with open(path, "rb") as source, open(tmp_path, "wb") as target:
+            for chunk in iter(lambda: source.read(READ_CHUNK), b""):
+                encoded = base64.b64encode(chunk)
+                for start in range(0, len(encoded), 76):
+                    target.write(encoded[start:start + 76] + CRLF)
+        os.replace(tmp_path, encoded_path)  # concurrent runs never see a half-written file
+        _prune_mime_cache()
+    return encoded_path
+
+
+def _dot_stuff(data):
+    # SMTP DATA ends at a line holding a single '.', so lines starting with '.' get an extra one
+    return re.sub(rb"(?m)^\.", b"..", data)
+
+
+class StreamingMessage:
+    """
+    multipart/mixed message (plain-text body + attachments) that is serialised
+    chunk by chunk instead of being built in memory with as_string().
+    """
+
+    def __init__(self, sender, subject, body, attachment_paths=None):
+        self.sender = sender
+        self.subject = subject
+        self.boundary = f"===============_{uuid.uuid4().hex}=="
+        body_part = MIMEText(body, "plain")
+        del body_part["MIME-Version"]
+        self._body_bytes = _dot_stuff(body_part.as_bytes(policy=body_part.policy.clone(linesep="\r\n")))
+        # Encode every attachment up front (once per content hash)
+        self.attachments = [(os.path.basename(p), encoded_attachment(p)) for p in (attachment_paths or [])]
+
+    def _headers(self, recipient):
+        subject = Header(self.subject, "utf-8").encode() if not self.subject.isascii() else self.subject
+        lines = [
+            # Folded the way email.generator folds it, the boundary makes the line too long
+            f"Content-Type: multipart/mixed;\r\n boundary=\"{self.boundary}\"",
+            "MIME-Version: 1.0",
+            f"From: {self.sender}",
+            f"To: {recipient}",
+            f"Subject: {subject}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {make_msgid()}",
+        ]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+    def iter_chunks(self, recipient):
+        """Yields the dot-stuffed message for `recipient` as CRLF bytes, at most STREAM_CHUNK at a time."""
+        delimiter = f"--{self.boundary}\r\n".encode("ascii")
+        yield self._headers(recipient)
+        yield delimiter + self._body_bytes + CRLF
+        for filename, encoded_path in self.attachments:
+            yield delimiter + (
+                "Content-Type: application/octet-stream\r\n"
+                "MIME-Version: 1.0\r\n"
+                "Content-Transfer-Encoding: base64\r\n"
+                f"Content-Disposition: attachment; filename={filename}\r\n\r\n"
+            ).encode("utf-8")
+            # base64 lines never start with '.', so no dot-stuffing needed here
+            with open(encoded_path, "rb") as encoded:
+                for chunk in iter(lambda: encoded.read(STREAM_CHUNK), b""):
+                    yield chunk
+            yield CRLF  # the payload's line break before the next boundary, as email.generator writes it
+        yield f"--{self.boundary}--\r\n".encode("ascii")
+
+
+def send_streaming(server, sender, recipient, message):
+    """
+    Runs one SMTP transaction on an open smtplib.SMTP session, streaming the DATA section.
+    A refused transaction is left for the caller to RSET (see SMTPConnectionPool.connection).
+    """
+    server.ehlo_or_helo_if_needed()
+    code, response = server.mail(sender)
+    if code != 250:
+        raise smtplib.SMTPSenderRefused(code, response, sender)
+    code, response = server.rcpt(recipient)
+    if code not in (250, 251):
+        raise smtplib.SMTPRecipientsRefused({recipient: (code, response)})
+    server.putcmd("data")
+    code, response = server.getreply()
+    if code != 354:
+        raise smtplib.SMTPDataError(code, response)
+    sent_bytes = 0
+    for chunk in message.iter_chunks(recipient):
+        server.send(chunk)
+        sent_bytes += len(chunk)
+    tracing.current_span().add("bytes_sent", sent_bytes)
+    server.send(b"." + CRLF)
+    code, response = server.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, response)
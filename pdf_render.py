@@ -0,0 +1,377 @@
+import io
+import os
+import re
+import copy
+import time
+import hashlib
+import threading
+import unicodedata
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+import fpdf
+from fpdf import FPDF
+
+# --- Newsletter PDF rendering ---
+# The Writer's output is markdown-ish text. It is parsed into blocks (headings,
+# bullet/numbered lists, rules, paragraphs) and laid out with a Unicode TrueType
+# font when one is available. Font lookup and the page template are set up once
+# per process (get_pdf_renderer()), and so is parsing the TrueType metrics: fpdf2
+# reads them on every add_font, so the renderer parses each font once and gives
+# every document a copy with its own glyph subset. Batch and service runs render
+# on a shared process pool (start_render_pool(), render_pdf()), so concurrent runs
+# lay their PDFs out in parallel instead of taking turns on the GIL. While the
+# Writer streams, streaming.py lays the article out section by section
+# (IncrementalDocument) and offers the finished file to render().
+
+FPDF_MAJOR = int(str(getattr(fpdf, "__version__", getattr(fpdf, "FPDF_VERSION", "1.7"))).split(".")[0])
+
+# Checked in order when PDF_FONT_PATH is not set; bold variants sit next to them
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+)
+
+# Typographic characters that core (latin-1) fonts cannot show, mapped to plain equivalents
+_ASCII_FALLBACKS = {
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201c": '"', "\u201d": '"', "\u201e": '"',
+    "\u2013": "-", "\u2014": "-", "\u2212": "-", "\u2026": "...", "\u2022": "-", "\u00a0": " ",
+    "\u200b": "", "\u2122": "(TM)", "\u20ac": "EUR", "\u2192": "->", "\u2190": "<-",
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_BULLET = re.compile(r"^\s*[-*+\u2022]\s+(.*)$")
+_NUMBERED = re.compile(r"^\s*(\d+)[.)]\s+(.*)$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_BOLD_LINE = re.compile(r"^\*\*(.+?)\*\*:?$")
+
+
+def _strip_inline_markdown(text):
+    text = re.sub(r"\[([^\]]+)\]\((\S+?)\)", r"\1 (\2)", text)  # [label](url) -> label (url)
+    text = re.sub(r"(\*\*|__)(.+?)\1", r"\2", text)
+    text = re.sub(r"(?<![\w*])[*_](\S(?:.*?\S)?)[*_](?![\w*])", r"\1", text)
+    return text.replace("`", "")
+
+
+def parse_blocks(text):
+    """Turns markdown-ish text into a list of (kind, text) blocks."""
+    blocks = []
+    paragraph = []
+
+    def flush():
+        if paragraph:
+            blocks.append(("paragraph", _strip_inline_markdown(" ".join(paragraph))))
+            paragraph.clear()
+
+    for line in text.replace("\r\n", "\n").split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            flush()
+            continue
+        if _RULE.match(stripped):
+            flush()
+            blocks.append(("rule", ""))
+        elif _HEADING.match(stripped):
+            flush()
+            hashes, title = _HEADING.match(stripped).groups()
+            blocks.append((f"h{min(len(hashes), 3)}", _strip_inline_markdown(title.strip("# "))))
+        elif _BOLD_LINE.match(stripped):
+            flush()
+            blocks.append(("h3", _strip_inline_markdown(_BOLD_LINE.match(stripped).group(1))))
+        elif _BULLET.match(line):
+            flush()
+            blocks.append(("bullet", _strip_inline_markdown(_BULLET.match(line).group(1))))
+        elif _NUMBERED.match(line):
+            flush()
+            number, item = _NUMBERED.match(line).groups()
+            blocks.append(("numbered", f"{number}.\t{_strip_inline_markdown(item)}"))
+        else:
+            paragraph.append(stripped)
+    flush()
+    return blocks
+
+
+def resolve_fonts():
+    """Returns (regular_path, bold_path) of a Unicode TrueType font, or (None, None) to use core fonts."""
+    configured = os.getenv("PDF_FONT_PATH")
+    for regular in ((configured,) if configured else FONT_CANDIDATES):
+        if regular and os.path.isfile(regular):
+            bold = os.getenv("PDF_BOLD_FONT_PATH") or re.sub(r"(\.ttf)$", r"-Bold\1", regular, flags=re.I)
+            return regular, bold if os.path.isfile(bold) else regular
+    return None, None
+
+
+class NewsletterPDF(FPDF):
+    """Page template: page numbers in the footer."""
+    footer_font = ("Helvetica", "", 8)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font(*self.footer_font)
+        self.set_text_color(128)
+        self.multi_cell(0, 5, f"Page {self.page_no()}", align="C")
+        self.set_text_color(0)
+
+
+class PDFRenderer:
+    """Lays out newsletters with one font setup shared by every document rendered in this process."""
+
+    SIZES = {"h1": 18, "h2": 15, "h3": 13, "paragraph": 11, "bullet": 11, "numbered": 11}
+    LINE_HEIGHT = 1.45  # line height as a multiple of the font size in points
+    PT_TO_MM = 0.3528
+
+    def __init__(self):
+        self.font_path, self.bold_font_path = resolve_fonts()
+        self.unicode = self.font_path is not None
+        self.family = "NewsletterSans" if self.unicode else "Helvetica"
+        if self.unicode and FPDF_MAJOR < 2:
+            # PyFPDF 1.7 parses TrueType metrics on every add_font unless it may cache them
+            font_cache = os.path.join(os.getenv("NEWSLETTER_CACHE_DIR", ".cache"), "fonts")
+            os.makedirs(font_cache, exist_ok=True)
+            fpdf.set_global("FPDF_CACHE_MODE", 2)
+            fpdf.set_global("FPDF_CACHE_DIR", font_cache)
+        self._fonts = {}  # (style, path) -> (parsed fpdf2 TTFFont, font file bytes), or None if it can't be shared
+        self._fonts_lock = threading.Lock()
+
+    def settings(self):
+        """Everything besides the text that affects the rendered file (used as part of artifact keys)."""
+        return {
+            "fpdf": FPDF_MAJOR,
+            "fonts": [self.font_path, self.bold_font_path],
+            "sizes": self.SIZES,
+            "line_height": self.LINE_HEIGHT,
+        }
+
+    def _parsed_font(self, pdf, style, path):
+        from fpdf.fonts import TTFFont
+        from fontTools import ttLib
+        key = (style, path)
+        with self._fonts_lock:
+            if key not in self._fonts:
+                font = TTFFont(pdf, path, f"{self.family.lower()}{style}", style)
+                with open(path, "rb") as file:
+                    data = file.read()
+                fresh = ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False, lazy=True)
+                # Fonts fpdf2 patches while parsing (no .notdef glyph), CFF and colour fonts are added the usual way
+                shareable = not font.is_cff and font.color_font is None and ("glyf" not in fresh or ".notdef" in fresh["glyf"])
+                self._fonts[key] = (font, data) if shareable else None
+            return self._fonts[key]
+
+    def _add_font(self, pdf, style, path):
+        """pdf.add_font(), reusing the metrics parsed for earlier documents under fpdf2."""
+        if FPDF_MAJOR < 2:
+            pdf.add_font(self.family, style, path, uni=True)
+            return
+        parsed = self._parsed_font(pdf, style, path)
+        if parsed is None:
+            pdf.add_font(self.family, style, path)
+            return
+        from fpdf.fonts import SubsetMap
+        from fontTools import ttLib
+        template, data = parsed
+        # Widths, cmap and glyph ids are shared read-only; the font file is subset
+        # in place when the document is written, so each document opens its own
+        font = copy.copy(template)
+        font.i = len(pdf.fonts) + 1
+        font.ttfont = ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False, lazy=True)
+        font._hbfont = None
+        font.biggest_size_pt = 0
+        font.missing_glyphs = []
+        font.subset = SubsetMap(font)
+        pdf.fonts[font.fontkey] = font
+
+    def _new_document(self):
+        pdf = NewsletterPDF()
+        if self.unicode:
+            self._add_font(pdf, "", self.font_path)
+            self._add_font(pdf, "B", self.bold_font_path)
+            pdf.footer_font = (self.family, "", 8)
+        pdf.set_auto_page_break(auto=True, margin=18)
+        pdf.set_margins(18, 18, 18)
+        pdf.add_page()
+        return pdf
+
+    def _clean(self, text):
+        text = unicodedata.normalize("NFC", text)
+        if self.unicode:
+            return text.replace("\u200b", "")
+        for char, replacement in _ASCII_FALLBACKS.items():
+            text = text.replace(char, replacement)
+        return text.encode("latin-1", "replace").decode("latin-1")
+
+    def _write(self, pdf, text, size, style="", indent=0):
+        pdf.set_font(self.family, style, size)
+        pdf.set_x(pdf.l_margin + indent)
+        width = pdf.w - pdf.r_margin - pdf.l_margin - indent
+        pdf.multi_cell(width, size * self.LINE_HEIGHT * self.PT_TO_MM, self._clean(text))
+
+    def layout(self, pdf, blocks):
+        """Appends parsed blocks to an open document."""
+        for kind, text in blocks:
+            if kind in ("h1", "h2", "h3"):
+                pdf.ln(3 if kind == "h3" else 5)
+                self._write(pdf, text, self.SIZES[kind], style="B")
+                pdf.ln(1)
+            elif kind == "bullet":
+                bullet = "\u2022" if self.unicode else "-"
+                self._write(pdf, f"{bullet}  {text}", self.SIZES[kind], indent=5)
+            elif kind == "numbered":
+                self._write(pdf, text.replace("\t", " "), self.SIZES[kind], indent=5)
+            elif kind == "rule":
+                pdf.ln(2)
+                pdf.line(pdf.l_margin, pdf.get_y(), pdf.w - pdf.r_margin, pdf.get_y())
+                pdf.ln(3)
+            else:
+                self._write(pdf, text, self.SIZES["paragraph"])
+                pdf.ln(2)
+
+    def incremental_document(self):
+        return IncrementalDocument(self)
+
+    def render(self, text, filepath):
+        """Renders `text` to `filepath` and returns the number of pages."""
+        prerendered = take_prerendered(text)
+        if prerendered is not None:
+            try:
+                data, pages = prerendered.result()
+            except Exception as e:
+                print(f"Pre-rendered PDF failed ({e}), laying it out again")
+            else:
+                with open(filepath, "wb") as file:
+                    file.write(data)
+                return pages
+        pdf = self._new_document()
+        self.layout(pdf, parse_blocks(text) or [("paragraph", " ")])
+        pdf.output(filepath)
+        return pdf.page_no()
+
+
+class IncrementalDocument:
+    """
+    A document laid out piece by piece as the text arrives. Pieces must end at
+    blank lines, so the result matches render() of the joined text.
+    """
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.pdf = renderer._new_document()
+        self.blocks = 0
+
+    def add(self, text):
+        blocks = parse_blocks(text)
+        self.renderer.layout(self.pdf, blocks)
+        self.blocks += len(blocks)
+
+    def finish(self):
+        """Returns (PDF bytes, number of pages)."""
+        if not self.blocks:
+            self.renderer.layout(self.pdf, [("paragraph", " ")])
+        data = self.pdf.output(dest="S").encode("latin-1") if FPDF_MAJOR < 2 else bytes(self.pdf.output())
+        return data, self.pdf.page_no()
+
+
+# Futures of (PDF bytes, pages) for texts laid out ahead of their PDF task, keyed by text hash
+_prerendered = {}
+_prerendered_lock = threading.Lock()
+
+def _text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def offer_prerendered(text, future):
+    """The next render() of exactly `text` writes the future's result instead of laying it out."""
+    with _prerendered_lock:
+        _prerendered[_text_key(text)] = future
+
+def has_prerendered(text):
+    with _prerendered_lock:
+        return _text_key(text) in _prerendered
+
+def take_prerendered(text):
+    with _prerendered_lock:
+        return _prerendered.pop(_text_key(text), None)
+
+def withdraw_prerendered(text, future):
+    """Drops an offer that no render() used."""
+    with _prerendered_lock:
+        if _prerendered.get(_text_key(text)) is future:
+            del _prerendered[_text_key(text)]
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_pdf_renderer():
+    """Process-wide renderer, so fonts and the template are set up only once."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PDFRenderer()
+        return _renderer
+
+
+def _render_job(job):
+    text, filepath = job
+    started = time.perf_counter()
+    pages = get_pdf_renderer().render(text, filepath)
+    # Peak RSS of the rendering process (KiB on Linux, bytes on macOS)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    return {"path": filepath, "pages": pages, "seconds": round(time.perf_counter() - started, 4), "peak_rss": peak_rss}
+
+
+# --- Render processes ---
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def _pool_context():
+    # Not fork: batch and service start the pool from processes that already run threads.
+    # The fork server preloads only this module, not the caller's __main__ (and crewai with it).
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def start_render_pool(workers=None):
+    """
+    Starts the process-wide render pool of `workers` processes (default: PDF_WORKERS,
+    or the CPU count), each keeping its own renderer. Returns the pool, or None for a single worker.
+    """
+    global _render_pool
+    workers = workers or int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+    with _render_pool_lock:
+        if _render_pool is None and workers > 1:
+            _render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+        return _render_pool
+
+def stop_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def render_pdf(text, filepath):
+    """Renders `text` to `filepath` on the render pool when one is running, in this process otherwise. Returns the number of pages."""
+    pool = _render_pool
+    if pool is None or has_prerendered(text):
+        # A streamed layout is waiting in this process
+        return get_pdf_renderer().render(text, filepath)
+    return pool.submit(_render_job, (text, filepath)).result()["pages"]
+
+def render_many(jobs, workers=None):
+    """
+    Renders many (text, filepath) jobs on the render pool (started with `workers`
+    processes if needed), or in this process for a single worker. Returns one result dict per job, in order.
+    """
+    jobs = list(jobs)
+    workers = workers or int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+    pool = start_render_pool(workers) if workers > 1 and len(jobs) > 1 else None
+    if pool is None:
+        return [_render_job(job) for job in jobs]
+    return list(pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
@@ -0,0 +1,256 @@
+import os
+import re
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from common import env_flag, get_ist_timestamp_str
+import tracing
+
+# --- Shared rate limiting ---
+# One limiter per provider ('llm:gemini', 'llm:groq', ..., 'search') is shared by
+# every agent, crew and batch/service worker of the process. Each limiter has token buckets for
+# requests per minute and, for the LLM, prompt + completion tokens per minute.
+# Callers wait in priority order: runs started from the command line are
+# 'interactive' and go ahead of 'batch' work (batch.py and the service mark their
+# runs with priority('batch')). A 429 from the provider pauses the limiter for
+# everyone (Retry-After or exponential backoff with jitter) and halves its rate;
+# the rate recovers step by step with each success. 5xx responses are retried
+# with backoff by the caller alone. RATE_LIMIT=off turns limiting and retries off.
+
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT")
+PRIORITIES = {"interactive": 0, "batch": 1}
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+_priority = contextvars.ContextVar("rate_limit_priority", default="interactive")
+
+
+@contextmanager
+def priority(level):
+    """Runs the block (and the task threads it starts) at the given priority, 'interactive' or 'batch'."""
+    if level not in PRIORITIES:
+        raise ValueError(f"Priority must be one of {', '.join(PRIORITIES)}, got '{level}'")
+    token = _priority.set(level)
+    try:
+        yield level
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def error_status(exc):
+    """HTTP status behind a provider error (litellm, requests or a plain message), or None."""
+    for obj in (exc, getattr(exc, "response", None)):
+        status = getattr(obj, "status_code", None)
+        if isinstance(status, int):
+            return status
+    text = str(exc).lower()
+    if "429" in text or "rate limit" in text or "ratelimit" in text or "resource_exhausted" in text:
+        return 429
+    match = re.search(r"\b(50[0234])\b", text)
+    return int(match.group(1)) if match else None
+
+
+def retry_after(exc):
+    """Seconds from a Retry-After header on the error's response, or None."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 units per second up to `capacity` (default: 10 seconds' worth)."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.per_minute = per_minute
+        self.capacity = capacity or max(1.0, per_minute / 6)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now, factor=1.0):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60 * factor)
+        self.updated = now
+
+    def wait_time(self, amount, factor=1.0):
+        """Seconds until `amount` can be taken (requests larger than the bucket only need it full)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / (self.per_minute / 60 * factor))
+
+
+class RateLimiter:
+    """
+    name: provider label used in logs and stats.
+    requests_per_min / tokens_per_min: bucket rates, 0 for no limit.
+    retries, base_delay, max_delay: backoff for 429 and 5xx responses.
+    """
+
+    def __init__(self, name, requests_per_min=0, tokens_per_min=0, retries=4, base_delay=1.0, max_delay=60.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_min) if requests_per_min else None
+        self.tokens = TokenBucket(tokens_per_min) if tokens_per_min else None
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = 1.0  # share of the configured rate in use, lowered on 429s
+        self.cooldown_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._stats = {
+            "calls": 0, "throttled": 0, "throttled_s": {level: 0.0 for level in PRIORITIES},
+            "rate_limited": 0, "server_errors": 0, "retries": 0, "failures": 0,
+        }
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    def acquire(self, tokens=0):
+        """Blocks until a request of `tokens` tokens may go out, respecting priority order. Returns the seconds waited."""
+        level = current_priority()
+        entry = (PRIORITIES[level], next(self._sequence))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            while True:
+                now = time.monotonic()
+                for bucket in self._buckets():
+                    bucket.refill(now, self.factor)
+                wait = self.cooldown_until - now
+                if self.requests is not None:
+                    wait = max(wait, self.requests.wait_time(1, self.factor))
+                if self.tokens is not None and tokens:
+                    wait = max(wait, self.tokens.wait_time(tokens, self.factor))
+                if self._waiters[0] == entry and wait <= 0:
+                    break
+                self._cond.wait(timeout=wait if self._waiters[0] == entry else None)
+            heapq.heappop(self._waiters)
+            if self.requests is not None:
+                self.requests.level -= 1
+            if self.tokens is not None:
+                self.tokens.level -= tokens
+            waited = time.monotonic() - started
+            self._stats["calls"] += 1
+            if waited > 0.001:
+                self._stats["throttled"] += 1
+                self._stats["throttled_s"][level] += waited
+            self._cond.notify_all()  # the next waiter in line re-checks
+        if waited > 0.001:
+            tracing.current_span().add("throttled_s", round(waited, 4))
+        return waited
+
+    def is_throttled(self):
+        """True while the limiter is paused after a 429."""
+        return self.cooldown_until > time.monotonic()
+
+    def debit(self, tokens):
+        """Takes tokens used beyond the estimate given to acquire (e.g. the completion)."""
+        if self.tokens is not None and tokens > 0:
+            with self._cond:
+                self.tokens.level -= tokens
+
+    def backoff(self, attempt, hint=None):
+        """Exponential backoff with full jitter, or the provider's Retry-After when it gives one."""
+        if hint is not None:
+            return min(self.max_delay, hint)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _on_success(self):
+        if self.factor < 1.0:
+            with self._cond:
+                self.factor = min(1.0, self.factor + 0.1)
+
+    def _on_rate_limited(self, delay):
+        with self._cond:
+            self._stats["rate_limited"] += 1
+            self.factor = max(0.1, self.factor / 2)
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+            self._cond.notify_all()
+
+    def call(self, func, *args, tokens=0, max_retries=None, **kwargs):
+        """
+        Runs func(*args, **kwargs) under the limiter, retrying 429 and 5xx errors with backoff.
+        max_retries overrides the limiter's retries (0 lets a router fail over at once).
+        """
+        if not RATE_LIMIT_ENABLED:
+            return func(*args, **kwargs)
+        retries = self.retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            self.acquire(tokens)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status = error_status(e)
+                if status not in RETRYABLE_STATUSES or attempt == retries:
+                    if status == 429:
+                        self._on_rate_limited(self.backoff(attempt, retry_after(e)))  # others still back off
+                    if status in RETRYABLE_STATUSES:
+                        with self._cond:
+                            self._stats["failures"] += 1
+                    raise
+                delay = self.backoff(attempt, retry_after(e))
+                if status == 429:
+                    self._on_rate_limited(delay)  # everyone waits, acquire() enforces it
+                else:
+                    with self._cond:
+                        self._stats["server_errors"] += 1
+                    time.sleep(delay)
+                with self._cond:
+                    self._stats["retries"] += 1
+                tracing.current_span().add("retries")
+                print(f"[{get_ist_timestamp_str()}] {self.name}: HTTP {status}, retry {attempt + 1}/{retries} "
+                      f"in {delay:.1f}s")
+                continue
+            self._on_success()
+            return result
+
+    def stats(self):
+        with self._cond:
+            stats = {k: (dict(v) if isinstance(v, dict) else v) for k, v in self._stats.items()}
+            stats["rate_factor"] = round(self.factor, 2)
+        stats["throttled_s"] = {level: round(seconds, 3) for level, seconds in stats["throttled_s"].items()}
+        return stats
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Env settings of each kind of limiter: (requests per minute, tokens per minute)
+_LIMITS = {
+    "llm": ("LLM_REQUESTS_PER_MIN", 60, "LLM_TOKENS_PER_MIN", 1000000),
+    "search": ("SEARCH_REQUESTS_PER_MIN", 300, None, 0),
+}
+
+def _limit(env, default, provider):
+    # LLM_REQUESTS_PER_MIN_GROQ overrides LLM_REQUESTS_PER_MIN for the groq provider
+    value = os.getenv(f"{env}_{provider.upper()}") if provider else None
+    return float(value if value is not None else os.getenv(env, default))
+
+def get_limiter(name):
+    """The process-wide limiter 'search' or 'llm:<provider>' (e.g. 'llm:gemini')."""
+    with _limiters_lock:
+        if name not in _limiters:
+            kind, _, provider = name.partition(":")
+            requests_env, requests_default, tokens_env, tokens_default = _LIMITS[kind]
+            _limiters[name] = RateLimiter(
+                name,
+                requests_per_min=_limit(requests_env, requests_default, provider),
+                tokens_per_min=_limit(tokens_env, tokens_default, provider) if tokens_env else 0,
+                retries=int(os.getenv("RATE_LIMIT_RETRIES", 4)),
+                base_delay=float(os.getenv("RATE_LIMIT_BACKOFF_S", 1)),
+                max_delay=float(os.getenv("RATE_LIMIT_MAX_BACKOFF_S", 60)),
+            )
+        return _limiters[name]
+
+
+def rate_limit_stats():
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return dict({name: limiter.stats() for name, limiter in limiters.items()}, enabled=RATE_LIMIT_ENABLED)
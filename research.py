@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from common import get_ist_timestamp_str
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import tracing
+from compaction import dedupe_passages
+
+# --- Parallel research ---
+# Instead of the Researcher's serial search -> read -> search loop, the 'search'
+# step expands the topic into several queries up front, runs them concurrently
+# through the shared search tool (cache and rate limiter included), and merges
+# the results: the same page found by several queries (URL compared without
+# scheme, 'www.', trailing slash or tracking parameters) is kept once, and
+# near-identical snippets are dropped. The Researcher then writes its report in
+# one pass over the merged list. Queries that fail or miss RESEARCH_TIMEOUT_S are
+# left out; the step only fails when fewer than RESEARCH_MIN_QUERIES succeed.
+# Fresh passages of earlier reports on related topics (research_memory.py) are
+# listed after the results as notes.
+
+RESEARCH_MODES = ("parallel", "agent")
+DEFAULT_RESEARCH_MODE = os.getenv("RESEARCH_MODE", "parallel").strip().lower()
+RESEARCH_MAX_QUERIES = int(os.getenv("RESEARCH_MAX_QUERIES", 5))
+RESEARCH_CONCURRENCY = int(os.getenv("RESEARCH_CONCURRENCY", 5))
+RESEARCH_TIMEOUT_S = float(os.getenv("RESEARCH_TIMEOUT_S", 30))
+RESEARCH_MIN_QUERIES = int(os.getenv("RESEARCH_MIN_QUERIES", 1))
+RESEARCH_MAX_RESULTS = int(os.getenv("RESEARCH_MAX_RESULTS", 25))
+
+# Sub-queries built from the topic; '{year}' is the current year
+QUERY_TEMPLATES = (
+    "{topic}",
+    "{topic} latest news",
+    "{topic} {year}",
+    "{topic} analysis",
+    "{topic} trends outlook",
+    "{topic} research breakthroughs",
+    "{topic} industry impact",
+)
+
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|ref|ref_src)$")
+_RESULT_FIELD = re.compile(r"^(Title|Link|Snippet):\s*(.*)$")
+
+
+def expand_queries(topic, max_queries=None):
+    """The topic itself plus up to max_queries - 1 variations of it."""
+    max_queries = RESEARCH_MAX_QUERIES if max_queries is None else max_queries
+    year = get_ist_timestamp_str("%Y")
+    queries = [template.format(topic=topic.strip(), year=year) for template in QUERY_TEMPLATES]
+    return list(dict.fromkeys(queries))[:max(1, max_queries)]
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k)])
+    return f"{host}{parts.path.rstrip('/')}{'?' + query if query else ''}"
+
+
+def parse_results(raw):
+    """
+    Organic results [{'title', 'link', 'snippet'}] from a search tool output,
+    which is the Serper JSON (as a dict or string) or crewai_tools' text format.
+    """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            results, current = [], {}
+            for line in raw.splitlines():
+                match = _RESULT_FIELD.match(line.strip())
+                if match:
+                    field = match.group(1).lower()
+                    if field == "title" and current:
+                        results.append(current)
+                        current = {}
+                    current[field] = match.group(2).strip()
+            if current:
+                results.append(current)
+            return [r for r in results if r.get("link")]
+    if isinstance(raw, dict):
+        raw = raw.get("organic") or raw.get("results") or []
+    return [
+        {"title": r.get("title", ""), "link": r.get("link", ""), "snippet": r.get("snippet", "")}
+        for r in raw if isinstance(r, dict) and r.get("link")
+    ]
+
+
+def merge_results(results_by_query, max_results=None):
+    """
+    Merges per-query results into one list: one entry per page, near-identical
+    snippets dropped, pages found by more queries (then ranked higher) first.
+    Returns (merged results, number of duplicates removed).
+    """
+    max_results = RESEARCH_MAX_RESULTS if max_results is None else max_results
+    pages, total = {}, 0
+    for query, results in results_by_query.items():
+        for position, result in enumerate(results):
+            total += 1
+            page = pages.setdefault(normalize_url(result["link"]), dict(result, queries=[], best_position=position))
+            page["queries"].append(query)
+            page["best_position"] = min(page["best_position"], position)
+            if len(result.get("snippet", "")) > len(page.get("snippet", "")):
+                page["snippet"] = result["snippet"]
+    ranked = sorted(pages.values(), key=lambda p: (-len(p["queries"]), p["best_position"]))
+    # Different URLs with the same text (syndicated copies, mirrors) count as duplicates too
+    texts = [f"{p['title']}\n{p['snippet']}" for p in ranked]
+    kept_texts, _ = dedupe_passages(texts)
+    kept = {id(text) for text in kept_texts}
+    unique = [page for page, text in zip(ranked, texts) if id(text) in kept]
+    return unique[:max_results], total - len(unique)
+
+
+def format_results(topic, merged, notes=()):
+    lines = [f"Search results for the topic: {topic}", ""]
+    for number, page in enumerate(merged, start=1):
+        lines.append(f"{number}. {page['title']} ({page['link']})")
+        if page.get("snippet"):
+            lines.append(f"   {page['snippet']}")
+        lines.append(f"   Found by {len(page['queries'])} of the queries")
+    if notes:
+        lines += ["", "Notes from earlier research on related topics:", ""]
+        lines += [f"- ({note['topic']}) {note['text']}" for note in notes]
+    return "\n".join(lines)
+
+
+def recall_notes(topic):
+    """Fresh passages of earlier research reports related to `topic`, if the research memory is on."""
+    from research_memory import get_research_memory, max_age_for
+    memory = get_research_memory()
+    if memory is None:
+        return []
+    try:
+        return memory.notes(topic, max_age=max_age_for(topic))
+    except Exception as e:
+        print(f"[{get_ist_timestamp_str()}] Research notes unavailable: {e}")
+        return []
+
+
+def run_queries(queries, search, concurrency=None, timeout=None):
+    """
+    Runs search(query) for every query, `concurrency` at a time, for at most
+    `timeout` seconds in total. Returns ({query: raw result}, {query: error}).
+    """
+    concurrency = RESEARCH_CONCURRENCY if concurrency is None else concurrency
+    timeout = RESEARCH_TIMEOUT_S if timeout is None else timeout
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="research")
+    # Searches join the run's trace and keep its rate-limit priority
+    futures = {executor.submit(tracing.run_in_context(search), query): query for query in queries}
+    done, not_done = wait(futures, timeout=timeout)
+    # Stragglers are abandoned rather than waited for; their results are ignored
+    executor.shutdown(wait=False, cancel_futures=True)
+    results, errors = {}, {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            errors[futures[future]] = f"{type(e).__name__}: {e}"
+    for future in not_done:
+        errors[futures[future]] = f"timed out after {timeout}s"
+    return results, errors
+
+
+def gather(topic, search=None, max_queries=None, concurrency=None, timeout=None, min_queries=None, notes=True):
+    """Runs the expanded queries and returns (formatted merged results, stats)."""
+    from research_memory import is_memory_result
+    if search is None:
+        from tools import get_search_tool
+        tool = get_search_tool()
+        search = lambda query: tool.run(search_query=query)
+    min_queries = RESEARCH_MIN_QUERIES if min_queries is None else min_queries
+    queries = expand_queries(topic, max_queries)
+    started = time.perf_counter()
+    raw_results, errors = run_queries(queries, search, concurrency, timeout)
+    if len(raw_results) < min(min_queries, len(queries)):
+        raise RuntimeError(f"Only {len(raw_results)} of {len(queries)} searches succeeded: {errors}")
+    # Keep the expansion order so merging is deterministic
+    results_by_query = {query: parse_results(raw_results[query]) for query in queries if query in raw_results}
+    merged, duplicates = merge_results(results_by_query)
+    notes = recall_notes(topic) if notes else []
+    stats = {
+        "queries": len(queries),
+        "succeeded": len(raw_results),
+        "failed": {query: error for query, error in errors.items()},
+        "results": sum(len(r) for r in results_by_query.values()),
+        "merged": len(merged),
+        "duplicates": duplicates,
+        "from_memory": sum(1 for raw in raw_results.values() if is_memory_result(raw)),
+        "notes": len(notes),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return format_results(topic, merged, notes), stats
+
+
+_totals = Counter()
+_totals_lock = threading.Lock()
+
+def record_research(stats):
+    with _totals_lock:
+        _totals["runs"] += 1
+        _totals["failed"] += len(stats["failed"])
+        for key in ("queries", "succeeded", "results", "merged", "duplicates", "from_memory", "notes"):
+            _totals[key] += stats.get(key, 0)
+
+
+def research_stats():
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["mode"] = DEFAULT_RESEARCH_MODE
+    totals["concurrency"] = RESEARCH_CONCURRENCY
+    if totals.get("results"):
+        totals["duplicate_ratio"] = round(totals["duplicates"] / totals["results"], 3)
+    return totals
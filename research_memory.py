@@ -0,0 +1,247 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+import pytz
+from common import env_flag, get_ist_timestamp_str, thread_connection
+from cache_store import CACHE_DIR
+
+# --- Research memory ---
+# Search snippets and finished research reports are kept in a local SQLite FTS5
+# index (.cache/research_memory.sqlite) with the time they were found, the query
+# and topic they were found for and their source URL. Before a Serper query goes
+# out (after the exact-match search cache), the index is searched for the query's
+# words; when it has RESEARCH_MEMORY_MIN_RESULTS snippets that are fresh enough for
+# the run's topic, the search is answered locally. Otherwise Serper is called and
+# its results are added to the index. Parallel research also passes fresh passages
+# of earlier reports on related topics to the Researcher.
+# How old a fact may be depends on the topic: RESEARCH_MEMORY_FRESHNESS lists
+# 'keyword=hours' pairs, and the shortest limit whose keyword is in the topic wins
+# over RESEARCH_MEMORY_MAX_AGE_H. Entries older than RESEARCH_MEMORY_RETENTION_DAYS
+# are deleted.
+
+RESEARCH_MEMORY_ENABLED = env_flag("RESEARCH_MEMORY")
+RESEARCH_MEMORY_PATH = os.getenv("RESEARCH_MEMORY_PATH", os.path.join(CACHE_DIR, "research_memory.sqlite"))
+RESEARCH_MEMORY_MAX_AGE_H = float(os.getenv("RESEARCH_MEMORY_MAX_AGE_H", 24))
+RESEARCH_MEMORY_FRESHNESS = os.getenv("RESEARCH_MEMORY_FRESHNESS", "markets=2,stocks=2,crypto=2,finance=6,economy=12")
+RESEARCH_MEMORY_MIN_RESULTS = int(os.getenv("RESEARCH_MEMORY_MIN_RESULTS", 5))
+RESEARCH_MEMORY_NOTES = int(os.getenv("RESEARCH_MEMORY_NOTES", 5))
+RESEARCH_MEMORY_RETENTION_DAYS = float(os.getenv("RESEARCH_MEMORY_RETENTION_DAYS", 30))
+
+MEMORY_SOURCE = "research_memory"  # 'source' of a search answered from memory
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the this to was were what when "
+    "where which who why will with about over after".split()
+)
+
+
+def parse_freshness(spec):
+    """'markets=2,finance=6' -> {'markets': 2.0, 'finance': 6.0} (hours)."""
+    limits = {}
+    for item in spec.split(","):
+        keyword, _, hours = item.partition("=")
+        if keyword.strip() and hours.strip():
+            limits[keyword.strip().lower()] = float(hours)
+    return limits
+
+
+def max_age_for(topic):
+    """Seconds a remembered fact about `topic` stays fresh."""
+    words = set(_WORD.findall(str(topic or "").lower()))
+    hours = [h for keyword, h in parse_freshness(RESEARCH_MEMORY_FRESHNESS).items() if keyword in words]
+    return min(hours + [RESEARCH_MEMORY_MAX_AGE_H]) * 60 * 60
+
+
+def _match_expression(text):
+    """FTS5 query requiring every significant word of `text`; each word is quoted, so no FTS syntax leaks in."""
+    words = [w for w in dict.fromkeys(_WORD.findall(str(text).lower())) if w not in _STOPWORDS]
+    return " ".join(f'"{w}"' for w in words) or None
+
+
+def is_memory_result(raw):
+    """True for a search result that was answered from memory."""
+    if isinstance(raw, dict):
+        return raw.get("source") == MEMORY_SOURCE
+    return isinstance(raw, str) and MEMORY_SOURCE in raw[:200]
+
+
+class ResearchMemory:
+    """FTS5 index of past search snippets ('snippet') and research report passages ('report')."""
+
+    def __init__(self, path=RESEARCH_MEMORY_PATH, retention=RESEARCH_MEMORY_RETENTION_DAYS * 24 * 60 * 60):
+        self.path = path
+        self.retention = retention
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "snippets_stored": 0, "reports_stored": 0, "notes_served": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+            " title, content, query, topic, url UNINDEXED, kind UNINDEXED, created_at UNINDEXED,"
+            " tokenize = 'porter unicode61')"
+        )
+
+    def _connect(self):
+        return thread_connection(self._local, self.path)
+
+    def _count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def _search(self, text, kind, max_age, limit):
+        expression = _match_expression(text)
+        if expression is None:
+            return []
+        since = time.time() - max_age if max_age is not None else 0
+        return self._connect().execute(
+            "SELECT title, content, url, created_at FROM passages"
+            " WHERE passages MATCH ? AND kind = ? AND created_at >= ? ORDER BY rank LIMIT ?",
+            (expression, kind, since, limit),
+        ).fetchall()
+
+    def lookup(self, query, max_age=None, limit=10):
+        """Fresh snippets matching every word of `query`, best first, as search results."""
+        rows = self._search(query, "snippet", max_age, limit)
+        self._count("lookups")
+        self._count("hits" if len(rows) >= RESEARCH_MEMORY_MIN_RESULTS else "misses")
+        return [
+            {"title": title, "link": url, "snippet": content,
+             "date": datetime.fromtimestamp(created_at, pytz.timezone('Asia/Kolkata')).strftime("%Y-%m-%d %H:%M")}
+            for title, content, url, created_at in rows
+        ]
+
+    def notes(self, topic, max_age=None, limit=RESEARCH_MEMORY_NOTES):
+        """Fresh passages of earlier research reports on `topic` or topics sharing its words."""
+        rows = self._search(topic, "report", max_age, limit)
+        self._count("notes_served", len(rows))
+        return [{"text": content, "topic": title, "created_at": created_at} for title, content, _, created_at in rows]
+
+    def remember_results(self, query, topic, raw):
+        """Adds the organic results of a Serper response; a page found again replaces its older snippet."""
+        from research import parse_results
+        results = [r for r in parse_results(raw) if r.get("snippet")]
+        if not results:
+            return 0
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for result in results:
+                conn.execute("DELETE FROM passages WHERE url = ? AND kind = 'snippet'", (result["link"],))
+                conn.execute(
+                    "INSERT INTO passages (title, content, query, topic, url, kind, created_at) VALUES (?, ?, ?, ?, ?, 'snippet', ?)",
+                    (result.get("title", ""), result["snippet"], query, topic or "", result["link"], now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("snippets_stored", len(results))
+        self.prune()
+        return len(results)
+
+    def remember_report(self, topic, text):
+        """Adds the passages of a finished research report (see compaction.split_passages)."""
+        from compaction import split_passages
+        passages = [p for p in split_passages(text) if len(_WORD.findall(p)) >= 8]  # skip headings and bare links
+        if not passages:
+            return 0
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO passages (title, content, query, topic, url, kind, created_at) VALUES (?, ?, ?, ?, '', 'report', ?)",
+                [(topic, passage, topic, topic, now) for passage in passages],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("reports_stored")
+        return len(passages)
+
+    def prune(self, retention=None):
+        """Deletes entries older than the retention period. Returns the number deleted."""
+        retention = self.retention if retention is None else retention
+        return self._connect().execute("DELETE FROM passages WHERE created_at < ?", (time.time() - retention,)).rowcount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        counts = dict(self._connect().execute("SELECT kind, COUNT(*) FROM passages GROUP BY kind").fetchall())
+        stats.update(
+            snippets=counts.get("snippet", 0),
+            report_passages=counts.get("report", 0),
+            search_calls_avoided=stats["hits"],
+            served_locally=round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0,
+        )
+        return stats
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+def get_research_memory():
+    """Process-wide research memory, or None when RESEARCH_MEMORY=off."""
+    global _memory
+    if not RESEARCH_MEMORY_ENABLED:
+        return None
+    with _memory_lock:
+        if _memory is None:
+            _memory = ResearchMemory()
+    return _memory
+
+
+def remember_report(topic, text):
+    """Indexes a finished research report, if the memory is on."""
+    memory = get_research_memory()
+    if memory is None or not text:
+        return
+    try:
+        memory.remember_report(topic, text)
+    except sqlite3.Error as e:
+        print(f"[{get_ist_timestamp_str()}] Research report not remembered: {e}")
+
+
+def research_memory_stats():
+    if _memory is None:
+        return {"enabled": RESEARCH_MEMORY_ENABLED}
+    return dict(_memory.stats(), enabled=RESEARCH_MEMORY_ENABLED)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or clean the local research memory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search_parser = commands.add_parser("search", help="Remembered snippets for a query, best first")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--topic", help="Topic whose freshness limit applies (default: the query)")
+    search_parser.add_argument("--all", action="store_true", help="Include snippets past the freshness limit")
+    search_parser.add_argument("--limit", type=int, default=10)
+    prune_parser = commands.add_parser("prune", help="Apply the retention limit now")
+    prune_parser.add_argument("--days", type=float, help="Retention (default: RESEARCH_MEMORY_RETENTION_DAYS)")
+    commands.add_parser("stats", help="Number of remembered snippets and report passages")
+    args = parser.parse_args(argv)
+
+    memory = ResearchMemory()
+    if args.command == "search":
+        max_age = None if args.all else max_age_for(args.topic or args.query)
+        for result in memory.lookup(args.query, max_age=max_age, limit=args.limit):
+            print(f"{result['date']}  {result['title']}\n    {result['link']}\n    {result['snippet']}")
+    elif args.command == "prune":
+        deleted = memory.prune(args.days * 24 * 60 * 60 if args.days is not None else None)
+        print(f"Deleted {deleted} entries")
+    else:
+        print(json.dumps(memory.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from common import get_ist_timestamp_str
+import tracing
+
+
+# Separator crewai uses when it joins several upstream outputs into one context string
+CONTEXT_SEPARATOR = "\n\n----------\n\n"
+
+
+class TaskGraph:
+    """
+    Dependency-graph executor for crewai tasks.
+
+    Each node is a crewai Task (or a tasks.DirectTask) registered under a short key. Unless given
+    explicitly, a node's upstream nodes are taken from the task's own
+    `context=` list, so the links already set up by the tasks.py factories
+    define the graph. A node is started as soon as all of its upstream
+    outputs exist; independent branches (e.g. PDF and audio) run in parallel.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # key -> task, in insertion order
+        self.depends_on = {}  # key -> list of upstream keys
+        self._keys_by_task = {}  # id(task) -> key
+        self.timings = {}  # key -> {'started_s', 'seconds'} of the last run, relative to its start
+
+    def add(self, key, task, depends_on=None):
+        """Adds a task under `key`. Upstream keys default to the task's context links."""
+        if key in self.nodes:
+            raise ValueError(f"Duplicate task key in graph: '{key}'")
+        if depends_on is None:
+            context = getattr(task, "context", None)
+            upstream_tasks = context if isinstance(context, list) else []
+            depends_on = []
+            for upstream in upstream_tasks:
+                upstream_key = self._keys_by_task.get(id(upstream))
+                if upstream_key is None:
+                    raise ValueError(f"Task '{key}' depends on a task that is not in the graph.")
+                depends_on.append(upstream_key)
+        for upstream_key in depends_on:
+            if upstream_key not in self.nodes:
+                raise ValueError(f"Task '{key}' depends on unknown task '{upstream_key}'.")
+        self.nodes[key] = task
+        self.depends_on[key] = list(depends_on)
+        self._keys_by_task[id(task)] = key
+        return task
+
+    def last_key(self):
+        """Returns the key of the most recently added task."""
+        return next(reversed(self.nodes)) if self.nodes else None
+
+    def _execute_node(self, key, outputs):
+        task = self.nodes[key]
+        upstream_raw = [outputs[upstream_key] for upstream_key in self.depends_on[key]]
+        if getattr(task, "is_direct", False):
+            # Direct tasks call their tool themselves and need each upstream output separately
+            return task.execute_direct(upstream_raw)
+        context = CONTEXT_SEPARATOR.join(upstream_raw)
+        task_output = task.execute_sync(agent=task.agent, context=context)
+        return getattr(task_output, "raw", str(task_output))
+
+    def downstream_of(self, keys):
+        """Returns `keys` plus every task that depends on them, directly or transitively."""
+        affected = set(keys)
+        for key, upstream in self.depends_on.items():  # insertion order is a topological order
+            if any(u in affected for u in upstream):
+                affected.add(key)
+        return affected
+
+    def run(self, max_workers=None, completed=None, on_task_complete=None):
+        """
+        Executes the graph and returns a dict of task key -> raw output.
+        max_workers=1 reproduces the old one-after-another behaviour.
+        `completed` maps task keys to outputs of an earlier run; those tasks are
+        not run again. on_task_complete(key, raw_output, timing) is called as
+        each task finishes (see checkpoint.py).
+        """
+        if not self.nodes:
+            return {}
+        self.timings = {}
+        run_started = time.perf_counter()
+        max_workers = max_workers or len(self.nodes)
+        outputs = {key: raw for key, raw in (completed or {}).items() if key in self.nodes}
+        pending = {key: upstream for key, upstream in self.depends_on.items() if key not in outputs}
+        running = {}  # future -> key
+
+        # crewai agents keep per-execution state (their agent executor), so two
+        # tasks that share an agent must never run at the same time.
+        agent_locks = {}
+        for task in self.nodes.values():
+            if task.agent is not None:
+                agent_locks.setdefault(id(task.agent), threading.Lock())
+
+        def execute(key):
+            with agent_locks.get(id(self.nodes[key].agent), nullcontext()):
+                print(f"[{get_ist_timestamp_str('%Y-%m-%d %H:%M:%S')}] Starting task '{key}'")
+                started = time.perf_counter()
+                with tracing.span(key, kind="task", agent=getattr(self.nodes[key].agent, "role", None)):
+                    raw = self._execute_node(key, outputs)
+                self.timings[key] = {
+                    "started_s": round(started - run_started, 4),
+                    "seconds": round(time.perf_counter() - started, 4),
+                }
+                print(f"[{get_ist_timestamp_str('%Y-%m-%d %H:%M:%S')}] Finished task '{key}'")
+                return raw
+
+        # Task threads join the caller's trace (see tracing.py)
+        execute = tracing.run_in_context(execute)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task") as executor:
+            while pending or running:
+                ready = [key for key, upstream in pending.items() if all(u in outputs for u in upstream)]
+                for key in ready:
+                    del pending[key]
+                    running[executor.submit(execute, key)] = key
+                if not running:
+                    raise RuntimeError(f"Task graph has unsatisfiable dependencies: {sorted(pending)}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        outputs[key] = future.result()
+                        if on_task_complete is not None:
+                            on_task_complete(key, outputs[key], self.timings.get(key))
+                    except Exception:
+                        # Let in-flight branches finish but start nothing new.
+                        pending.clear()
+                        for other in running:
+                            other.cancel()
+                        raise
+        return outputs
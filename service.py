@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from common import get_ist_timestamp_str
+from main import output_dir
+from batch import run_request, validate_spec
+
+# --- Newsletter service ---
+# Long-running process that takes newsletter requests over a small local HTTP API:
+#   POST /jobs          request spec as in batch mode -> 202 {"job_id": ...}, 429 when the queue is full
+#   GET  /jobs          recent jobs
+#   GET  /jobs/<id>     status, timings, artifact paths and output of one job
+#   GET  /health        liveness, queue depth and busy workers
+#   GET  /stats         job counters and cache statistics
+# Requests wait in a bounded asyncio queue; a fixed number of workers run them
+# on a thread pool. Each run checks a set of agents out of the crew pool (see
+# crew_pool.py), built before the request arrives and never reused by another
+# run; tools and clients stay warm across requests. PDFs are rendered on a pool of
+# render processes (see pdf_render.py).
+
+MAX_BODY_BYTES = 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class NewsletterService:
+    def __init__(self, workers=4, queue_size=100, max_jobs_kept=1000):
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self.max_jobs_kept = max_jobs_kept
+        self.jobs = OrderedDict()  # job_id -> job dict, oldest first
+        self.counts = {"accepted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+        self.busy = 0
+        self.started = time.time()
+        self._sequence = itertools.count(1)
+        self.queue = None
+        self.executor = None
+        self.server = None
+        self._worker_tasks = []
+
+    # --- Job handling ---
+    def submit(self, spec):
+        """Queues a request spec and returns its job, raising HTTPError when it is invalid or the queue is full."""
+        error = validate_spec(spec)
+        if error:
+            raise HTTPError(400, error)
+        job_id = str(spec.get("id") or uuid.uuid4().hex[:12])
+        if job_id in self.jobs and self.jobs[job_id]["status"] in ("queued", "running"):
+            raise HTTPError(409, f"Job '{job_id}' is already {self.jobs[job_id]['status']}")
+        job = {
+            "job_id": job_id,
+            "number": next(self._sequence),
+            "status": "queued",
+            "topic": str(spec["topic"]).strip(),
+            "submitted_at": get_ist_timestamp_str("%Y-%m-%d %H:%M:%S"),
+            "spec": spec,
+        }
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            raise HTTPError(429, f"Queue is full ({self.queue_size} jobs waiting), retry later",
+                            headers={"Retry-After": "30"})
+        self.jobs[job_id] = job
+        self.jobs.move_to_end(job_id)
+        self.counts["accepted"] += 1
+        self._forget_old_jobs()
+        return job
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs_kept)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job["status"] = "running"
+            job["started_at"] = get_ist_timestamp_str("%Y-%m-%d %H:%M:%S")
+            self.busy += 1
+            try:
+                # Job number doubles as the batch line number, keeping base filenames unique
+                record = await loop.run_in_executor(self.executor, run_request, job["number"], job["spec"])
+            except Exception as e:  # run_request never raises, but a worker must never die
+                record = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                self.busy -= 1
+                self.queue.task_done()
+            job["status"] = "succeeded" if record.get("status") == "ok" else "failed"
+            job["finished_at"] = get_ist_timestamp_str("%Y-%m-%d %H:%M:%S")
+            job["result"] = {k: v for k, v in record.items() if k not in ("id", "line", "topic", "status")}
+            self.counts[job["status"]] += 1
+            print(f"[{get_ist_timestamp_str()}] Job '{job['job_id']}' {job['status']} in {record.get('duration_s')}s")
+
+    def job_view(self, job, full=True):
+        view = {k: v for k, v in job.items() if k not in ("spec", "number", "result")}
+        if job["status"] == "queued":
+            view["queue_position"] = sum(
+                1 for other in self.jobs.values() if other["status"] == "queued" and other["number"] <= job["number"]
+            )
+        result = job.get("result") or {}
+        if full:
+            view.update(result)
+        else:
+            view.update({k: result[k] for k in ("pdf_path", "audio_path", "duration_s", "error") if k in result})
+        return view
+
+    def health(self):
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+        }
+
+    def stats(self):
+        from stats import collect_stats
+        return dict(self.health(), jobs=dict(self.counts), **collect_stats())
+
+    # --- HTTP ---
+    def route(self, method, path, body):
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return 200, self.health()
+        if parts == ["stats"] and method == "GET":
+            return 200, self.stats()
+        if parts == ["jobs"] and method == "POST":
+            try:
+                spec = json.loads(body.decode("utf-8") or "null")
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            return 202, self.job_view(self.submit(spec))
+        if parts == ["jobs"] and method == "GET":
+            return 200, {"jobs": [self.job_view(job, full=False) for job in reversed(self.jobs.values())]}
+        if len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise HTTPError(404, f"Unknown job '{parts[1]}'")
+            return 200, self.job_view(job)
+        if parts in (["health"], ["stats"], ["jobs"]) or (len(parts) == 2 and parts[0] == "jobs"):
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        raise HTTPError(404, f"No route for {path}")
+
+    async def handle_client(self, reader, writer):
+        status, payload, headers = 500, {"error": "Internal error"}, {}
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                writer.close()
+                return
+            method, path, _ = (request_line.split(" ", 2) + ["", ""])[:3]
+            request_headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                request_headers[name.strip().lower()] = value.strip()
+            length = int(request_headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+            body = await reader.readexactly(length) if length else b""
+            status, payload = self.route(method.upper(), path, body)
+        except HTTPError as e:
+            status, payload, headers = e.status, {"error": str(e)}, e.headers
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"error": f"Malformed request: {e}"}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        try:
+            data = json.dumps(payload, default=str).encode("utf-8")
+            head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json",
+                    f"Content-Length: {len(data)}", "Connection: close"]
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # --- Lifecycle ---
+    async def start(self, host="127.0.0.1", port=8080):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="newsletter")
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    async def stop(self):
+        """Stops accepting requests, lets running jobs finish and drops queued ones."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self.executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+        from pdf_render import stop_render_pool
+        await asyncio.get_running_loop().run_in_executor(None, stop_render_pool)
+
+
+def warm_up(workers):
+    """Imports crewai and builds the process-wide tools and every worker's agents once, before the first request arrives."""
+    from crewai import Agent, Task  # noqa: F401
+    from tools import get_search_tool
+    from pdf_render import get_pdf_renderer, start_render_pool
+    from crew_pool import get_crew_pool
+    get_search_tool()
+    get_pdf_renderer()
+    if workers > 1:
+        start_render_pool()
+    get_crew_pool(workers).warm_up()
+
+
+async def serve(host, port, workers, queue_size):
+    service = NewsletterService(workers=workers, queue_size=queue_size)
+    await asyncio.get_running_loop().run_in_executor(None, warm_up, workers)
+    await service.start(host, port)
+    print(f"[{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] Newsletter service on http://{host}:{port} "
+          f"({workers} workers, queue of {queue_size}, outputs in '{output_dir}')")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve newsletter requests over a local HTTP API.")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8080")))
+    parser.add_argument("-w", "--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "4")), help="Newsletters run concurrently (default: SERVICE_WORKERS or 4)")
+    parser.add_argument("-q", "--queue-size", type=int, default=int(os.getenv("SERVICE_QUEUE_SIZE", "100")), help="Jobs that may wait before requests get 429 (default: SERVICE_QUEUE_SIZE or 100)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size))
+    except KeyboardInterrupt:
+        print(f"\n[{get_ist_timestamp_str('%Y-%m-%d %H:%M')}] Service stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import time
+import hashlib
+import smtplib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from mime_stream import send_streaming
+import tracing
+
+# --- Pooled SMTP sessions ---
+# Opening an SMTP session costs a TCP connect, STARTTLS and a login. The pool keeps
+# authenticated sessions open and hands them out again, across sends and, in
+# long-running processes (batch/service), across newsletter runs.
+
+
+def is_connection_error(error):
+    """
+    True when the session itself is broken (dropped, never connected, socket errors):
+    it is thrown away and the send retried on a fresh one. Server replies such as a
+    refused recipient or rejected data are SMTPExceptions, which are OSErrors too,
+    but the session stays usable and retrying would only be refused again.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of authenticated SMTP sessions.
+    size: maximum number of open sessions.
+    health_check_after: sessions idle for longer than this many seconds are checked with NOOP before reuse.
+    smtp_factory: callable (host, port, timeout=...) -> smtplib.SMTP-like object, replaceable for local test servers.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, size=4,
+                 timeout=30, health_check_after=10, smtp_factory=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.smtp_factory = smtp_factory
+        self._idle = []  # (server, last_used) pairs
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.stats = {"connects": 0, "reuses": 0, "reconnects": 0, "sent": 0, "failed": 0}
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _connect(self):
+        server = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self._count("connects")
+        return server
+
+    @staticmethod
+    def _is_alive(server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.health_check_after or self._is_alive(server):
+                self._count("reuses")
+                return server
+            self._discard(server)
+            self._count("reconnects")
+        return self._connect()
+
+    @contextmanager
+    def connection(self):
+        """Yields a healthy session; it goes back to the pool unless the block raised a connection error."""
+        with self._slots:
+            server = self._checkout()
+            try:
+                yield server
+            except Exception as e:
+                if not isinstance(e, smtplib.SMTPException) or is_connection_error(e):
+                    # Broken session, or one left mid-transaction by a non-SMTP error
+                    self._discard(server)
+                    raise
+                # The session is fine, only this transaction failed (refused recipient, rejected data, ...); reset it for the next user
+                try:
+                    server.rset()
+                except Exception:
+                    self._discard(server)
+                    raise
+                with self._lock:
+                    self._idle.append((server, time.monotonic()))
+                raise
+            else:
+                with self._lock:
+                    self._idle.append((server, time.monotonic()))
+
+    def sendmail(self, sender, recipient, message, retries=1):
+        """
+        Sends one message, reconnecting and retrying if the pooled session turns out to be dead.
+        `message` is a serialized string or a mime_stream.StreamingMessage, which is streamed to the socket.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as server:
+                    if hasattr(message, "iter_chunks"):
+                        send_streaming(server, sender, recipient, message)
+                    else:
+                        server.sendmail(sender, recipient, message)
+                self._count("sent")
+                return
+            except Exception as e:
+                if not is_connection_error(e) or attempt >= retries:
+                    self._count("failed")
+                    raise
+                self._count("reconnects")
+                tracing.current_span().add("retries")
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._discard(server)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_smtp_pool(host, port, username=None, password=None, use_tls=True, size=4):
+    """Returns the process-wide pool for these connection settings, creating it on first use."""
+    # A changed password gets its own pool instead of sessions logged in with the old one
+    key = (host, port, username, hashlib.sha256((password or "").encode("utf-8")).hexdigest(), use_tls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(host, port, username=username, password=password, use_tls=use_tls, size=size)
+            _pools[key] = pool
+        return pool
+
+
+def close_smtp_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def send_bulk(pool, sender, recipients, render_message, max_workers=4):
+    """
+    Delivers one message per recipient with at most `max_workers` sends in flight.
+    render_message(recipient) returns the message for that recipient (see SMTPConnectionPool.sendmail).
+    Returns {recipient: 'sent' | 'error: ...'}.
+    """
+    def deliver(recipient):
+        with tracing.span("smtp_send", kind="step", recipient=recipient) as span:
+            try:
+                pool.sendmail(sender, recipient, render_message(recipient))
+                return recipient, "sent"
+            except Exception as e:
+                span.set(error=str(e))
+                return recipient, f"error: {e}"
+
+    if len(recipients) == 1:
+        return dict([deliver(recipients[0])])
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(recipients))), thread_name_prefix="smtp") as executor:
+        return dict(executor.map(tracing.run_in_context(deliver), recipients))
@@ -0,0 +1,36 @@
+import importlib
+
+# --- Process-wide statistics ---
+# Every optimization keeps its own counters behind a `<name>_stats()` function.
+# main.py prints them after a run, batch.py adds them to its summary and the
+# service serves them on /stats; all three go through collect_stats(). The
+# modules are imported when the statistics are collected, not when this one is.
+
+# (key, label, module, function), in the order they are printed
+STATS_SOURCES = (
+    ("search_cache", "Search cache", "tools", "search_cache_stats"),
+    ("llm_cache", "LLM cache", "llm_cache", "llm_cache_stats"),
+    ("artifact_store", "Artifact store", "artifact_store", "artifact_store_stats"),
+    ("coalescing", "Research coalescing", "coalesce", "coalesce_stats"),
+    ("topic_cache", "Topic cache", "topic_cache", "topic_cache_stats"),
+    ("research", "Parallel research", "research", "research_stats"),
+    ("research_memory", "Research memory", "research_memory", "research_memory_stats"),
+    ("compaction", "Research compaction", "compaction", "compaction_stats"),
+    ("streaming", "Streaming", "streaming", "streaming_stats"),
+    ("rate_limits", "Rate limits", "rate_limit", "rate_limit_stats"),
+    ("llm_routing", "LLM routing", "llm_router", "router_stats"),
+    ("crew_pool", "Crew pool", "crew_pool", "crew_pool_stats"),
+)
+
+
+def collect_stats():
+    """Returns {key: stats dict} for every source in STATS_SOURCES."""
+    return {key: getattr(importlib.import_module(module), function)() for key, _, module, function in STATS_SOURCES}
+
+
+def print_stats(stats=None):
+    """Prints one 'Label: {...}' line per source (collecting the statistics unless given)."""
+    stats = collect_stats() if stats is None else stats
+    for key, label, _, _ in STATS_SOURCES:
+        if key in stats:
+            print(f"{label}: {stats[key]}")
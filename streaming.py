@@ -0,0 +1,274 @@
+import os
+import re
+import time
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from common import env_flag, get_ist_timestamp_str
+
+# --- Streaming Writer output ---
+# The Writer's LLM streams its response (STREAMING=on). An ArticleStream reads the
+# streamed text after 'Final Answer:' and cuts it into sections at blank lines
+# once the next section has started, so a section never changes after it is cut.
+# Each finished section is laid out into the newsletter PDF (pdf_render.IncrementalDocument)
+# and its speech chunks are synthesized into the TTS chunk cache (tts.prewarm) while
+# the Writer keeps generating. When the write task finishes, close() compares the
+# sections with the final article: the rest is laid out and synthesized, and the
+# finished PDF is offered to the PDF task's render(). If the final article differs
+# from what streamed in (a retried LLM call, a cache hit that never streamed), the
+# stream starts over from the final text, which costs as much as not streaming.
+
+STREAMING_ENABLED = env_flag("STREAMING")
+FINAL_ANSWER = "Final Answer:"
+
+# A blank line followed by more text: the section before it is complete
+_SECTION_BREAK = re.compile(r"\n[ \t\r]*\n(?=[ \t]*\S)")
+
+
+def split_sections(text):
+    """Sections of a finished article, split the same way as while streaming."""
+    return [section.strip() for section in _SECTION_BREAK.split(text) if section.strip()]
+
+
+class ArticleStream:
+    """
+    Receives the Writer's response while it is generated (begin/feed) and hands
+    finished sections to PDF layout (pdf=True) and TTS pre-synthesis (audio=True).
+    """
+
+    def __init__(self, pdf=False, audio=False, tts_backend=None, lang="en"):
+        self.pdf = pdf
+        self.audio = audio
+        self.lang = lang
+        self._tts_backend = tts_backend
+        self._tts_executor = None
+        self._pdf_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-pdf") if pdf else None
+        self._document = None
+        self._layout_error = None
+        self._pdf_future = None
+        self._lock = threading.Lock()
+        self._emitted = []  # sections handed on, in order
+        self._diverged = False
+        self._closed = False
+        self._text = None
+        self._begin_call()
+        self._created = time.perf_counter()
+        self._closed_at = None
+        self.stats = {"sections": 0, "streamed": 0, "restarted": False, "tts_chunks_prewarmed": 0,
+                      "first_section_s": None, "pdf_after_write_s": None}
+
+    def _begin_call(self):
+        self._buffer = ""
+        self._offset = None  # start of the current section in _buffer, once 'Final Answer:' is in
+        self._call_index = 0
+
+    def begin(self):
+        """A new LLM response starts (e.g. crewai retried the call); its sections are checked against those already handed on."""
+        with self._lock:
+            if not self._closed:
+                self._begin_call()
+
+    def feed(self, chunk):
+        """Appends streamed text. Never raises, as it runs inside the LLM call."""
+        with self._lock:
+            if self._closed or self._diverged:
+                return
+            self._buffer += chunk
+            if self._offset is None:
+                start = self._buffer.find(FINAL_ANSWER)
+                if start < 0:
+                    return
+                self._offset = start + len(FINAL_ANSWER)
+            for match in _SECTION_BREAK.finditer(self._buffer, self._offset):
+                section = self._buffer[self._offset:match.start()].strip()
+                self._offset = match.end()
+                if section and not self._accept(section):
+                    return
+
+    def _accept(self, section):
+        index = self._call_index
+        self._call_index += 1
+        if index < len(self._emitted):
+            if section != self._emitted[index]:
+                self._diverged = True  # close() starts over from the final text
+                return False
+            return True
+        if self.stats["first_section_s"] is None:
+            self.stats["first_section_s"] = round(time.perf_counter() - self._created, 3)
+        self._emit(section)
+        return True
+
+    def _emit(self, section):
+        self._emitted.append(section)
+        if self.pdf:
+            self._pdf_executor.submit(self._layout, section)
+        if self.audio:
+            try:
+                import tts
+                if self._tts_executor is None:
+                    self._tts_backend = self._tts_backend or tts.get_tts_backend()
+                    self._tts_executor = ThreadPoolExecutor(max_workers=tts.TTS_WORKERS, thread_name_prefix="stream-tts")
+                self.stats["tts_chunks_prewarmed"] += tts.prewarm(section, self._tts_executor, backend=self._tts_backend, lang=self.lang)
+            except Exception as e:
+                # The audio task synthesizes everything itself
+                print(f"[{get_ist_timestamp_str()}] Streaming TTS disabled: {e}")
+                self.audio = False
+
+    # Layout runs on the single PDF thread, in section order
+    def _layout(self, section):
+        if self._layout_error is not None:
+            return
+        try:
+            if self._document is None:
+                from pdf_render import get_pdf_renderer
+                self._document = get_pdf_renderer().incremental_document()
+            self._document.add(section)
+        except Exception as e:
+            self._layout_error = e
+
+    def _reset_document(self):
+        self._document = None
+        self._layout_error = None
+
+    def _finish(self):
+        if self._layout_error is not None:
+            raise self._layout_error
+        if self._document is None:
+            from pdf_render import get_pdf_renderer
+            self._document = get_pdf_renderer().incremental_document()
+        result = self._document.finish()
+        self.stats["pdf_after_write_s"] = round(time.perf_counter() - self._closed_at, 3)
+        return result
+
+    def close(self, article):
+        """Called with the Writer's final output: finishes the PDF and pre-synthesis from it."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._closed_at = time.perf_counter()
+            self._text = article
+            sections = split_sections(article)
+            self.stats["sections"] = len(sections)
+            if self._diverged or sections[:len(self._emitted)] != self._emitted:
+                self.stats["restarted"] = True
+                self._emitted = []
+                if self.pdf:
+                    self._pdf_executor.submit(self._reset_document)
+            self.stats["streamed"] = len(self._emitted)
+            for section in sections[len(self._emitted):]:
+                self._emit(section)
+            if self.pdf:
+                from pdf_render import offer_prerendered
+                self._pdf_future = self._pdf_executor.submit(self._finish)
+                offer_prerendered(article, self._pdf_future)
+            for executor in (self._pdf_executor, self._tts_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False)  # queued work still runs
+        record_stream(self.stats)
+        print(f"[{get_ist_timestamp_str()}] Writer streamed {self.stats['streamed']} of {self.stats['sections']} sections"
+              f"{' (final text differed, started over)' if self.stats['restarted'] else ''}")
+
+    def discard(self):
+        """Drops a pre-rendered PDF that no task used and any work still queued (end of the run)."""
+        with self._lock:
+            self._closed = True
+        if self._pdf_future is not None:
+            from pdf_render import withdraw_prerendered
+            withdraw_prerendered(self._text, self._pdf_future)
+        for executor in (self._pdf_executor, self._tts_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Routing streamed chunks to the run's ArticleStream ---
+# attach() ties a stream to the Writer's LLM object. Chunks are looked up by the
+# LLM that produced them: first in the caller's context (crewai and the stubs emit
+# chunks in the calling thread), then process-wide for event handlers run elsewhere.
+_attached = contextvars.ContextVar("article_stream", default=None)
+_streams_by_llm = {}
+_streams_lock = threading.Lock()
+
+@contextmanager
+def attach(llm, stream):
+    """Sends what `llm` streams to `stream` while the block runs. Either may be None."""
+    if llm is None or stream is None:
+        yield stream
+        return
+    token = _attached.set((id(llm), stream))
+    with _streams_lock:
+        _streams_by_llm[id(llm)] = stream
+    try:
+        yield stream
+    finally:
+        _attached.reset(token)
+        with _streams_lock:
+            if _streams_by_llm.get(id(llm)) is stream:
+                del _streams_by_llm[id(llm)]
+
+
+def _stream_for(source):
+    attached = _attached.get()
+    if attached is not None and attached[0] == id(source):
+        return attached[1]
+    with _streams_lock:
+        return _streams_by_llm.get(id(source))
+
+
+def begin(source):
+    """Marks the start of a streamed response from the LLM `source`."""
+    stream = _stream_for(source)
+    if stream is not None:
+        stream.begin()
+
+
+def feed(source, chunk):
+    """Passes a streamed chunk from the LLM `source` to its stream, if one is attached."""
+    stream = _stream_for(source)
+    if stream is not None and chunk:
+        stream.feed(chunk)
+
+
+_listener_installed = False
+
+def install_crewai_listener():
+    """Forwards crewai's LLM stream chunk events to feed(), once per process."""
+    global _listener_installed
+    with _streams_lock:
+        if _listener_installed:
+            return
+        _listener_installed = True
+    try:
+        from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+    except ImportError:
+        try:
+            from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+        except ImportError:
+            print(f"[{get_ist_timestamp_str()}] This crewai version has no stream events; PDF and audio start after writing.")
+            return
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _on_chunk(source, event):
+        feed(source, getattr(event, "chunk", ""))
+
+
+_totals = Counter()
+_totals_lock = threading.Lock()
+
+def record_stream(stats):
+    with _totals_lock:
+        _totals["runs"] += 1
+        _totals["restarts"] += int(stats["restarted"])
+        for key in ("sections", "streamed", "tts_chunks_prewarmed"):
+            _totals[key] += stats[key]
+
+
+def streaming_stats():
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["enabled"] = STREAMING_ENABLED
+    if totals.get("sections"):
+        totals["streamed_ratio"] = round(totals["streamed"] / totals["sections"], 3)
+    return totals
@@ -1,18 +1,12 @@
-from crewai import Task
-from datetime import datetime
-import pytz
+# crewai is imported inside the factories so that importing this module stays cheap
+from common import get_ist_timestamp_str
+import os
 from typing import List 
 
-# --- Timezone Helper ---
-def get_ist_timestamp_str(format_str="%Y%m%d_%H%M"):
-    """Gets the current timestamp in IST as a formatted string."""
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    return now_ist.strftime(format_str)
-
 # Example Task Templates (Manager might generate similar tasks dynamically)
 
 def create_research_task(agent, topic, context=None):
+    from crewai import Task
     return Task(
         description=f"[{get_ist_timestamp_str()}] Gather comprehensive and up-to-date information on the topic: {topic}. Focus on key findings suitable for a newsletter.",
         expected_output="A detailed report summarizing the key findings, data points, and relevant news about the topic.",
@@ -20,15 +14,27 @@ def create_research_task(agent, topic, context=None):
         context=context
     )
 
-def create_writing_task(agent, topic, context):
+def create_research_synthesis_task(agent, topic, context=None):
+    from crewai import Task
+    return Task(
+        description=f"[{get_ist_timestamp_str()}] Using the merged search results in your context, write a comprehensive and up-to-date report for the topic: {topic}. "
+                    f"The results are already gathered from several searches, do not search again. Focus on key findings suitable for a newsletter and cite the sources you use.",
+        expected_output="A detailed report summarizing the key findings, data points, and relevant news about the topic.",
+        agent=agent,
+        context=context # The search results come from the graph edge (see TaskGraph.add's depends_on)
+    )
+
+def create_writing_task(agent, topic, context=None):
+    from crewai import Task
     return Task(
         description=f"[{get_ist_timestamp_str()}] Based on the research provided in the context, write a concise and engaging newsletter article about {topic}. The tone should be informative yet accessible.",
         expected_output="A well-structured newsletter article in details about the research findings.",
         agent=agent,
-        context=context # Requires context from research_task
+        context=context # Research comes from the graph edge (see TaskGraph.add's depends_on) when it is a DirectTask
     )
 
 def create_pdf_task(agent, topic, base_filename, context):
+    from crewai import Task
     return Task(
         description=f"[{get_ist_timestamp_str()}] Generate a PDF document containing the newsletter article about {topic} provided in the context. Use the base filename '{base_filename}'. The tool will timestamp it.",
         expected_output=f"The full file path to the successfully created, timestamped PDF document based on '{base_filename}'.",
@@ -37,6 +43,7 @@ def create_pdf_task(agent, topic, base_filename, context):
     )
 
 def create_audio_task(agent, topic, base_filename, context):
+    from crewai import Task
     return Task(
         description=f"[{get_ist_timestamp_str()}] Generate an MP3 audio summary of the newsletter article about {topic} provided in the context. Use the base filename '{base_filename}'. The tool will timestamp it.",
         expected_output=f"The full file path to the successfully created, timestamped MP3 audio file based on '{base_filename}'.",
@@ -70,6 +77,7 @@ def create_email_task(agent, recipient_list: List[str], subject: str, body: str,
     # Ensure recipient list is formatted nicely for the description string
     recipient_display = ", ".join(recipient_list)
 
+    from crewai import Task
     return Task(
         description=(
             f"[{timestamp}] Compose and send an email.\n"
@@ -86,6 +94,7 @@ def create_email_task(agent, recipient_list: List[str], subject: str, body: str,
     )
 
 def create_save_local_task(agent, file_producing_task, context):
+    from crewai import Task
     return Task(
         description=f"[{get_ist_timestamp_str()}] Confirm and ensure the timestamped file generated by the prerequisite task exists in the local 'outputs' directory.",
         expected_output="Confirmation that the file path exists locally.",
@@ -97,6 +106,7 @@ def create_save_local_task(agent, file_producing_task, context):
 # --- Initial Manager Task ---
 def create_manager_task(manager_agent, user_prompt):
     timestamp = get_ist_timestamp_str()
+    from crewai import Task
     return Task(
         description=(
             f"[{timestamp}] Analyze the following user request and create a plan to fulfill it using the available specialist agents: '{user_prompt}'. "
@@ -111,3 +121,111 @@ def create_manager_task(manager_agent, user_prompt):
         agent=manager_agent
     )
 
+
+# --- Direct (LLM-free) Tasks ---
+# The PDF, audio, save and email steps only ever call one tool with arguments
+# main.py already knows. Direct tasks call that tool straight away instead of
+# asking an agent's LLM to do it, which saves a round trip per step and keeps
+# file paths exact. They slot into a scheduler.TaskGraph like crewai Tasks, but
+# crewai only accepts its own Tasks as `context`: a crewai Task that follows a
+# direct task gets that edge through TaskGraph.add(..., depends_on=[...]).
+
+class DirectTask:
+    """A graph node that runs `func(upstream_outputs)` without an agent or LLM."""
+    is_direct = True
+
+    def __init__(self, name, func, context=None):
+        self.name = name
+        self.func = func
+        self.context = context or []
+        self.agent = None
+
+    def execute_direct(self, upstream_outputs):
+        """Runs the step with the raw outputs of the context tasks (in context order) and returns its raw output."""
+        from tools import ToolError
+        try:
+            return self.func(upstream_outputs)
+        except ToolError as e: # the tool steps raise instead of returning 'Error...' strings
+            raise RuntimeError(f"Direct task '{self.name}' failed: {e}") from e
+
+def _article_from(upstream_outputs):
+    # Direct file tasks hang off the writer, whose output is the article text
+    return upstream_outputs[0] if upstream_outputs else ""
+
+def create_direct_search_task(topic):
+    from research import gather, record_research
+    from tracing import current_span
+
+    def run(upstream_outputs):
+        # Runs the expanded queries concurrently; its output is the Researcher's context
+        results, stats = gather(topic)
+        task.stats = stats
+        record_research(stats)
+        current_span().set(**{k: v for k, v in stats.items() if k != "failed"}, failed=len(stats["failed"]))
+        print(f"[{get_ist_timestamp_str()}] Searched {stats['succeeded']} of {stats['queries']} queries in {stats['seconds']}s: "
+              f"{stats['results']} results, {stats['merged']} after merging")
+        for query, error in stats["failed"].items():
+            print(f"[{get_ist_timestamp_str()}] Search '{query}' left out: {error}")
+        return results
+
+    task = DirectTask("search", run)
+    task.stats = None
+    return task
+
+def create_direct_compact_task(topic, context, budget=None):
+    from compaction import compact, record_compaction
+    from tracing import current_span
+
+    def run(upstream_outputs):
+        # Sits between research and write; its output is the Writer's context
+        compacted, stats = compact(_article_from(upstream_outputs), topic, budget=budget)
+        task.stats = stats
+        record_compaction(stats)
+        current_span().set(**stats)
+        print(f"[{get_ist_timestamp_str()}] Research compacted: {stats['tokens_in']} -> {stats['tokens_out']} tokens "
+              f"({stats['duplicates']} duplicate passages dropped, {stats['passages_out']} of {stats['passages_in']} kept)")
+        return compacted
+
+    task = DirectTask("compact", run, context=context)
+    task.stats = None
+    return task
+
+def create_direct_pdf_task(base_filename, context):
+    from tools import create_pdf
+    return DirectTask(
+        "pdf",
+        lambda upstream: create_pdf(text_content=_article_from(upstream), base_filename=base_filename),
+        context=context # Requires context from write_task
+    )
+
+def create_direct_audio_task(base_filename, context):
+    from tools import create_audio
+    return DirectTask(
+        "audio",
+        lambda upstream: create_audio(text_content=_article_from(upstream), base_filename=base_filename),
+        context=context # Requires context from write_task
+    )
+
+def create_direct_save_local_task(file_producing_task, context):
+    from tools import confirm_local_file
+    return DirectTask(
+        "save_local",
+        lambda upstream: confirm_local_file(file_path=_article_from(upstream).strip()),
+        context=context # Context is the file producing task, whose output is the file path
+    )
+
+def create_direct_email_task(recipient_list: List[str], subject: str, body: str, context: list = None):
+    from tools import send_email
+
+    def send(upstream_outputs):
+        # Upstream outputs are the paths returned by the save tasks
+        attachment_paths = [path.strip() for path in upstream_outputs if path and os.path.isfile(path.strip())]
+        # One call fans the message out to every recipient over pooled SMTP sessions
+        return send_email(
+            recipient=", ".join(recipient_list),
+            subject=subject,
+            body=body,
+            attachment_paths=attachment_paths or None
+        )
+
+    return DirectTask("email", send, context=context)
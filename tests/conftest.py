@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caches (search, LLM, research memory, topics, ...) go to a scratch directory, not .cache/
+os.environ.setdefault("NEWSLETTER_CACHE_DIR", tempfile.mkdtemp(prefix="newsletter-test-cache-"))
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+import artifact_store
+from artifact_store import ArtifactStore
+from artifacts import run_directory
+
+
+class FakeClock:
+    """Replaces the time module in artifact_store; advance() moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(artifact_store, "time", clock)
+    return clock
+
+
+def make_file(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_identical_files_share_one_blob(tmp_path, clock):
+    store = ArtifactStore(str(tmp_path / "store"))
+    key_a = ArtifactStore.key("pdf", "article", {"font": "DejaVu"})
+    key_b = ArtifactStore.key("pdf", "article", {"font": "Noto"})
+    assert key_a != key_b
+    with run_directory(str(tmp_path / "run1"), run_id="run1", topic="AI chips"):
+        store.put(key_a, "pdf", make_file(tmp_path / "a.pdf", b"same bytes"), meta={"pages": 1})
+    store.put(key_b, "pdf", make_file(tmp_path / "b.pdf", b"same bytes"))
+
+    blobs = [name for _, _, names in os.walk(store.objects_dir) for name in names]
+    assert len(blobs) == 1
+    assert store.stats()["artifacts"] == 2 and store.stats()["bytes"] == len(b"same bytes")
+
+    target = tmp_path / "run2.pdf"
+    assert store.materialize(key_a, str(target)) == {"pages": 1}
+    assert target.read_bytes() == b"same bytes"
+    assert store.materialize(ArtifactStore.key("pdf", "other", {}), str(tmp_path / "x.pdf")) is None
+    assert (store.stats()["hits"], store.stats()["misses"]) == (1, 1)
+    assert [use["run_id"] for use in store.find(topic="chips")] == ["run1"]
+
+
+def test_gc_drops_artifacts_unused_for_max_age(tmp_path, clock):
+    store = ArtifactStore(str(tmp_path / "store"), max_age=3600)
+    old, fresh = ArtifactStore.key("mp3", "old", {}), ArtifactStore.key("mp3", "fresh", {})
+    store.put(old, "mp3", make_file(tmp_path / "old.mp3", b"old audio"))
+    clock.advance(3000)
+    store.put(fresh, "mp3", make_file(tmp_path / "fresh.mp3", b"fresh audio"))
+    clock.advance(1000)  # old is now unused for 4000 s, fresh for 1000 s
+
+    assert store.gc() == {"collected": 1, "bytes_freed": len(b"old audio")}
+    assert store.materialize(old, str(tmp_path / "out.mp3")) is None
+    assert store.materialize(fresh, str(tmp_path / "out.mp3")) is not None
+
+
+def test_gc_evicts_least_recently_used_above_max_bytes(tmp_path, clock):
+    store = ArtifactStore(str(tmp_path / "store"))
+    keys = [ArtifactStore.key("pdf", name, {}) for name in ("a", "b", "c")]
+    for index, key in enumerate(keys):
+        store.put(key, "pdf", make_file(tmp_path / f"{index}.pdf", bytes([index]) * 100))
+        clock.advance(10)
+    store.materialize(keys[0], str(tmp_path / "used.pdf"))  # a becomes the most recently used
+
+    result = store.gc(max_bytes=250)
+    assert result == {"collected": 1, "bytes_freed": 100}
+    assert store.materialize(keys[1], str(tmp_path / "x.pdf")) is None  # b was the least recently used
+    assert store.stats()["bytes"] == 200
+
+
+def test_shared_blob_survives_until_its_last_key_goes(tmp_path, clock):
+    store = ArtifactStore(str(tmp_path / "store"))
+    first, second = ArtifactStore.key("pdf", "1", {}), ArtifactStore.key("pdf", "2", {})
+    store.put(first, "pdf", make_file(tmp_path / "1.pdf", b"x" * 100))
+    clock.advance(10)
+    store.put(second, "pdf", make_file(tmp_path / "2.pdf", b"x" * 100))
+
+    # One 100-byte blob is under the limit: nothing to collect
+    assert store.gc(max_bytes=100) == {"collected": 0, "bytes_freed": 0}
+    assert store.gc(max_bytes=50) == {"collected": 2, "bytes_freed": 100}
+    assert store.stats()["artifacts"] == 0
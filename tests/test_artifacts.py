@@ -0,0 +1,55 @@
+import os
+import json
+import hashlib
+
+import pytest
+
+from artifacts import current_output_dir, current_run_info, is_within_outputs, run_directory, write_manifest
+
+
+def test_manifest_lists_run_files_with_size_and_sha256(tmp_path):
+    run_path = tmp_path / "run1"
+    with run_directory(str(run_path), run_id="run1", topic="AI chips"):
+        assert current_output_dir() == str(run_path)
+        assert current_run_info() == {"run_id": "run1", "topic": "AI chips"}
+        (run_path / "newsletter.pdf").write_bytes(b"%PDF-1.4 test")
+        (run_path / "newsletter.mp3").write_bytes(b"ID3 audio")
+        (run_path / "checkpoint.json").write_text("{}")  # bookkeeping, not an artifact
+        (run_path / "newsletter.pdf.abc123.tmp").write_bytes(b"half written")
+        (run_path / "subdir").mkdir()
+    assert current_run_info() == {}
+
+    manifest_path = write_manifest(str(run_path), "run1", topic="AI chips")
+    assert manifest_path == str(run_path / "manifest.json")
+    manifest = json.loads((run_path / "manifest.json").read_text())
+    assert (manifest["run_id"], manifest["topic"]) == ("run1", "AI chips")
+    assert [a["name"] for a in manifest["artifacts"]] == ["newsletter.mp3", "newsletter.pdf"]
+    pdf = manifest["artifacts"][1]
+    assert pdf["size"] == len(b"%PDF-1.4 test")
+    assert pdf["sha256"] == hashlib.sha256(b"%PDF-1.4 test").hexdigest()
+
+    # Writing it again does not list the previous manifest
+    write_manifest(str(run_path), "run1")
+    assert len(json.loads((run_path / "manifest.json").read_text())["artifacts"]) == 2
+
+
+def test_is_within_outputs(tmp_path):
+    root = tmp_path / "outputs"
+    (root / "run1").mkdir(parents=True)
+    (tmp_path / "secret.txt").write_text("x")
+    assert is_within_outputs(str(root / "run1" / "newsletter.pdf"), root=str(root))
+    assert is_within_outputs(str(root), root=str(root))
+    assert not is_within_outputs(str(root / ".." / "secret.txt"), root=str(root))
+    assert not is_within_outputs(str(tmp_path / "outputs-other" / "a.pdf"), root=str(root))
+    assert not is_within_outputs("/etc/passwd", root=str(root))
+
+
+def test_symlink_out_of_outputs_is_rejected(tmp_path):
+    root = tmp_path / "outputs"
+    root.mkdir()
+    (tmp_path / "secret.txt").write_text("x")
+    try:
+        os.symlink(tmp_path / "secret.txt", root / "link.txt")
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not available")
+    assert not is_within_outputs(str(root / "link.txt"), root=str(root))
@@ -0,0 +1,59 @@
+import json
+from contextlib import contextmanager
+
+import batch
+
+
+class FakeCrewPool:
+    """Stands in for the crew pool; hands out an empty agents dict."""
+
+    @contextmanager
+    def agents(self):
+        yield {}
+
+
+def fake_run_newsletter(topic, **kwargs):
+    if topic == "broken":
+        raise RuntimeError("writer failed")
+    return {
+        "run_id": f"run-{topic}", "output_dir": "outputs/x", "manifest_path": "outputs/x/manifest.json",
+        "filename_base": kwargs["base_filename"], "pdf_path": None, "audio_path": None,
+        "email_recipients": [], "coalesced": False, "shared_research_run_id": None, "topic_cache": None,
+        "compaction": None, "research": None, "streaming": None, "final_output": f"newsletter on {topic}",
+    }
+
+
+def test_failed_requests_do_not_stop_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "run_newsletter", fake_run_newsletter)
+    monkeypatch.setattr(batch, "get_crew_pool", lambda *args: FakeCrewPool())
+    input_path = tmp_path / "requests.jsonl"
+    input_path.write_text("\n".join([
+        json.dumps({"topic": "chips", "id": "a"}),
+        "# comments and blank lines are skipped",
+        "",
+        json.dumps({"topic": "broken", "id": "b"}),
+        "{not json",
+        json.dumps({"pdf": True}),
+        json.dumps({"topic": "energy"}),
+    ]), encoding="utf-8")
+    results_path = tmp_path / "results.jsonl"
+
+    summary = batch.run_batch(str(input_path), str(results_path), workers=2)
+
+    assert (summary["requests"], summary["succeeded"], summary["failed"]) == (5, 2, 3)
+    records = {record["id"]: record for record in map(json.loads, results_path.read_text().splitlines())}
+    assert records["a"]["status"] == "ok" and records["a"]["final_output"] == "newsletter on chips"
+    assert records["a"]["run_id"] == "run-chips" and records["a"]["duration_s"] >= 0
+    assert records["b"]["status"] == "error" and records["b"]["error"] == "RuntimeError: writer failed"
+    assert "Traceback" in records["b"]["traceback"]
+    assert records["5"]["error"].startswith("Invalid JSON")
+    assert records["6"]["error"] == "Request spec is missing 'topic'"
+    # Requests without an id are named after their line, which also keeps their filenames apart
+    assert records["7"]["filename_base"] == "NewsLetter_7"
+
+
+def test_validate_spec():
+    assert batch.validate_spec({"topic": "AI"}) is None
+    assert batch.validate_spec(["AI"]) == "Request spec must be a JSON object"
+    assert batch.validate_spec({"topic": "  "}) == "Request spec is missing 'topic'"
+    assert "priority" in batch.validate_spec({"topic": "AI", "priority": "urgent"})
@@ -0,0 +1,55 @@
+import json
+import smtplib
+import urllib.request
+import pytest
+
+pytest.importorskip("crewai")
+
+from benchmarks.pipeline import SCENARIOS, _summary
+from benchmarks.stubs import CannedLLM, FakeSerper, SMTPSink
+
+
+def test_canned_llm_searches_then_answers():
+    llm = CannedLLM()
+    prompt = ("You are Senior Researcher.\nTool Name: Search the internet with Serper\n"
+              "Gather information on the topic: AI chips.\n")
+    action = llm.call([{"role": "user", "content": prompt}])
+    assert "Action: Search the internet with Serper" in action
+    assert json.loads(action.split("Action Input: ")[1]) == {"search_query": "AI chips"}
+    answer = llm.call([{"role": "user", "content": prompt + "Observation: ten results"}])
+    assert answer.startswith("Thought: I now know the final answer\nFinal Answer: Research findings on AI chips")
+    article = llm.call("You are Content Writer. Write an article about AI chips. ")
+    assert "Final Answer: # Ai Chips: The Weekly Briefing" in article
+    assert llm.calls == 3
+
+
+def test_fake_serper_answers_like_serper():
+    serper = FakeSerper().start()
+    try:
+        request = urllib.request.Request(serper.url, data=json.dumps({"q": "ai chips"}).encode(), method="POST")
+        with urllib.request.urlopen(request) as response:
+            results = json.load(response)
+    finally:
+        serper.stop()
+    assert results["searchParameters"]["q"] == "ai chips"
+    assert len(results["organic"]) == 10 and results["organic"][0]["link"] == "https://example.com/1"
+    assert serper.requests == 1
+
+
+def test_smtp_sink_counts_every_recipient():
+    sink = SMTPSink().start()
+    try:
+        with smtplib.SMTP(sink.host, sink.port) as server:
+            server.sendmail("bench@example.com", ["a@example.com", "b@example.com"], "Subject: hi\r\n\r\nhello\r\n")
+            server.sendmail("bench@example.com", "c@example.com", "Subject: hi\r\n\r\nhello\r\n")
+    finally:
+        sink.stop()
+    assert sink.messages == 3 and sink.bytes > 0
+
+
+def test_scenarios_add_one_delivery_step_each():
+    steps = [sum(flags.values()) for flags in SCENARIOS.values()]
+    assert steps == [0, 1, 2, 3]
+    # Nearest-rank percentiles: always a measured value
+    summary = _summary([4.0, 1.0, 3.0, 2.0])
+    assert (summary["p50"], summary["p95"], summary["mean"]) == (2.0, 4.0, 2.5)
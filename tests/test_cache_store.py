@@ -0,0 +1,79 @@
+import pytest
+
+import cache_store
+from cache_store import DiskCache
+
+
+class FakeClock:
+    """Replaces the time module in cache_store; advance() moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_store, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    cache.set("query", {"result": 1})
+    cache.set("pinned", "kept", ttl=3600)
+    clock.advance(59)
+    assert cache.get("query") == {"result": 1}
+    clock.advance(2)
+    assert cache.get("query") is None
+    assert cache.get("pinned") == "kept"
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_by_count(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    clock.advance(1)
+    cache.set("b", 2)
+    clock.advance(1)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    clock.advance(1)
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_bytes=25)
+    for key in ("a", "b", "c"):
+        cache.set_bytes(key, b"x" * 10)
+        clock.advance(1)
+    assert cache.get_bytes("a") is None
+    assert cache.get_bytes("b") == b"x" * 10 and cache.get_bytes("c") == b"x" * 10
+    assert cache.stats()["bytes"] == 20
+
+
+def test_namespaces_are_separate_and_stats_count_lookups(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    search, llm = DiskCache(path, namespace="serper"), DiskCache(path, namespace="llm")
+    search.set("key", "search result")
+    assert llm.get("key") is None
+    assert search.get("key") == "search result"
+    assert search.get("other") is None
+    stats = search.stats()
+    assert (stats["hits"], stats["misses"], stats["sets"], stats["entries"]) == (1, 1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_search_queries_are_normalised_without_reordering():
+    from tools import normalize_search_query
+    assert normalize_search_query("  Latest AI   news!  ") == normalize_search_query("latest ai news")
+    assert normalize_search_query("C++ vs. Rust?") == "c++ vs rust"
+    assert normalize_search_query("apple buys startup") != normalize_search_query("startup buys apple")
+    assert normalize_search_query("new york new jobs") == "new york new jobs"
@@ -0,0 +1,79 @@
+import pytest
+
+from checkpoint import RunCheckpoint
+from scheduler import TaskGraph
+from tasks import DirectTask
+
+
+def build_graph(tmp_path, calls, fail_email=False):
+    """write -> pdf -> email and write -> audio; the file steps write real files into tmp_path."""
+    def step(key, produce=None):
+        def run(upstream_outputs):
+            calls.append(key)
+            if key == "email" and fail_email:
+                raise RuntimeError("SMTP server unreachable")
+            if produce is None:
+                return f"{key} done"
+            path = tmp_path / produce
+            path.write_text(f"{key} of {upstream_outputs[0]}")
+            return f"Saved {key} to {path}"
+        return run
+
+    graph = TaskGraph()
+    write = graph.add("write", DirectTask("write", step("write")))
+    pdf = graph.add("pdf", DirectTask("pdf", step("pdf", "newsletter.pdf"), context=[write]))
+    graph.add("audio", DirectTask("audio", step("audio", "newsletter.mp3"), context=[write]))
+    graph.add("email", DirectTask("email", step("email"), context=[pdf]))
+    return graph
+
+
+def run_with_checkpoint(graph, checkpoint):
+    completed, problems = checkpoint.completed_outputs(graph)
+    outputs = graph.run(max_workers=1, completed=completed, on_task_complete=checkpoint.record_task)
+    return outputs, problems
+
+
+def test_resume_runs_only_unfinished_tasks(tmp_path):
+    calls = []
+    checkpoint = RunCheckpoint.create({"topic": "AI chips"}, run_id="run1", directory=str(tmp_path))
+    with pytest.raises(RuntimeError, match="SMTP server unreachable"):
+        run_with_checkpoint(build_graph(tmp_path, calls, fail_email=True), checkpoint)
+    checkpoint.finish("failed", "RuntimeError: SMTP server unreachable")
+    assert sorted(calls) == ["audio", "email", "pdf", "write"]
+
+    resumed = RunCheckpoint.load("run1", directory=str(tmp_path))
+    assert resumed.params == {"topic": "AI chips"}
+    assert resumed.state["status"] == "failed"
+    assert [a["path"] for a in resumed.state["tasks"]["pdf"]["artifacts"]] == [str(tmp_path / "newsletter.pdf")]
+
+    calls.clear()
+    outputs, problems = run_with_checkpoint(build_graph(tmp_path, calls), resumed)
+    assert calls == ["email"] and problems == {}
+    assert outputs["pdf"] == f"Saved pdf to {tmp_path / 'newsletter.pdf'}"
+    resumed.finish("completed")
+    assert RunCheckpoint.load("run1", directory=str(tmp_path)).state["status"] == "completed"
+
+
+@pytest.mark.parametrize("tamper, reason", [
+    (lambda path: path.write_text("edited by hand"), "has changed"),
+    (lambda path: path.unlink(), "is missing"),
+])
+def test_changed_file_reruns_its_task_and_everything_downstream(tmp_path, tamper, reason):
+    calls = []
+    checkpoint = RunCheckpoint.create({"topic": "AI chips"}, run_id="run2", directory=str(tmp_path))
+    run_with_checkpoint(build_graph(tmp_path, calls), checkpoint)
+    tamper(tmp_path / "newsletter.pdf")
+
+    calls.clear()
+    resumed = RunCheckpoint.load("run2", directory=str(tmp_path))
+    outputs, problems = run_with_checkpoint(build_graph(tmp_path, calls), resumed)
+    assert calls == ["pdf", "email"]  # write and audio are reused
+    assert reason in problems["pdf"]
+    assert problems["email"] == "upstream task is re-run"
+    assert (tmp_path / "newsletter.pdf").read_text() == "pdf of write done"
+    assert set(outputs) == {"write", "pdf", "audio", "email"}
+
+
+def test_missing_checkpoint(tmp_path):
+    with pytest.raises(FileNotFoundError, match="No checkpoint for run 'nope'"):
+        RunCheckpoint.load("nope", directory=str(tmp_path))
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+import coalesce
+from coalesce import ResearchCoalescer
+
+
+class FakeClock:
+    """Replaces the time module in coalesce; advance() moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(coalesce, "time", clock)
+    monkeypatch.setattr(coalesce, "TOPIC_CACHE_ENABLED", False)
+    return clock
+
+
+def publish_all(entry):
+    for key in ("search", "research", "write"):
+        entry.publish(key, f"{key} output")
+
+
+def test_requests_during_the_leader_wait_for_its_outputs(clock):
+    coalescer = ResearchCoalescer(window=600)
+    role, entry = coalescer.join("AI chips", "run1", "parallel", False)
+    assert (role, entry.leader_run_id) == ("leader", "run1")
+
+    role, joined = coalescer.join("ai chips!", "run2", "parallel", False)
+    assert (role, joined) == ("in_flight", entry)
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(joined.wait(5)))
+    waiter.start()
+    entry.publish("format_pdf", "not shared")
+    publish_all(entry)
+    waiter.join(5)
+    assert waited == [{"search": "search output", "research": "research output", "write": "write output"}]
+
+    clock.advance(599)
+    assert coalescer.join("AI  chips", "run3", "parallel", False) == ("recent", entry)
+    clock.advance(2)
+    role, fresh = coalescer.join("AI chips", "run4", "parallel", False)
+    assert role == "leader" and fresh is not entry
+    stats = coalescer.stats()
+    assert (stats["leaders"], stats["joined_in_flight"], stats["joined_recent"]) == (2, 1, 1)
+
+
+def test_research_mode_and_compaction_are_part_of_the_key(clock):
+    coalescer = ResearchCoalescer()
+    assert coalescer.join("AI chips", "run1", "parallel", False)[0] == "leader"
+    assert coalescer.join("AI chips", "run2", "agent", False)[0] == "leader"
+    assert coalescer.join("AI chips", "run3", "parallel", True)[0] == "leader"
+    assert coalescer.join("AI chips", "run4", "agent", False)[0] == "in_flight"
+
+
+def test_similar_topics_only_match_the_same_variant(clock, monkeypatch):
+    monkeypatch.setattr(coalesce, "TOPIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(coalesce, "similarity", lambda a, b: 1.0)
+    coalescer = ResearchCoalescer()
+    assert coalescer.join("AI news latest", "run1", "parallel", False)[0] == "leader"
+    assert coalescer.join("AI news today", "run2", "parallel", False)[0] == "in_flight"
+    assert coalescer.join("AI news today", "run3", "parallel", True)[0] == "leader"
+
+
+def test_failed_leader_releases_waiters_and_the_next_request_leads(clock):
+    coalescer = ResearchCoalescer()
+    _, entry = coalescer.join("AI chips", "run1", "parallel", False)
+    _, joined = coalescer.join("AI chips", "run2", "parallel", False)
+    coalescer.fail(entry, "Run 'run1' failed before writing finished")
+    assert joined.wait(5) is None and joined.error is not None
+    assert coalescer.join("AI chips", "run3", "parallel", False)[0] == "leader"
+    assert coalescer.stats()["leader_failed"] == 1
+
+    # Once the article is published, a late failure changes nothing
+    _, entry = coalescer.join("Energy", "run4", "parallel", False)
+    publish_all(entry)
+    coalescer.fail(entry, "Run 'run4' failed before writing finished")
+    assert entry.wait(0) is not None and coalescer.stats()["leader_failed"] == 1
+
+
+def test_wait_gives_up_after_its_timeout(clock):
+    _, entry = ResearchCoalescer().join("AI chips", "run1", "parallel", False)
+    assert entry.wait(0.01) is None and entry.error is None
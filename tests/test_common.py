@@ -0,0 +1,24 @@
+import threading
+
+from common import env_flag, thread_connection
+
+
+def test_env_flag(monkeypatch):
+    monkeypatch.delenv("NEWSLETTER_TEST_FLAG", raising=False)
+    assert env_flag("NEWSLETTER_TEST_FLAG") is True
+    assert env_flag("NEWSLETTER_TEST_FLAG", "off") is False
+    for value, expected in (("OFF", False), (" no ", False), ("0", False), ("false", False), ("on", True), ("yes", True), ("1", True)):
+        monkeypatch.setenv("NEWSLETTER_TEST_FLAG", value)
+        assert env_flag("NEWSLETTER_TEST_FLAG", "off") is expected
+
+
+def test_each_thread_gets_its_own_wal_connection(tmp_path):
+    local, path = threading.local(), str(tmp_path / "store.sqlite")
+    conn = thread_connection(local, path)
+    assert thread_connection(local, path) is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    other = []
+    thread = threading.Thread(target=lambda: other.append(thread_connection(local, path)))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
@@ -0,0 +1,69 @@
+import os
+import sys
+import subprocess
+
+from compaction import compact, dedupe_passages, split_passages
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def compaction_enabled(value):
+    """COMPACTION_ENABLED as seen by a fresh interpreter with COMPACTION=value (unset when None)."""
+    env = {k: v for k, v in os.environ.items() if k != "COMPACTION"}
+    if value is not None:
+        env["COMPACTION"] = value
+    code = "import compaction; print(compaction.COMPACTION_ENABLED)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip() == "True"
+
+
+def test_compaction_is_opt_in():
+    assert not compaction_enabled(None)
+    assert compaction_enabled("on")
+
+
+def test_split_passages_keeps_paragraphs_and_list_items():
+    report = "Summary line one\nline two\n\n- first item\n- second item\n  continued\n1. numbered"
+    assert split_passages(report) == [
+        "Summary line one\nline two", "- first item", "- second item\n  continued", "1. numbered",
+    ]
+
+
+def test_dedupe_drops_repeated_sources_and_near_identical_passages():
+    passages = [
+        "Nvidia unveiled a new AI chip for data centers on Monday (https://example.com/nvidia).",
+        "Source: https://example.com/nvidia",  # only cites a source already cited
+        "Nvidia unveiled a new AI chip for data centers on Monday, analysts said.",  # same 3-grams
+        "AMD answered with cheaper accelerators (https://example.com/nvidia) and a new roadmap for 2026 "
+        "covering memory bandwidth, packaging and software support.",  # same URL but new content
+    ]
+    kept, dropped = dedupe_passages(passages, threshold=0.6)
+    assert kept == [passages[0], passages[3]]
+    assert dropped == 2
+
+
+def test_report_under_budget_is_only_deduplicated():
+    report = "AI chips are selling fast.\n\nAI chips are selling fast.\n\nMemory prices rose."
+    compacted, stats = compact(report, "AI chips", budget=1000)
+    assert compacted == "AI chips are selling fast.\n\nMemory prices rose."
+    assert (stats["passages_in"], stats["duplicates"], stats["passages_out"]) == (3, 1, 2)
+    assert stats["tokens_saved"] == stats["tokens_in"] - stats["tokens_out"]
+
+
+def test_over_budget_keeps_the_most_relevant_passages_in_report_order():
+    passages = [
+        "Weather was mild across the region this week with some light rain.",
+        "AI chips: Nvidia shipped its new AI chips to cloud providers.",
+        "Sports results from the weekend league games and the cup final.",
+        "Demand for AI chips keeps rising as data centers expand.",
+    ]
+    budget = (len(passages[1]) + len(passages[3])) // 4
+    compacted, stats = compact("\n\n".join(passages), "AI chips", budget=budget)
+    assert compacted == passages[1] + "\n\n" + passages[3]
+    assert stats["passages_out"] == 2 and stats["tokens_out"] <= budget
+
+
+def test_single_passage_over_budget_is_truncated():
+    compacted, stats = compact("AI chips " * 100, "AI chips", budget=10)
+    assert compacted == ("AI chips " * 100)[:40]
+    assert stats["passages_out"] == 1
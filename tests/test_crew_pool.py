@@ -0,0 +1,74 @@
+import os
+import pytest
+
+# Agents and LLM clients are only built, never called
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("SERPER_API_KEY", "test")
+
+import crew_pool  # noqa: E402
+from crew_pool import CrewPool  # noqa: E402
+
+
+class FakeAgents(dict):
+    """Stands in for agents.SpecialistAgents: builds an object per agent name on first lookup."""
+
+    def __missing__(self, name):
+        self[name] = object()
+        return self[name]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(crew_pool, "CREW_POOL_AGENTS", ["writer"])
+    return CrewPool(size=1, factory=FakeAgents)
+
+
+def test_every_run_gets_agents_no_earlier_run_used(pool):
+    pool.warm_up()
+    handed_out = []
+    for _ in range(3):
+        with pool.agents() as agents:
+            assert "writer" in agents  # built before the checkout
+            handed_out.append(agents["writer"])
+    assert len({id(agent) for agent in handed_out}) == 3
+    stats = pool.stats()
+    assert (stats["checkouts"], stats["builds"], stats["failed_runs"], stats["workers"]) == (3, 4, 0, 1)
+
+
+def test_failed_run_and_failed_rebuild(monkeypatch):
+    monkeypatch.setattr(crew_pool, "CREW_POOL_AGENTS", ["writer"])
+    broken = []
+    pool = CrewPool(size=1, factory=lambda: {} if broken else FakeAgents())
+    with pytest.raises(RuntimeError):
+        with pool.agents() as agents:
+            failed = agents["writer"]
+            raise RuntimeError("writer failed")
+    with pool.agents() as agents:
+        assert agents["writer"] is not failed
+        broken.append(True)  # the rebuild at check-in cannot make a writer
+    assert pool.stats()["build_failures"] == 1
+    with pytest.raises(KeyError):  # the next checkout tries again and raises
+        with pool.agents():
+            pass
+    broken.clear()
+    with pool.agents() as agents:
+        assert "writer" in agents
+    assert pool.stats()["failed_runs"] == 1
+
+
+def test_busy_pool_builds_an_extra_worker_and_drops_it(pool):
+    with pool.agents() as first, pool.agents() as second:
+        assert first is not second
+    stats = pool.stats()
+    assert (stats["overflow"], stats["workers"]) == (1, 1)
+
+
+def test_pooled_crewai_agents_are_new_for_each_run():
+    pytest.importorskip("crewai")
+    pool = CrewPool(size=1)
+    with pool.agents() as agents:
+        researcher = agents["researcher"]
+        researcher.tools_results = [{"result": "results", "tool_name": "search_tool"}]
+    with pool.agents() as again:
+        assert again["researcher"] is not researcher
+        assert again["researcher"].tools_results == []
@@ -0,0 +1,45 @@
+import pytest
+
+import tools
+from tasks import DirectTask, create_direct_email_task, create_direct_save_local_task
+
+
+@pytest.fixture
+def email_env(monkeypatch):
+    monkeypatch.setenv("SENDER_EMAIL", "newsletter@example.com")
+    monkeypatch.setenv("EMAIL_HOST", "smtp.test")
+    monkeypatch.setenv("EMAIL_USE_TLS", "false")
+    monkeypatch.setattr(tools, "get_smtp_pool", lambda *args, **kwargs: None)
+
+
+def fake_send_bulk(statuses):
+    return lambda pool, sender, recipients, build, max_workers=None: {r: statuses.get(r, "sent") for r in recipients}
+
+
+def test_partial_email_failure_fails_the_direct_task(email_env, monkeypatch):
+    monkeypatch.setattr(tools, "send_bulk", fake_send_bulk({"b@example.com": "refused: 550 User unknown"}))
+    task = create_direct_email_task(["a@example.com", "b@example.com"], "Weekly", "Hello")
+    with pytest.raises(RuntimeError, match="Direct task 'email' failed: .*Failed for b@example.com") as raised:
+        task.execute_direct([])
+    assert raised.value.__cause__.sent == ["a@example.com"]
+    assert list(raised.value.__cause__.failed) == ["b@example.com"]
+    # An agent driving the tool still gets the report as text
+    report = tools.email_sending_tool.run(recipient="a@example.com, b@example.com", subject="Weekly", body="Hello")
+    assert "Failed for b@example.com" in report
+
+
+def test_email_sent_to_everyone_succeeds(email_env, monkeypatch):
+    monkeypatch.setattr(tools, "send_bulk", fake_send_bulk({}))
+    task = create_direct_email_task(["a@example.com", "b@example.com"], "Weekly", "Hello")
+    assert "Email sent successfully to a@example.com, b@example.com" in task.execute_direct([])
+
+
+def test_outputs_mentioning_errors_are_not_failures():
+    article = "# Markets\nError: the feed was late, analysts said."
+    assert DirectTask("write_copy", lambda upstream: article).execute_direct([]) == article
+
+
+def test_save_outside_outputs_fails_the_direct_task(tmp_path):
+    task = create_direct_save_local_task(None, context=[])
+    with pytest.raises(RuntimeError, match="outside"):
+        task.execute_direct([str(tmp_path / "elsewhere.pdf")])
@@ -0,0 +1,34 @@
+import os
+import pytest
+
+# Agents and LLM clients are only built, never called
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("SERPER_API_KEY", "test")
+
+crewai = pytest.importorskip("crewai")
+
+
+@pytest.mark.parametrize("compaction", [True, False])
+@pytest.mark.parametrize("research_mode", ["parallel", "agent"])
+def test_default_graph_builds_with_crewai_tasks(tmp_path, research_mode, compaction):
+    from main import build_newsletter_graph
+    graph = build_newsletter_graph("AI chips", "test", do_pdf=True, do_audio=True, research_mode=research_mode,
+                                   compaction=compaction, run_output_dir=str(tmp_path))
+
+    research_edge = ["search"] if research_mode == "parallel" else []
+    assert graph.depends_on["research"] == research_edge
+    assert graph.depends_on["write"] == ["compact" if compaction else "research"]
+    assert isinstance(graph.nodes["write"], crewai.Task)
+    # A crewai Task's own context only ever holds crewai Tasks; direct tasks are graph edges
+    for task in graph.nodes.values():
+        if isinstance(task, crewai.Task):
+            assert all(isinstance(upstream, crewai.Task) for upstream in task.context or [])
+
+
+def test_graph_uses_the_given_agents(tmp_path):
+    from main import build_newsletter_graph
+    from agents import create_specialist_agents
+    agents = create_specialist_agents()  # nothing built yet, so the dict is empty
+    graph = build_newsletter_graph("AI chips", "test", agents=agents, research_mode="agent", run_output_dir=str(tmp_path))
+    assert graph.nodes["research"].agent is agents["researcher"]
+    assert graph.nodes["write"].agent is agents["writer"]
@@ -0,0 +1,20 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_after(statement):
+    """The heavy modules loaded by running `statement` in a fresh interpreter."""
+    code = f"import sys; {statement}; print(' '.join(m for m in ('crewai', 'crewai_tools', 'fpdf') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_tools_and_stats_import_without_crewai():
+    assert imported_after("import tools, stats, tasks") == []
+
+
+def test_tools_are_built_on_first_access():
+    assert "crewai" in imported_after("from tools import pdf_creation_tool")
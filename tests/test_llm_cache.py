@@ -0,0 +1,67 @@
+import os
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+pytest.importorskip("crewai")
+
+from cache_store import DiskCache
+from llm_cache import CachedLLM, LLMCacheMiss
+
+
+class FakeProvider:
+    """Counts the calls that reach the provider; each answers with a numbered response."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def respond(self):
+        self.calls += 1
+        return f"response {self.calls}"
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = FakeProvider()
+    monkeypatch.setattr(CachedLLM, "_provider_call", lambda llm, *args, **kwargs: provider.respond())
+    return provider
+
+
+def make_llm(tmp_path, mode):
+    cache = DiskCache(str(tmp_path / "llm.sqlite"), namespace="responses")
+    return CachedLLM(model="gemini/gemini-2.0-flash", agent_name="writer", mode=mode, cache=cache)
+
+
+def test_recorded_responses_replay_without_calling_the_llm(tmp_path, provider):
+    prompt = [{"role": "user", "content": "[20260101_0900] Write about AI chips"}]
+    assert make_llm(tmp_path, "record").call(prompt) == "response 1"
+    # The task's creation stamp differs between runs but is not part of the key
+    replayed = make_llm(tmp_path, "replay").call([{"role": "user", "content": "[20261017_1400] Write about AI chips"}])
+    assert replayed == "response 1"
+    assert provider.calls == 1
+
+
+def test_replay_miss_raises(tmp_path, provider):
+    with pytest.raises(LLMCacheMiss, match="writer"):
+        make_llm(tmp_path, "replay").call([{"role": "user", "content": "never recorded"}])
+    assert provider.calls == 0
+
+
+def test_record_overwrites_and_on_mode_serves_hits(tmp_path, provider):
+    prompt = [{"role": "user", "content": "Summarise the research"}]
+    llm = make_llm(tmp_path, "record")
+    assert llm.call(prompt) == "response 1"
+    assert llm.call(prompt) == "response 2"  # record always calls the LLM
+    cached = make_llm(tmp_path, "on")
+    assert cached.call(prompt) == "response 2"
+    assert cached.call([{"role": "user", "content": "Something else"}]) == "response 3"
+    assert provider.calls == 3
+
+
+def test_tool_executing_calls_are_never_cached(tmp_path, provider):
+    llm = make_llm(tmp_path, "on")
+    prompt = [{"role": "user", "content": "Create the PDF"}]
+    llm.call(prompt, available_functions={"pdf": print})
+    llm.call(prompt, available_functions={"pdf": print})
+    assert provider.calls == 2
+    assert llm.response_cache.stats()["entries"] == 0
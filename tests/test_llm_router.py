@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+import llm_router
+import rate_limit
+from llm_router import ModelRouter, stats_for
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after} if retry_after else {}})()
+
+
+class ScriptedLLM:
+    """Fake provider client: each call runs the next step of its model's script (an exception, a callable or a reply)."""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        return step() if callable(step) else step
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Registers the 'fast' and 'slow' fake providers; returns the model -> ScriptedLLM dict to fill."""
+    clients = {}
+    monkeypatch.setattr(llm_router, "_clients", {})
+    monkeypatch.setattr(llm_router, "_model_stats", {})
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    for prefix in ("fast", "slow"):
+        monkeypatch.setitem(llm_router._PROVIDERS, prefix, lambda model: clients[model])
+    return clients
+
+
+def test_fails_over_on_server_errors_without_retrying_in_place(providers):
+    providers["slow/primary"] = ScriptedLLM([ProviderError(503), "from primary"])
+    providers["fast/backup"] = ScriptedLLM(["from backup"])
+    router = ModelRouter(["slow/primary", "fast/backup"], hedge=False)
+
+    assert router.call([{"role": "user", "content": "hi"}]) == "from backup"
+    assert providers["slow/primary"].calls == 1
+    assert stats_for("slow/primary").counts["failovers"] == 1
+    # The primary is still preferred: one 5xx neither throttles it nor marks it failing
+    assert router.call("hi again") == "from primary"
+
+
+def test_throttled_provider_moves_to_the_back(providers):
+    providers["slow/primary"] = ScriptedLLM([ProviderError(429, retry_after="30"), "from primary"])
+    providers["fast/backup"] = ScriptedLLM(["from backup"])
+    router = ModelRouter(["slow/primary", "fast/backup"], hedge=False)
+
+    assert router.call("hi") == "from backup"
+    assert rate_limit.get_limiter("llm:slow").is_throttled()
+    assert router.candidates() == ["fast/backup", "slow/primary"]
+    assert router.call("hi again") == "from backup"
+    assert providers["slow/primary"].calls == 1
+
+
+def test_other_errors_and_the_last_model_raise(providers):
+    providers["slow/primary"] = ScriptedLLM([ValueError("bad request")])
+    providers["fast/backup"] = ScriptedLLM(["from backup"])
+    with pytest.raises(ValueError):
+        ModelRouter(["slow/primary", "fast/backup"], hedge=False).call("hi")
+    assert providers["fast/backup"].calls == 0
+
+
+def test_slow_call_is_hedged_and_the_first_answer_wins(providers, monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_MIN_S", 0.05)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_AFTER_S", 0.05)
+    release = threading.Event()
+    providers["slow/primary"] = ScriptedLLM([lambda: release.wait(5) and "from primary"])
+    providers["fast/backup"] = ScriptedLLM(["from backup"])
+    router = ModelRouter(["slow/primary", "fast/backup"], hedge=True)
+    try:
+        assert router.call("hi") == "from backup"
+    finally:
+        release.set()
+    assert stats_for("fast/backup").counts["hedges"] == 1
+    assert stats_for("fast/backup").counts["hedge_wins"] == 1
+
+
+def test_fast_primary_and_tool_calls_are_not_hedged(providers, monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_MIN_S", 0.05)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_AFTER_S", 0.05)
+    release = threading.Event()
+    providers["slow/primary"] = ScriptedLLM(["from primary", lambda: release.wait(0.2) or "slow tool call"])
+    providers["fast/backup"] = ScriptedLLM(["from backup"])
+    router = ModelRouter(["slow/primary", "fast/backup"], hedge=True)
+
+    assert router.call("hi") == "from primary"
+    assert router.call("use a tool", available_functions={"search": print}) == "slow tool call"
+    assert providers["fast/backup"].calls == 0
+    assert stats_for("fast/backup").counts["hedges"] == 0
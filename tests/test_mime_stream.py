@@ -0,0 +1,51 @@
+import re
+import email
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from mime_stream import StreamingMessage
+
+BODY = "This week in AI chips\n.NET and .io domains\n.\nA line of its own above ends SMTP DATA unless stuffed\n"
+
+
+def generated_message(streamed, body, attachment_paths):
+    """The same message built with email.mime and serialised by email.generator, as smtplib.sendmail sends it."""
+    headers = email.message_from_bytes(streamed)
+    message = MIMEMultipart(boundary=headers.get_boundary())
+    for name in ("From", "To", "Subject", "Date", "Message-ID"):
+        message[name] = headers[name]
+    body_part = MIMEText(body, "plain")
+    del body_part["MIME-Version"]
+    message.attach(body_part)
+    for path in attachment_paths:
+        part = MIMEBase("application", "octet-stream")
+        with open(path, "rb") as file:
+            part.set_payload(file.read())
+        encoders.encode_base64(part)
+        part.add_header("Content-Disposition", f"attachment; filename={path.name}")
+        message.attach(part)
+    data = message.as_bytes(policy=message.policy.clone(linesep="\r\n"))
+    return re.sub(rb"(?m)^\.", b"..", data)  # smtplib's dot-stuffing
+
+
+def test_streamed_message_matches_email_generator(tmp_path):
+    attachments = [tmp_path / "newsletter.pdf", tmp_path / "summary.mp3"]
+    attachments[0].write_bytes(bytes(range(256)) * 700)  # spans several encoding chunks
+    attachments[1].write_bytes(b"ID3" + b"\x00" * 1000)
+    message = StreamingMessage("newsletter@example.com", "AI Weekly", BODY, [str(p) for p in attachments])
+
+    streamed = b"".join(message.iter_chunks("reader@example.com"))
+
+    assert streamed == generated_message(streamed, BODY, attachments)
+    assert b"\r\n...NET and" not in streamed and b"\r\n..NET and" in streamed
+    assert b"\r\n..\r\n" in streamed
+
+
+def test_each_recipient_gets_its_own_to_header(tmp_path):
+    message = StreamingMessage("newsletter@example.com", "AI Weekly", "Hello")
+    first = email.message_from_bytes(b"".join(message.iter_chunks("a@example.com")))
+    second = email.message_from_bytes(b"".join(message.iter_chunks("b@example.com")))
+    assert (first["To"], second["To"]) == ("a@example.com", "b@example.com")
+    assert first.get_payload(0).get_payload() == second.get_payload(0).get_payload() == "Hello"
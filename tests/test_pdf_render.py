@@ -0,0 +1,58 @@
+import pytest
+from pdf_render import FPDF_MAJOR, PDFRenderer
+
+ARTICLE = "# Weekly “Briefing”\n\n## Markets → outlook\n\nEquities rallied 2.4% and the euro (€) firmed.\n\n- First point\n- Second point\n"
+
+
+@pytest.fixture
+def renderer():
+    renderer = PDFRenderer()
+    if not renderer.unicode or FPDF_MAJOR < 2:
+        pytest.skip("needs fpdf2 and a Unicode TrueType font")
+    return renderer
+
+
+def test_documents_share_parsed_fonts(renderer):
+    first, second = renderer._new_document(), renderer._new_document()
+    for key in ("newslettersans", "newslettersansB"):
+        # Metrics parsed once, the font file (subset in place on output) and glyph subset per document
+        assert first.fonts[key].cw is second.fonts[key].cw
+        assert first.fonts[key].ttfont is not second.fonts[key].ttfont
+        assert first.fonts[key].subset is not second.fonts[key].subset
+
+
+def test_renders_are_repeatable(renderer, tmp_path):
+    sizes = []
+    for index in range(3):
+        path = tmp_path / f"doc_{index}.pdf"
+        assert renderer.render(ARTICLE, str(path)) == 1
+        sizes.append(path.stat().st_size)
+    assert path.read_bytes().startswith(b"%PDF")
+    assert len(set(sizes)) == 1
+
+
+def test_render_pool_matches_in_process_rendering(renderer, tmp_path):
+    from pdf_render import render_pdf, start_render_pool, stop_render_pool
+    local_pages = renderer.render(ARTICLE, str(tmp_path / "local.pdf"))
+    start_render_pool(2)
+    try:
+        assert render_pdf(ARTICLE, str(tmp_path / "pooled.pdf")) == local_pages
+    finally:
+        stop_render_pool()
+    assert (tmp_path / "pooled.pdf").stat().st_size == (tmp_path / "local.pdf").stat().st_size
+
+
+def test_pdf_tool_reports_render_errors(tmp_path, monkeypatch):
+    import pdf_render
+    from artifacts import run_directory
+    from tools import ToolError, create_pdf, pdf_creation_tool
+
+    def broken(text, filepath):
+        raise RuntimeError("font file vanished")
+
+    monkeypatch.setattr(pdf_render, "render_pdf", broken)
+    with run_directory(str(tmp_path)):
+        with pytest.raises(ToolError, match="Error generating PDF: font file vanished"):
+            create_pdf("A newsletter nobody rendered", "report")
+        assert pdf_creation_tool.run(text_content="A newsletter nobody rendered") == "Error generating PDF: font file vanished"
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,110 @@
+import time
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, error_status, priority
+
+
+class ProviderError(Exception):
+    """An HTTP error as litellm raises it: status_code plus a response with headers."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after} if retry_after else {}})()
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_interactive_callers_go_ahead_of_batch_work():
+    limiter = RateLimiter("test")
+    limiter.cooldown_until = time.monotonic() + 0.3  # everyone queues until then
+    order = []
+
+    def caller(level, name):
+        with priority(level):
+            limiter.acquire()
+            order.append(name)
+
+    threads = []
+    for level, name in (("batch", "batch-1"), ("batch", "batch-2"), ("interactive", "interactive")):
+        threads.append(threading.Thread(target=caller, args=(level, name)))
+        threads[-1].start()
+        wait_for(lambda: len(limiter._waiters) == len(threads))
+    for thread in threads:
+        thread.join(5)
+    assert order == ["interactive", "batch-1", "batch-2"]
+    stats = limiter.stats()
+    assert stats["throttled"] == 3 and stats["throttled_s"]["batch"] > stats["throttled_s"]["interactive"] > 0
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError, match="Priority must be one of"):
+        with priority("urgent"):
+            pass
+
+
+def test_429_pauses_the_limiter_for_retry_after_and_halves_the_rate():
+    limiter = RateLimiter("test", requests_per_min=600, base_delay=0.01)
+    responses = [ProviderError(429, retry_after="0.2"), "ok"]
+
+    def provider():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    started = time.monotonic()
+    assert limiter.call(provider) == "ok"
+    assert time.monotonic() - started >= 0.2  # the retry waited out the Retry-After
+    stats = limiter.stats()
+    assert (stats["rate_limited"], stats["retries"], stats["failures"]) == (1, 1, 0)
+    assert stats["rate_factor"] == 0.6  # halved, then one step back up on success
+
+
+def test_backoff_is_exponential_with_full_jitter(monkeypatch):
+    monkeypatch.setattr(rate_limit.random, "uniform", lambda low, high: high)
+    limiter = RateLimiter("test", base_delay=1.0, max_delay=5.0)
+    assert [limiter.backoff(attempt) for attempt in range(4)] == [1.0, 2.0, 4.0, 5.0]
+    assert limiter.backoff(0, hint=30) == 5.0  # Retry-After is capped too
+
+
+def test_server_errors_are_retried_and_other_errors_are_not():
+    limiter = RateLimiter("test", retries=2, base_delay=0.001)
+    calls = []
+
+    def always(error):
+        def provider():
+            calls.append(error.status_code)
+            raise error
+        return provider
+
+    with pytest.raises(ProviderError):
+        limiter.call(always(ProviderError(503)))
+    assert calls == [503, 503, 503]
+    calls.clear()
+    with pytest.raises(ProviderError):
+        limiter.call(always(ProviderError(400)))
+    assert calls == [400]
+    stats = limiter.stats()
+    assert (stats["server_errors"], stats["retries"], stats["failures"]) == (2, 2, 1)
+    assert not limiter.is_throttled()
+
+
+def test_error_status():
+    assert error_status(ProviderError(503)) == 503
+    assert error_status(RuntimeError("RESOURCE_EXHAUSTED: quota")) == 429
+    assert error_status(RuntimeError("upstream returned 502 Bad Gateway")) == 502
+    assert error_status(ValueError("bad prompt")) is None
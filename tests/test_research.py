@@ -0,0 +1,83 @@
+import json
+import time
+import threading
+
+import pytest
+
+import research
+from research import expand_queries, gather, merge_results, normalize_url, parse_results, run_queries
+
+
+def test_expand_queries(monkeypatch):
+    monkeypatch.setattr(research, "get_ist_timestamp_str", lambda format_str: "2026")
+    assert expand_queries("  AI chips ", max_queries=3) == ["AI chips", "AI chips latest news", "AI chips 2026"]
+    assert expand_queries("AI chips", max_queries=0) == ["AI chips"]
+    assert len(expand_queries("AI chips", max_queries=50)) == len(research.QUERY_TEMPLATES)
+
+
+def test_run_queries_leaves_out_failures_and_stragglers():
+    release = threading.Event()
+
+    def search(query):
+        if query == "broken":
+            raise ConnectionError("reset by peer")
+        if query == "stuck":
+            release.wait(5)
+        return f"results for {query}"
+
+    started = time.monotonic()
+    try:
+        results, errors = run_queries(["ok", "broken", "stuck"], search, concurrency=3, timeout=0.2)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2  # the stuck search is abandoned, not waited for
+    assert results == {"ok": "results for ok"}
+    assert errors == {"broken": "ConnectionError: reset by peer", "stuck": "timed out after 0.2s"}
+
+
+def test_gather_fails_below_the_minimum_of_successful_queries():
+    def search(query):
+        if query != "AI chips":
+            raise TimeoutError("search timed out")
+        return json.dumps({"organic": [{"title": "Chips", "link": "https://a.com/chips", "snippet": "News"}]})
+
+    text, stats = gather("AI chips", search=search, max_queries=3, min_queries=1, notes=False)
+    assert "1. Chips (https://a.com/chips)" in text
+    assert (stats["queries"], stats["succeeded"], len(stats["failed"]), stats["merged"]) == (3, 1, 2, 1)
+    with pytest.raises(RuntimeError, match="Only 1 of 3 searches succeeded"):
+        gather("AI chips", search=search, max_queries=3, min_queries=2, notes=False)
+
+
+def test_normalize_url_ignores_scheme_www_slash_and_tracking():
+    assert normalize_url("https://www.Example.com/news/?utm_source=x&id=3") == "example.com/news?id=3"
+    assert normalize_url("http://example.com/news") == "example.com/news"
+
+
+def test_parse_results_reads_serper_json_and_text():
+    text = "Title: Chips\nLink: https://a.com\nSnippet: New chips\n---\nTitle: No link\nSnippet: dropped"
+    assert parse_results(text) == [{"title": "Chips", "link": "https://a.com", "snippet": "New chips"}]
+    assert parse_results({"organic": [{"title": "Chips", "link": "https://a.com"}, {"title": "x"}]}) == [
+        {"title": "Chips", "link": "https://a.com", "snippet": ""}]
+
+
+def test_merge_results_dedupes_urls_and_snippets():
+    results_by_query = {
+        "AI chips": [
+            {"title": "Nvidia ships new chips", "link": "https://www.a.com/nvidia/", "snippet": "Short"},
+            {"title": "Memory prices", "link": "https://b.com/memory", "snippet": "DRAM prices rose again this quarter"},
+        ],
+        "AI chips latest news": [
+            {"title": "Nvidia ships new chips", "link": "http://a.com/nvidia?utm_source=feed",
+             "snippet": "A longer snippet about the launch"},
+            # A syndicated copy of the memory story under another URL
+            {"title": "Memory prices", "link": "https://mirror.com/memory", "snippet": "DRAM prices rose again this quarter"},
+            {"title": "Startup funding", "link": "https://c.com/funding", "snippet": "Chip startups raised money"},
+        ],
+    }
+    merged, duplicates = merge_results(results_by_query, max_results=10)
+    assert [page["link"] for page in merged] == ["https://www.a.com/nvidia/", "https://b.com/memory", "https://c.com/funding"]
+    assert merged[0]["snippet"] == "A longer snippet about the launch"  # the longest snippet of the page wins
+    assert merged[0]["queries"] == ["AI chips", "AI chips latest news"]
+    assert duplicates == 2
+
+    assert len(merge_results(results_by_query, max_results=1)[0]) == 1
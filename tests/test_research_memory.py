@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import research_memory
+from research_memory import ResearchMemory, max_age_for, parse_freshness
+
+HOUR = 60 * 60
+
+
+class FakeClock:
+    """Replaces the time module in research_memory; advance() moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(research_memory, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def freshness(monkeypatch):
+    monkeypatch.setattr(research_memory, "RESEARCH_MEMORY_FRESHNESS", "markets=2,stocks=2,finance=6")
+    monkeypatch.setattr(research_memory, "RESEARCH_MEMORY_MAX_AGE_H", 24)
+
+
+def serper(*snippets):
+    return json.dumps({"organic": [
+        {"title": f"Story {i}", "link": f"https://news.example.com/{i}", "snippet": snippet}
+        for i, snippet in enumerate(snippets)
+    ]})
+
+
+def test_parse_freshness():
+    assert parse_freshness("markets=2, finance = 6,broken,=3") == {"markets": 2.0, "finance": 6.0}
+
+
+def test_the_shortest_matching_keyword_limit_wins(freshness):
+    assert max_age_for("AI chips") == 24 * HOUR
+    assert max_age_for("Personal finance tips") == 6 * HOUR
+    assert max_age_for("Finance news: stocks and markets") == 2 * HOUR
+    assert max_age_for("Supermarkets") == 24 * HOUR  # whole words only
+
+
+def test_lookup_only_returns_snippets_fresh_enough_for_the_topic(tmp_path, clock, freshness, monkeypatch):
+    monkeypatch.setattr(research_memory, "RESEARCH_MEMORY_MIN_RESULTS", 2)
+    memory = ResearchMemory(str(tmp_path / "memory.sqlite"))
+    memory.remember_results("chip stocks", "chip stocks", serper(
+        "Chip stocks rallied after strong earnings", "Investors bought chip stocks on AI demand"))
+
+    clock.advance(3 * HOUR)
+    assert memory.lookup("chip stocks", max_age=max_age_for("chip stocks")) == []  # stocks: 2 hours
+    recalled = memory.lookup("chip stocks", max_age=max_age_for("semiconductor chips"))  # default: 24 hours
+    assert [r["link"] for r in recalled] == ["https://news.example.com/0", "https://news.example.com/1"]
+    assert memory.stats()["hits"] == 1 and memory.stats()["misses"] == 1
+
+    # A page found again replaces its snippet and is fresh again
+    memory.remember_results("chip stocks", "chip stocks", serper("Chip stocks fell back on Friday"))
+    assert [r["snippet"] for r in memory.lookup("chip stocks", max_age=max_age_for("chip stocks"))] == [
+        "Chip stocks fell back on Friday"]
+
+
+def test_report_notes_and_retention(tmp_path, clock, freshness):
+    memory = ResearchMemory(str(tmp_path / "memory.sqlite"), retention=48 * HOUR)
+    report = "# Title\n\nNvidia shipped its new AI accelerators to every large cloud provider this week.\n\nShort line."
+    assert memory.remember_report("AI chips", report) == 1  # headings and short lines are skipped
+    assert [note["topic"] for note in memory.notes("AI accelerators", max_age=max_age_for("AI accelerators"))] == ["AI chips"]
+
+    clock.advance(30 * HOUR)
+    assert memory.notes("AI accelerators", max_age=max_age_for("AI accelerators")) == []
+    assert len(memory.notes("AI accelerators")) == 1
+    clock.advance(20 * HOUR)
+    assert memory.prune() == 1
+    assert memory.stats()["report_passages"] == 0
@@ -0,0 +1,75 @@
+import json
+import asyncio
+import threading
+
+import service
+from service import NewsletterService
+
+
+async def request(port, method, path, payload=None):
+    """Sends one HTTP request to the service; returns (status, headers, JSON body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, json.loads(data)
+
+
+def test_full_queue_answers_429_with_retry_after(monkeypatch):
+    release = threading.Event()
+
+    def slow_run_request(line_number, spec):
+        release.wait(10)
+        return {"status": "ok", "duration_s": 0.0, "final_output": f"newsletter on {spec['topic']}"}
+
+    monkeypatch.setattr(service, "run_request", slow_run_request)
+
+    async def scenario():
+        svc = NewsletterService(workers=1, queue_size=1)
+        server = await svc.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, _, running = await request(port, "POST", "/jobs", {"topic": "AI chips", "id": "first"})
+            assert status == 202
+            while svc.jobs["first"]["status"] != "running":
+                await asyncio.sleep(0.01)
+            status, _, queued = await request(port, "POST", "/jobs", {"topic": "Energy", "id": "second"})
+            assert (status, queued["status"], queued["queue_position"]) == (202, "queued", 1)
+
+            status, headers, rejected = await request(port, "POST", "/jobs", {"topic": "Markets"})
+            assert status == 429 and headers["Retry-After"] == "30"
+            assert "Queue is full" in rejected["error"]
+
+            release.set()
+            while svc.jobs["second"]["status"] != "succeeded":
+                await asyncio.sleep(0.01)
+            status, _, job = await request(port, "GET", "/jobs/second")
+            assert (status, job["final_output"]) == (200, "newsletter on Energy")
+            status, _, health = await request(port, "GET", "/health")
+            assert (health["queued"], health["busy_workers"]) == (0, 0)
+            assert svc.counts == {"accepted": 2, "rejected": 1, "succeeded": 2, "failed": 0}
+        finally:
+            release.set()
+            await svc.stop()
+
+    asyncio.run(scenario())
+
+
+def test_bad_requests(monkeypatch):
+    async def scenario():
+        svc = NewsletterService(workers=1, queue_size=1)
+        server = await svc.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            assert (await request(port, "POST", "/jobs", {"pdf": True}))[0] == 400
+            assert (await request(port, "GET", "/jobs/unknown"))[0] == 404
+            assert (await request(port, "DELETE", "/jobs"))[0] == 405
+        finally:
+            await svc.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,109 @@
+import smtplib
+import pytest
+import smtp_pool
+from mime_stream import StreamingMessage
+from smtp_pool import SMTPConnectionPool, get_smtp_pool, is_connection_error
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; refuses every recipient in `refused`."""
+
+    def __init__(self, host, port, timeout=None, refused=(), drop=False):
+        self.refused = refused
+        self.drop = drop
+        self.sent = []
+        self.rsets = 0
+        self.closed = False
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def rset(self):
+        self.rsets += 1
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        return (250, b"OK")
+
+    def rcpt(self, recipient):
+        return (550, b"5.1.1 User unknown") if recipient in self.refused else (250, b"OK")
+
+    def sendmail(self, sender, recipient, message):
+        if self.drop:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if recipient in self.refused:
+            raise smtplib.SMTPRecipientsRefused({recipient: (550, b"5.1.1 User unknown")})
+        self.sent.append(recipient)
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
+
+
+def make_pool(**fake_options):
+    servers = []
+
+    def factory(host, port, timeout=None):
+        servers.append(FakeSMTP(host, port, timeout, **fake_options))
+        return servers[-1]
+
+    return SMTPConnectionPool("smtp.test", 587, username="user", password="secret", smtp_factory=factory), servers
+
+
+def test_refused_recipients_keep_the_session_and_are_not_retried():
+    pool, servers = make_pool(refused=("nobody@example.com",))
+    for _ in range(3):
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.sendmail("me@example.com", "nobody@example.com", "Subject: hi\n\nhello")
+    pool.sendmail("me@example.com", "someone@example.com", "Subject: hi\n\nhello")
+
+    assert len(servers) == 1
+    assert servers[0].rsets == 3
+    assert not servers[0].closed
+    assert servers[0].sent == ["someone@example.com"]
+    assert pool.stats == {"connects": 1, "reuses": 3, "reconnects": 0, "sent": 1, "failed": 3}
+
+
+def test_dropped_session_is_replaced_and_the_send_retried():
+    pool, servers = make_pool(drop=True)
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        pool.sendmail("me@example.com", "someone@example.com", "Subject: hi\n\nhello", retries=1)
+
+    assert len(servers) == 2
+    assert all(server.closed for server in servers)
+    assert pool.stats["reconnects"] == 1 and pool.stats["failed"] == 1
+
+
+def test_connection_errors():
+    assert is_connection_error(smtplib.SMTPServerDisconnected())
+    assert is_connection_error(smtplib.SMTPConnectError(421, b"busy"))
+    assert is_connection_error(ConnectionResetError())
+    assert is_connection_error(TimeoutError())
+    assert not is_connection_error(smtplib.SMTPRecipientsRefused({}))
+    assert not is_connection_error(smtplib.SMTPDataError(554, b"rejected"))
+    assert not is_connection_error(smtplib.SMTPResponseException(451, b"try later"))
+
+
+def test_refused_streamed_message_is_reset_once():
+    pool, servers = make_pool(refused=("nobody@example.com",))
+    message = StreamingMessage("me@example.com", "hi", "hello")
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.sendmail("me@example.com", "nobody@example.com", message)
+    assert servers[0].rsets == 1
+    assert not servers[0].closed
+
+
+def test_pools_are_kept_apart_by_password(monkeypatch):
+    monkeypatch.setattr(smtp_pool, "_pools", {})
+    pool = get_smtp_pool("smtp.test", 587, username="user", password="old")
+    assert get_smtp_pool("smtp.test", 587, username="user", password="old") is pool
+    assert get_smtp_pool("smtp.test", 587, username="user", password="new") is not pool
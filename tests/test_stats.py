@@ -0,0 +1,16 @@
+import os
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("SERPER_API_KEY", "test")
+
+pytest.importorskip("crewai")
+
+
+def test_collect_stats_covers_every_source(capsys):
+    from stats import STATS_SOURCES, collect_stats, print_stats
+    stats = collect_stats()
+    assert list(stats) == [key for key, _, _, _ in STATS_SOURCES]
+    assert all(isinstance(value, dict) for value in stats.values())
+    print_stats(stats)
+    assert capsys.readouterr().out.splitlines()[0].startswith("Search cache: {")
@@ -0,0 +1,70 @@
+from streaming import ArticleStream, split_sections
+
+ARTICLE = "# AI Chips Weekly\n\nNvidia shipped new chips.\n\nMemory prices rose.\n\nThat's all for this week."
+
+
+def stream(article_stream, text, chunk_size=7):
+    for start in range(0, len(text), chunk_size):
+        article_stream.feed(text[start:start + chunk_size])
+
+
+def test_sections_are_cut_once_the_next_one_starts():
+    article_stream = ArticleStream()
+    stream(article_stream, "Thought: I know the answer.\n\nFinal Answer: " + ARTICLE[:-8])
+    # The last section may still grow, so only the first three are handed on
+    assert article_stream._emitted == split_sections(ARTICLE)[:3]
+
+    stream(article_stream, ARTICLE[-8:])
+    article_stream.close(ARTICLE)
+    assert article_stream._emitted == split_sections(ARTICLE)
+    assert article_stream.stats["sections"] == 4
+    assert article_stream.stats["streamed"] == 3 and not article_stream.stats["restarted"]
+
+
+def test_final_text_that_differs_starts_over():
+    article_stream = ArticleStream()
+    stream(article_stream, "Final Answer: " + ARTICLE)
+    edited = ARTICLE.replace("Nvidia shipped", "AMD shipped")
+    article_stream.close(edited)
+    assert article_stream.stats["restarted"] and article_stream.stats["streamed"] == 0
+    assert article_stream._emitted == split_sections(edited)
+
+
+def test_retried_call_only_continues_after_the_matching_sections():
+    article_stream = ArticleStream()
+    stream(article_stream, "Final Answer: # AI Chips Weekly\n\nNvidia shipped new chips.\n\nMem")
+    article_stream.begin()  # the LLM call is retried and streams the same start again
+    stream(article_stream, "Final Answer: " + ARTICLE)
+    article_stream.close(ARTICLE)
+    assert article_stream.stats["streamed"] == 3 and not article_stream.stats["restarted"]
+
+    diverged = ArticleStream()
+    stream(diverged, "Final Answer: # AI Chips Weekly\n\nNvidia shipped new chips.\n\nMem")
+    diverged.begin()
+    stream(diverged, "Final Answer: # AI Chips Today\n\nOther text.\n\n")
+    diverged.close(ARTICLE)
+    assert diverged.stats["restarted"] and diverged._emitted == split_sections(ARTICLE)
+
+
+def test_stream_without_final_answer_is_laid_out_at_close():
+    article_stream = ArticleStream()
+    stream(article_stream, "Thought: still thinking\n\nabout it\n\n")
+    assert article_stream._emitted == []
+    article_stream.close(ARTICLE)
+    assert article_stream.stats["streamed"] == 0 and not article_stream.stats["restarted"]
+    assert article_stream._emitted == split_sections(ARTICLE)
+
+
+def test_streamed_pdf_is_used_by_the_pdf_task(tmp_path):
+    from pdf_render import has_prerendered, render_pdf
+    article_stream = ArticleStream(pdf=True)
+    stream(article_stream, "Final Answer: " + ARTICLE)
+    article_stream.close(ARTICLE)
+    assert has_prerendered(ARTICLE)
+    streamed_data, streamed_pages = article_stream._pdf_future.result(timeout=30)
+
+    path = tmp_path / "newsletter.pdf"
+    assert render_pdf(ARTICLE, str(path)) == streamed_pages
+    assert path.read_bytes() == streamed_data
+    assert not has_prerendered(ARTICLE)
+    article_stream.discard()
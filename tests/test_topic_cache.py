@@ -0,0 +1,32 @@
+import os
+import sys
+import subprocess
+
+import topic_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_topic_cache_is_opt_in():
+    env = {k: v for k, v in os.environ.items() if k != "TOPIC_CACHE"}
+    code = "import topic_cache; print(topic_cache.TOPIC_CACHE_ENABLED, topic_cache.get_topic_cache())"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "None"]
+
+
+def test_forced_cache_when_disabled(monkeypatch):
+    monkeypatch.setattr(topic_cache, "TOPIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(topic_cache, "_cache", None)
+    assert topic_cache.get_topic_cache() is None
+    # run_newsletter(topic_cache=True) asks for the cache even with TOPIC_CACHE=off
+    cache = topic_cache.get_topic_cache(force=True)
+    assert isinstance(cache, topic_cache.TopicCache)
+    assert topic_cache.get_topic_cache(force=True) is cache
+
+
+def test_near_duplicate_topics_match():
+    cache = topic_cache.get_topic_cache(force=True)
+    cache.remember("run-1", "latest AI chips news", {"research": "r", "write": "w"}, "parallel", True)
+    match = cache.lookup("AI chip news today", "parallel", True)
+    assert match is not None and match["action"] == "reuse" and match["run_id"] == "run-1"
+    assert cache.lookup("AI chip news today", "agent", True) is None
@@ -0,0 +1,73 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from tracing import current_span, run_in_context, span, start_trace, traced
+
+
+def record_part(name):
+    with span(name, kind="step"):
+        pass
+
+
+@traced("tool")
+def render_chunk(index):
+    current_span().add("bytes_written", 10)
+    with ThreadPoolExecutor(max_workers=2) as inner:
+        # A pool started from a pool thread: its spans still nest under this one
+        list(inner.map(run_in_context(record_part), [f"part_{index}_{part}" for part in range(2)]))
+    return index
+
+
+def spans_by_name(trace):
+    return {s["name"]: s for s in trace.to_dict()["spans"]}
+
+
+def test_spans_nest_across_thread_pools(tmp_path):
+    with start_trace("nesting", output_dir=str(tmp_path), enabled=True) as trace:
+        with span("audio", kind="task") as task_span:
+            with ThreadPoolExecutor(max_workers=3, thread_name_prefix="tts") as pool:
+                assert list(pool.map(run_in_context(render_chunk), range(3))) == [0, 1, 2]
+
+    spans = trace.to_dict()["spans"]
+    assert len(spans) == 1 + 3 + 6
+    chunk_ids = {s["id"] for s in spans if s["name"] == "render_chunk"}
+    assert all(s["parent"] == task_span.id for s in spans if s["name"] == "render_chunk")
+    assert all(s["parent"] in chunk_ids for s in spans if s["name"].startswith("part_"))
+    assert {s["thread"] for s in spans if s["name"] == "render_chunk"} <= {f"tts_{i}" for i in range(3)}
+    chunk_row = next(row for row in trace.summary() if row["name"] == "render_chunk")
+    assert (chunk_row["count"], chunk_row["bytes_written"]) == (3, 30)
+    assert json.loads((tmp_path / "trace_nesting.json").read_text())["trace"] == "nesting"
+
+
+def test_pool_threads_without_the_context_are_not_traced(tmp_path):
+    with start_trace("plain", output_dir=str(tmp_path), enabled=True) as trace:
+        with span("audio", kind="task"):
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                assert pool.submit(lambda: span("lost")).result() is tracing.NULL_SPAN
+    assert [s["name"] for s in trace.to_dict()["spans"]] == ["audio"]
+
+
+def test_concurrent_runs_keep_separate_traces(tmp_path):
+    traces = {}
+
+    def run(name):
+        with start_trace(name, output_dir=str(tmp_path), enabled=True) as trace:
+            with span(f"write_{name}", kind="task"):
+                render_chunk(0)
+        traces[name] = trace
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(spans_by_name(traces["a"])) == {"write_a", "render_chunk", "part_0_0", "part_0_1"}
+    assert set(spans_by_name(traces["b"])) == {"write_b", "render_chunk", "part_0_0", "part_0_1"}
+
+
+def test_no_trace_means_no_op_spans():
+    with span("anything") as nothing:
+        nothing.add("retries")
+    assert nothing is tracing.NULL_SPAN and current_span() is tracing.NULL_SPAN
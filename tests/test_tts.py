@@ -0,0 +1,71 @@
+import os
+import pytest
+
+import tts
+from tts import NullTTSBackend, split_text, synthesize_to_file
+
+
+class FlakyBackend(NullTTSBackend):
+    """Silent MP3 frames, but the first `failures` calls for each text in `flaky` raise."""
+    name = "flaky-test"
+
+    def __init__(self, flaky=(), failures=1):
+        self.failures = {text: failures for text in flaky}
+        self.calls = []
+
+    def synthesize(self, text, lang="en"):
+        self.calls.append(text)
+        if self.failures.get(text, 0) > 0:
+            self.failures[text] -= 1
+            raise ConnectionError("TTS service unavailable")
+        return super().synthesize(text, lang)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(tts.time, "sleep", lambda seconds: None)
+
+
+def test_split_prefers_paragraphs_then_sentences_then_words():
+    assert split_text("First paragraph.\n\n  Second\nparagraph.  \n\n\n") == ["First paragraph.", "Second paragraph."]
+    assert split_text("One two. Three four. Five six.", max_chars=20) == ["One two. Three four.", "Five six."]
+    long_sentence = "word " * 30
+    chunks = split_text(long_sentence, max_chars=22)
+    assert all(len(chunk) <= 22 for chunk in chunks)
+    assert " ".join(chunks) == long_sentence.strip()
+    assert split_text("a" * 25, max_chars=10) == ["a" * 10, "a" * 10, "a" * 5]
+
+
+def test_failing_chunk_is_retried_on_its_own(tmp_path):
+    text = "Chips paragraph one.\n\nChips paragraph two.\n\nChips paragraph three."
+    backend = FlakyBackend(flaky=["Chips paragraph two."], failures=2)
+    stats = synthesize_to_file(text, str(tmp_path / "audio.mp3"), backend=backend)
+    assert stats["chunks"] == 3 and stats["synthesized"] == 3
+    assert backend.calls.count("Chips paragraph two.") == 3
+    assert backend.calls.count("Chips paragraph one.") == 1
+
+
+def test_chunks_come_from_the_cache_the_second_time(tmp_path):
+    backend = FlakyBackend()
+    first = synthesize_to_file("Cached one.\n\nCached two.", str(tmp_path / "a.mp3"), backend=backend)
+    edited = synthesize_to_file("Cached one.\n\nEdited two.", str(tmp_path / "b.mp3"), backend=backend)
+    assert (first["cached"], first["synthesized"]) == (0, 2)
+    assert (edited["cached"], edited["synthesized"]) == (1, 1)
+    assert backend.calls.count("Cached one.") == 1
+
+
+def test_failed_synthesis_leaves_no_files(tmp_path):
+    backend = FlakyBackend(flaky=["Never works."], failures=tts.TTS_RETRIES + 1)
+    with pytest.raises(ConnectionError):
+        synthesize_to_file("Never works.", str(tmp_path / "audio.mp3"), backend=backend)
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_write_removes_the_temporary_file(tmp_path, monkeypatch):
+    def disk_full(data):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tts, "_strip_id3", disk_full)
+    with pytest.raises(OSError):
+        synthesize_to_file("Written one.\n\nWritten two.", str(tmp_path / "audio.mp3"), backend=FlakyBackend())
+    assert os.listdir(tmp_path) == []
@@ -1,160 +1,325 @@
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
 from dotenv import load_dotenv
-# Import the decorator and SerperDevTool
-from crewai.tools import tool
-from crewai_tools import  SerperDevTool
-from fpdf import FPDF
-from gtts import gTTS
 import shutil
-from datetime import datetime
-import pytz
+import re
+from common import env_flag, get_ist_timestamp_str
+import threading
+import sqlite3
+from cache_store import CACHE_DIR, DiskCache, make_key
+from smtp_pool import get_smtp_pool, send_bulk
+from mime_stream import StreamingMessage
+from tts import synthesize_to_file, get_tts_backend, TTS_CHUNK_CHARS
+from tracing import traced, current_span
+from rate_limit import get_limiter
+from artifacts import current_output_dir, current_run_info, atomic_path, is_within_outputs, OUTPUT_ROOT
+from artifact_store import ArtifactStore, get_artifact_store
+from research_memory import MEMORY_SOURCE, RESEARCH_MEMORY_MIN_RESULTS, get_research_memory, is_memory_result, max_age_for
 
 # Load environment variables (.env file)
 load_dotenv()
 
-# --- Timezone Helper ---
-def get_ist_timestamp_str(format_str="%Y%m%d_%H%M"):
-    """Gets the current timestamp in IST as a formatted string."""
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    return now_ist.strftime(format_str)
-
 # --- Tool Definitions using @tool decorator ---
 
-# 1. Search Tool (Pre-built)
+# 1. Search Tool (Pre-built, with a persistent cache in front)
 # Make sure SERPER_API_KEY is in your .env file
-search_tool = SerperDevTool()
+# Results are cached on disk so repeated queries (within a run, across runs
+# and across concurrent batch workers) skip the Serper round trip and quota.
+SEARCH_CACHE_ENABLED = env_flag("SEARCH_CACHE")
+search_cache = DiskCache(
+    os.path.join(CACHE_DIR, "search.sqlite"),
+    namespace="serper",
+    ttl=int(os.getenv("SEARCH_CACHE_TTL", 6 * 60 * 60)), # Search results go stale, default 6 hours
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 5000)),
+)
+
+# Serper settings that change the results and therefore belong in the cache key
+_SEARCH_PARAM_FIELDS = ("search_type", "n_results", "country", "location", "locale", "base_url")
+
+def normalize_search_query(query: str) -> str:
+    """Lower-cases, strips punctuation and collapses whitespace so queries differing only in those share a cache entry."""
+    words = re.findall(r"[\w$%.+#-]+", str(query).lower())
+    # Word order and repeats change Serper's results, so both are kept
+    return " ".join(word for word in (word.strip(".-") for word in words) if word)
+
+def _search_or_recall(run, query, **kwargs):
+    """Answers from the research memory when it holds enough fresh results, otherwise calls Serper and remembers its answer."""
+    memory = get_research_memory()
+    if memory is None or not query:
+        return get_limiter("search").call(run, **kwargs) # shared Serper rate limit, retries 429s
+    # Freshness follows the run's topic (e.g. markets go stale faster than AI research)
+    topic = current_run_info().get("topic") or query
+    try:
+        recalled = memory.lookup(query, max_age=max_age_for(topic))
+    except sqlite3.Error as e:
+        print(f"[{get_ist_timestamp_str()}] Research memory lookup failed: {e}")
+        recalled = []
+    if len(recalled) >= RESEARCH_MEMORY_MIN_RESULTS:
+        print(f"[{get_ist_timestamp_str()}] Research memory hit: '{query}' ({len(recalled)} results)")
+        current_span().set(memory="hit", results=len(recalled))
+        return {"source": MEMORY_SOURCE, "searchParameters": {"q": query}, "organic": recalled}
+    current_span().set(memory="miss")
+    result = get_limiter("search").call(run, **kwargs)
+    try:
+        memory.remember_results(query, topic, result)
+    except sqlite3.Error as e:
+        print(f"[{get_ist_timestamp_str()}] Search results not remembered: {e}")
+    return result
+
+@traced("tool", name="search")
+def cached_search_run(tool_instance, run, **kwargs):
+    """Serves a Serper query from the on-disk search cache or the research memory, calling `run(**kwargs)` otherwise."""
+    query = kwargs.get("search_query") or kwargs.get("query") or ""
+    current_span().set(query=query)
+    if not SEARCH_CACHE_ENABLED:
+        return _search_or_recall(run, query, **kwargs)
+    params = {field: getattr(tool_instance, field, None) for field in _SEARCH_PARAM_FIELDS}
+    extra_args = {k: v for k, v in kwargs.items() if k not in ("search_query", "query")}
+    key = make_key(normalize_search_query(query), params, extra_args)
+
+    cached = search_cache.get(key)
+    if cached is not None:
+        print(f"[{get_ist_timestamp_str()}] Search cache hit: '{query}'")
+        current_span().set(cache="hit")
+        return cached["result"]
+
+    current_span().set(cache="miss")
+    result = _search_or_recall(run, query, **kwargs)
+    if is_memory_result(result):
+        return result # the search cache only holds Serper answers
+    try:
+        search_cache.set(key, {"query": query, "result": result})
+    except (TypeError, ValueError) as e:
+        print(f"[{get_ist_timestamp_str()}] Search result not cacheable: {e}")
+    return result
+
+# crewai_tools is slow to import, so the Serper tool class and instance are created on first use
+_search_tool = None
+_search_tool_lock = threading.Lock()
+
+def get_search_tool():
+    """The shared CachedSerperDevTool, created on first use."""
+    global _search_tool
+    with _search_tool_lock:
+        if _search_tool is None:
+            from crewai_tools import SerperDevTool
+
+            class CachedSerperDevTool(SerperDevTool):
+                """SerperDevTool that serves repeated queries from the on-disk search cache."""
+
+                def _run(self, **kwargs):
+                    return cached_search_run(self, super()._run, **kwargs)
+
+            # SERPER_BASE_URL points the tool at another endpoint, e.g. the offline stub in benchmarks/stubs.py
+            base_url = os.getenv("SERPER_BASE_URL")
+            _search_tool = CachedSerperDevTool(**({"base_url": base_url} if base_url else {}))
+    return _search_tool
+
+def search_cache_stats() -> dict:
+    """Hit/miss counters of the search cache for this process."""
+    return search_cache.stats()
+
+# --- Tool steps ---
+# Each file/email tool is a plain function that raises ToolError when its step
+# fails, wrapped by a crewai tool that reports the failure to the agent as an
+# 'Error ...' string. Direct tasks (see tasks.py) call the plain functions, so a
+# failure fails the task without parsing the tool's message. The crewai tools are
+# built on first access (see get_tool), so importing this module skips crewai.
+
+class ToolError(RuntimeError):
+    """A tool step failed."""
+
+
+class EmailDeliveryError(ToolError):
+    """Some or all recipients did not get the email; `sent` and `failed` ({recipient: status}) say which."""
+
+    def __init__(self, message, sent=(), failed=None):
+        super().__init__(message)
+        self.sent = list(sent)
+        self.failed = dict(failed or {})
+
 
 # 2. PDF Creation Tool
-@tool("PDF Creation Tool")
-def pdf_creation_tool(text_content: str, base_filename: str = "report") -> str:
+# Headings and lists in the Writer's markdown are kept, with a Unicode font when available (see pdf_render.py)
+@traced(name="pdf_creation_tool")
+def create_pdf(text_content: str, base_filename: str = "report") -> str:
+    """Renders `text_content` to <base_filename>.pdf in the run's output directory and returns its path."""
+    safe_base_filename = os.path.basename(base_filename.replace(" ", "_"))
+    filename = f"{safe_base_filename}.pdf"
+
+    # outputs/<run_id>/ during a run, so concurrent runs never share a file
+    filepath = os.path.join(current_output_dir(), filename)
+
+    try:
+        from pdf_render import get_pdf_renderer, render_pdf
+        # The same text with the same fonts and layout always gives the same PDF, so reuse a stored one
+        store = get_artifact_store()
+        key = ArtifactStore.key("pdf", text_content, get_pdf_renderer().settings())
+        stored = store.materialize(key, filepath) if store else None
+        if stored is not None:
+            pages = stored.get("pages")
+            current_span().set(pages=pages, artifact_store="hit")
+            print(f"[{get_ist_timestamp_str()}] PDF reused from artifact store: {filepath} ({pages} pages)")
+            return filepath
+        # On the render processes in batch and service runs (see pdf_render.start_render_pool)
+        with atomic_path(filepath) as tmp_path:
+            pages = render_pdf(text_content, tmp_path)
+        if store:
+            store.put(key, "pdf", filepath, {"pages": pages})
+        current_span().set(pages=pages, artifact_store="miss" if store else "off")
+        current_span().add("bytes_written", os.path.getsize(filepath))
+        print(f"[{get_ist_timestamp_str()}] PDF generated: {filepath} ({pages} pages)")
+        return filepath
+    except Exception as e:
+        print(f"[{get_ist_timestamp_str()}] Error generating PDF: {e}")
+        raise ToolError(f"Error generating PDF: {e}") from e
+
+def _pdf_creation_tool(text_content: str, base_filename: str = "report") -> str:
     """
-    Creates a PDF document from text content, saving it with an IST timestamp.
+    Creates a PDF document from text content, saving it in the run's output directory.
     Input args:
         text_content (str): The text content for the PDF.
         base_filename (str): The base name for the file (e.g., 'report'). Default is 'report'.
-    The '.pdf' extension and timestamp are added automatically.
-    Returns the full path to the created PDF file.
+    The '.pdf' extension is added automatically. Each run has its own output directory,
+    so the name needs no timestamp.
+    Returns the full path to the created PDF file or an error message.
     """
-    timestamp = get_ist_timestamp_str()
-    safe_base_filename = base_filename.replace(" ", "_")
-    filename = f"{safe_base_filename}.pdf"
+    try:
+        return create_pdf(text_content, base_filename)
+    except ToolError as e:
+        return str(e)
+
+# 3. Text-to-Speech Tool
+# Long articles are split into chunks that are synthesized in parallel and cached (see tts.py)
+@traced(name="text_to_speech_tool")
+def create_audio(text_content: str, base_filename: str = "audio_summary") -> str:
+    """Synthesizes `text_content` to <base_filename>.mp3 in the run's output directory and returns its path."""
+    safe_base_filename = os.path.basename(base_filename.replace(" ", "_"))
+    filename = f"{safe_base_filename}.mp3"
 
-    output_dir = "outputs"
-    os.makedirs(output_dir, exist_ok=True)
-    filepath = os.path.join(output_dir, filename)
+    filepath = os.path.join(current_output_dir(), filename)
 
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
     try:
-        # Use multi_cell for better handling of long text and newlines
-        pdf.multi_cell(0, 5, text_content.encode('latin-1', 'replace').decode('latin-1'))
+        backend = get_tts_backend()
+        store = get_artifact_store()
+        key = ArtifactStore.key("mp3", text_content, {"backend": backend.name, "lang": "en", "chunk_chars": TTS_CHUNK_CHARS})
+        if store and store.materialize(key, filepath) is not None:
+            current_span().set(artifact_store="hit")
+            print(f"[{get_ist_timestamp_str()}] Audio file reused from artifact store: {filepath}")
+            return filepath
+        # synthesize_to_file writes a temporary file and renames it into place
+        stats = synthesize_to_file(text_content, filepath, backend=backend, lang='en')
+        if store:
+            store.put(key, "mp3", filepath, {"chunks": stats["chunks"]})
+        current_span().set(chunks=stats["chunks"], cached_chunks=stats["cached"], artifact_store="miss" if store else "off")
+        current_span().add("bytes_written", os.path.getsize(filepath))
+        print(f"[{get_ist_timestamp_str()}] Audio file generated: {filepath} "
+              f"({stats['chunks']} chunks, {stats['cached']} from cache, backend '{stats['backend']}')")
+        return filepath
     except Exception as e:
-         print(f"[{get_ist_timestamp_str()}] Error encoding text for PDF: {e}")
-         pdf.multi_cell(0, 5, "Error encoding content.")
-
-    pdf.output(filepath)
-    print(f"[{get_ist_timestamp_str()}] PDF generated: {filepath}")
-    return filepath
+        print(f"[{get_ist_timestamp_str()}] Error generating audio file: {e}")
+        raise ToolError(f"Error generating audio: {e}") from e
 
-# 3. Text-to-Speech Tool
-@tool("Text-to-Speech Tool")
-def text_to_speech_tool(text_content: str, base_filename: str = "audio_summary") -> str:
+def _text_to_speech_tool(text_content: str, base_filename: str = "audio_summary") -> str:
     """
-    Converts text content into an MP3 audio file, saving it with an IST timestamp.
+    Converts text content into an MP3 audio file, saving it in the run's output directory.
     Input args:
         text_content (str): The text to convert to speech.
         base_filename (str): The base name for the file (e.g., 'summary'). Default is 'audio_summary'.
-    The '.mp3' extension and timestamp are added automatically.
+    The '.mp3' extension is added automatically. Each run has its own output directory,
+    so the name needs no timestamp.
     Returns the full path to the created MP3 file or an error message.
     """
-    timestamp = get_ist_timestamp_str()
-    safe_base_filename = base_filename.replace(" ", "_")
-    filename = f"{safe_base_filename}.mp3"
-
-    output_dir = "outputs"
-    os.makedirs(output_dir, exist_ok=True)
-    filepath = os.path.join(output_dir, filename)
-
     try:
-        tts = gTTS(text=text_content, lang='en')
-        tts.save(filepath)
-        print(f"[{get_ist_timestamp_str()}] Audio file generated: {filepath}")
-        return filepath
-    except Exception as e:
-        print(f"[{get_ist_timestamp_str()}] Error generating audio file: {e}")
-        return f"Error generating audio: {e}"
+        return create_audio(text_content, base_filename)
+    except ToolError as e:
+        return str(e)
 
 # 4. Email Sending Tool
-@tool("Email Sending Tool")
-def email_sending_tool(recipient: str, subject: str, body: str, attachment_paths: list = None) -> str:
+# SMTP sessions are pooled per process and reused across sends and runs.
+# EMAIL_USE_TLS=false and an empty EMAIL_PASSWORD allow a plain local SMTP server (e.g. aiosmtpd).
+@traced(name="email_sending_tool")
+def send_email(recipient: str, subject: str, body: str, attachment_paths: list = None) -> str:
     """
-    Sends an email with optional attachments.
-    Input args:
-        recipient (str): The email address of the recipient.
-        subject (str): The subject line of the email.
-        body (str): The plain text body of the email.
-        attachment_paths (list, optional): A list of full file paths for attachments. Defaults to None.
-    Returns a confirmation message or an error string.
+    Sends the email to every recipient in the comma-separated `recipient` and returns a confirmation.
+    Raises EmailDeliveryError unless every recipient got it.
     """
     timestamp = get_ist_timestamp_str()
     sender_email = os.getenv("SENDER_EMAIL")
     email_password = os.getenv("EMAIL_PASSWORD")
     smtp_host = os.getenv("EMAIL_HOST")
     smtp_port = int(os.getenv("EMAIL_PORT", 587))
+    use_tls = env_flag("EMAIL_USE_TLS")
+
+    if not all([sender_email, smtp_host]) or (use_tls and not email_password):
+        raise EmailDeliveryError(f"[{timestamp}] Error: Email credentials not found in .env")
+
+    recipients = [r.strip() for r in str(recipient).split(",") if r.strip()]
+    if not recipients:
+        raise EmailDeliveryError(f"[{timestamp}] Error: No recipient given")
 
-    if not all([sender_email, email_password, smtp_host]):
-        return f"[{timestamp}] Error: Email credentials not found in .env"
-
-    message = MIMEMultipart()
-    message['From'] = sender_email
-    message['To'] = recipient
-    message['Subject'] = subject
-    message.attach(MIMEText(body, 'plain'))
-
-    if attachment_paths:
-        for file_path in attachment_paths:
-            if os.path.exists(file_path):
-                part = MIMEBase('application', 'octet-stream')
-                with open(file_path, 'rb') as file:
-                    part.set_payload(file.read())
-                encoders.encode_base64(part)
-                part.add_header(
-                    'Content-Disposition',
-                    f'attachment; filename={os.path.basename(file_path)}',
-                )
-                message.attach(part)
-            else:
-                print(f"[{timestamp}] Warning: Attachment not found at {file_path}")
+    existing_attachments = []
+    for file_path in attachment_paths or []:
+        if os.path.exists(file_path):
+            existing_attachments.append(file_path)
+        else:
+            print(f"[{timestamp}] Warning: Attachment not found at {file_path}")
 
     try:
-        server = smtplib.SMTP(smtp_host, smtp_port)
-        server.starttls()
-        server.login(sender_email, email_password)
-        text = message.as_string()
-        server.sendmail(sender_email, recipient, text)
-        server.quit()
-        return f"[{timestamp}] Email sent successfully to {recipient}"
+        # Attachments are base64-encoded once per file content and streamed to
+        # each recipient in chunks; only the To header differs per recipient.
+        message = StreamingMessage(sender_email, subject, body, existing_attachments)
+        pool = get_smtp_pool(
+            smtp_host,
+            smtp_port,
+            username=sender_email,
+            password=email_password,
+            use_tls=use_tls,
+            size=int(os.getenv("EMAIL_POOL_SIZE", 4)),
+        )
+        statuses = send_bulk(
+            pool,
+            sender_email,
+            recipients,
+            lambda to: message,
+            max_workers=int(os.getenv("EMAIL_SEND_CONCURRENCY", 4)),
+        )
     except Exception as e:
-        return f"[{timestamp}] Error sending email: {e}"
+        raise EmailDeliveryError(f"[{timestamp}] Error sending email: {e}") from e
 
-# 5. Local File Saving Tool (Simple Confirmation)
-@tool("Local File Save Tool")
-def local_save_tool(file_path: str) -> str:
+    sent = [r for r, status in statuses.items() if status == "sent"]
+    failed = {r: status for r, status in statuses.items() if status != "sent"}
+    current_span().set(recipients=len(recipients), sent=len(sent))
+    if not failed:
+        return f"[{timestamp}] Email sent successfully to {', '.join(sent)}"
+    details = "; ".join(f"{r}: {status}" for r, status in failed.items())
+    if not sent:
+        raise EmailDeliveryError(f"[{timestamp}] Error sending email: {details}", failed=failed)
+    raise EmailDeliveryError(f"[{timestamp}] Email sent successfully to {', '.join(sent)}. Failed for {details}",
+                             sent=sent, failed=failed)
+
+def _email_sending_tool(recipient: str, subject: str, body: str, attachment_paths: list = None) -> str:
     """
-    Confirms a file path exists locally in the 'outputs' directory.
+    Sends an email with optional attachments.
     Input args:
-        file_path (str): The full file path to check.
-    Returns the confirmed path or a warning message.
+        recipient (str): The email address of the recipient. Several addresses may be given separated by commas; each gets its own copy.
+        subject (str): The subject line of the email.
+        body (str): The plain text body of the email.
+        attachment_paths (list, optional): A list of full file paths for attachments. Defaults to None.
+    Returns a confirmation message or an error string.
     """
+    try:
+        return send_email(recipient, subject, body, attachment_paths)
+    except ToolError as e:
+        return str(e)
+
+# 5. Local File Saving Tool (Simple Confirmation)
+@traced(name="local_save_tool")
+def confirm_local_file(file_path: str) -> str:
+    """Returns `file_path` if it lies inside the outputs directory, raising ToolError otherwise."""
     timestamp = get_ist_timestamp_str()
-    if os.path.exists(file_path) and "outputs" in file_path:
+    if not is_within_outputs(file_path):
+         raise ToolError(f"[{timestamp}] Error: {file_path} is outside the '{OUTPUT_ROOT}' directory")
+    if os.path.exists(file_path):
          print(f"[{timestamp}] Confirmed: File exists locally at {file_path}")
          return file_path
     else:
@@ -163,13 +328,45 @@ def local_save_tool(file_path: str) -> str:
          print(f"[{timestamp}] Note: Path provided for local save: {file_path}")
          return file_path
 
+def _local_save_tool(file_path: str) -> str:
+    """
+    Confirms a file path exists locally in the 'outputs' directory.
+    Input args:
+        file_path (str): The full file path to check.
+    Returns the confirmed path or a warning message.
+    """
+    try:
+        return confirm_local_file(file_path)
+    except ToolError as e:
+        return str(e)
+
 
 # --- Tool List for easy import ---
-# List the decorated functions directly
-newsletter_tools = [
-    search_tool,
-    pdf_creation_tool,
-    text_to_speech_tool,
-    email_sending_tool,
-    local_save_tool
-]
+# Tool name -> (crewai tool name, function the tool wraps)
+_TOOL_FUNCTIONS = {
+    "pdf_creation_tool": ("PDF Creation Tool", _pdf_creation_tool),
+    "text_to_speech_tool": ("Text-to-Speech Tool", _text_to_speech_tool),
+    "email_sending_tool": ("Email Sending Tool", _email_sending_tool),
+    "local_save_tool": ("Local File Save Tool", _local_save_tool),
+}
+_tools = {}
+_tools_lock = threading.Lock()
+
+def get_tool(name):
+    """The shared crewai tool `name` (e.g. 'pdf_creation_tool'), created on first use."""
+    with _tools_lock:
+        if name not in _tools:
+            from crewai.tools import tool
+            tool_name, func = _TOOL_FUNCTIONS[name]
+            _tools[name] = tool(tool_name)(func)
+        return _tools[name]
+
+# `search_tool`, the other tools and `newsletter_tools` are resolved on first access (see get_search_tool, get_tool)
+def __getattr__(name):
+    if name == "search_tool":
+        return get_search_tool()
+    if name in _TOOL_FUNCTIONS:
+        return get_tool(name)
+    if name == "newsletter_tools":
+        return [get_search_tool()] + [get_tool(tool_name) for tool_name in _TOOL_FUNCTIONS]
+    raise AttributeError(f"module 'tools' has no attribute '{name}'")
@@ -0,0 +1,246 @@
+import os
+import re
+import sys
+import json
+import time
+import struct
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+from common import env_flag, thread_connection
+from cache_store import CACHE_DIR
+
+# --- Near-duplicate topic cache ---
+# "latest AI news", "ai news latest" and "AI news today" ask for the same newsletter.
+# Every finished run's research and article are kept in .cache/topics.sqlite with a
+# MinHash signature of its topic: the topic's words (lower-cased, plural 's' and
+# filler words like 'latest' or 'today' dropped) and their character 3-grams,
+# hashed TOPIC_CACHE_PERMUTATIONS ways. Two topics whose estimated Jaccard
+# similarity reaches TOPIC_CACHE_THRESHOLD are near-duplicates. A new run whose
+# topic matches a newsletter written less than TOPIC_CACHE_WINDOW_S ago reuses its
+# research and article and only runs its own delivery tasks (the PDF and MP3 then
+# come from the artifact store). Up to the topic's research freshness limit
+# (research_memory.max_age_for) a match is lightly refreshed instead: the research
+# is reused and the article is written again. Only runs with the same research
+# mode and compaction setting are matched, as their task graphs are the same.
+# A reused article was written for another wording of the topic, so the cache
+# only answers with TOPIC_CACHE=on (or run_newsletter(topic_cache=True)).
+
+TOPIC_CACHE_ENABLED = env_flag("TOPIC_CACHE", "off")
+TOPIC_CACHE_PATH = os.getenv("TOPIC_CACHE_PATH", os.path.join(CACHE_DIR, "topics.sqlite"))
+TOPIC_CACHE_THRESHOLD = float(os.getenv("TOPIC_CACHE_THRESHOLD", 0.8))
+TOPIC_CACHE_WINDOW_S = float(os.getenv("TOPIC_CACHE_WINDOW_S", 1800))
+TOPIC_CACHE_REFRESH = env_flag("TOPIC_CACHE_REFRESH")
+TOPIC_CACHE_PERMUTATIONS = int(os.getenv("TOPIC_CACHE_PERMUTATIONS", 128))
+
+# Words that say when, not what
+FILLER_WORDS = frozenset(
+    "latest today todays recent recently current currently new newest now this week weekly daily update updates "
+    "a an the of on in for about and what whats".split()
+)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def topic_words(topic):
+    """Content words of a topic, order ignored: 'Latest AI chips news' -> ['ai', 'chip', 'news']."""
+    words = re.sub(r"[^\w\s]", " ", str(topic).lower()).split()
+    content = [w for w in words if w not in FILLER_WORDS] or words  # a topic of only filler words is its own topic
+    return sorted({w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith(("ss", "us", "is", "ws")) else w for w in content})
+
+
+def shingles(topic):
+    """Words plus their character 3-grams, so 'semiconductor' and 'semiconductors' still overlap."""
+    words = topic_words(topic)
+    grams = {f"#{w}#"[i:i + 3] for w in words for i in range(len(w))}
+    return set(words) | grams
+
+
+@lru_cache(maxsize=1)
+def _permutations(count):
+    # a*x + b mod p hash functions with fixed seeds, so signatures are stable across processes
+    params = []
+    for i in range(count):
+        digest = hashlib.sha256(f"topic-minhash-{i}".encode()).digest()
+        a, b = struct.unpack("<QQ", digest[:16])
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return params
+
+
+@lru_cache(maxsize=4096)
+def signature(topic, permutations=TOPIC_CACHE_PERMUTATIONS):
+    """MinHash signature (tuple of ints) of the topic's shingles."""
+    hashes = [struct.unpack("<Q", hashlib.blake2b(s.encode(), digest_size=8).digest())[0] for s in shingles(topic)]
+    if not hashes:
+        return tuple([0] * permutations)
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _permutations(permutations))
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures (or topics)."""
+    first = signature(first) if isinstance(first, str) else first
+    second = signature(second) if isinstance(second, str) else second
+    if len(first) != len(second) or not first:
+        return 0.0
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+class TopicCache:
+    """Finished newsletters (shared task outputs) by topic signature, looked up by similarity."""
+
+    def __init__(self, path=TOPIC_CACHE_PATH, threshold=TOPIC_CACHE_THRESHOLD, window=TOPIC_CACHE_WINDOW_S,
+                 refresh=TOPIC_CACHE_REFRESH):
+        self.path = path
+        self.threshold = threshold
+        self.window = window
+        self.refresh = refresh
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"lookups": 0, "reused": 0, "refreshed": 0, "misses": 0, "near_misses": 0, "stored": 0,
+                       "similarity_sum": 0.0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS newsletters ("
+            " run_id TEXT PRIMARY KEY, topic TEXT NOT NULL, signature TEXT NOT NULL, research_mode TEXT NOT NULL,"
+            " compaction INTEGER NOT NULL, outputs TEXT NOT NULL, researched_at REAL NOT NULL, finished_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        return thread_connection(self._local, self.path)
+
+    def _count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def candidates(self, topic, research_mode=None, compaction=None, max_age=None):
+        """[(similarity, row dict)] of stored newsletters, most similar (then newest) first."""
+        query, args = "SELECT run_id, topic, signature, research_mode, compaction, outputs, researched_at, finished_at FROM newsletters WHERE researched_at >= ?", [
+            time.time() - max_age if max_age is not None else 0]
+        if research_mode is not None:
+            query += " AND research_mode = ?"
+            args.append(research_mode)
+        if compaction is not None:
+            query += " AND compaction = ?"
+            args.append(int(bool(compaction)))
+        wanted = signature(topic)
+        ranked = []
+        for run_id, stored_topic, sig, mode, compact, outputs, researched_at, finished_at in self._connect().execute(query, args):
+            ranked.append((similarity(wanted, tuple(json.loads(sig))), {
+                "run_id": run_id, "topic": stored_topic, "research_mode": mode, "compaction": bool(compact),
+                "outputs": outputs, "researched_at": researched_at, "finished_at": finished_at,
+            }))
+        ranked.sort(key=lambda item: (-item[0], -item[1]["finished_at"]))
+        return ranked
+
+    def lookup(self, topic, research_mode, compaction):
+        """
+        Returns the best near-duplicate newsletter as a dict with 'action' ('reuse'
+        or 'refresh'), 'similarity', 'age_s', 'run_id', 'topic' and 'outputs', or None.
+        """
+        from research_memory import max_age_for
+        freshness = max_age_for(topic)
+        now = time.time()
+        ranked = self.candidates(topic, research_mode, compaction, max_age=freshness)
+        self._count("lookups")
+        best = ranked[0] if ranked else None
+        if best is None or best[0] < self.threshold:
+            self._count("misses")
+            if best is not None and best[0] >= self.threshold - 0.2:
+                self._count("near_misses")  # close enough to show up when tuning the threshold
+            return None
+        score, entry = best
+        age = now - entry["finished_at"]
+        if age <= min(self.window, freshness):
+            action = "reuse"
+        elif self.refresh:
+            action = "refresh"
+        else:
+            self._count("misses")
+            return None
+        self._count("reused" if action == "reuse" else "refreshed")
+        self._count("similarity_sum", score)
+        return dict(entry, outputs=json.loads(entry["outputs"]), action=action, similarity=round(score, 3), age_s=round(age, 1))
+
+    def remember(self, run_id, topic, outputs, research_mode, compaction, researched_at=None):
+        """Stores a finished run's shared task outputs (research, compaction, article)."""
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO newsletters (run_id, topic, signature, research_mode, compaction, outputs, researched_at, finished_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, topic, json.dumps(signature(topic)), research_mode, int(bool(compaction)), json.dumps(outputs),
+             researched_at or now, now),
+        )
+        self._count("stored")
+        self.prune()
+
+    def prune(self, max_age=None):
+        """Deletes newsletters whose research is older than `max_age` (default: the longest freshness limit)."""
+        if max_age is None:
+            from research_memory import RESEARCH_MEMORY_MAX_AGE_H, RESEARCH_MEMORY_FRESHNESS, parse_freshness
+            max_age = max([RESEARCH_MEMORY_MAX_AGE_H] + list(parse_freshness(RESEARCH_MEMORY_FRESHNESS).values())) * 60 * 60
+        return self._connect().execute("DELETE FROM newsletters WHERE researched_at < ?", (time.time() - max_age,)).rowcount
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        hits = stats["reused"] + stats["refreshed"]
+        similarity_sum = stats.pop("similarity_sum")
+        stats.update(
+            newsletters=self._connect().execute("SELECT COUNT(*) FROM newsletters").fetchone()[0],
+            hit_rate=round(hits / stats["lookups"], 3) if stats["lookups"] else 0.0,
+            mean_hit_similarity=round(similarity_sum / hits, 3) if hits else None,
+        )
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_topic_cache(force=False):
+    """Process-wide topic cache, or None when TOPIC_CACHE=off (unless `force`, e.g. run_newsletter(topic_cache=True))."""
+    global _cache
+    if not (TOPIC_CACHE_ENABLED or force):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TopicCache()
+    return _cache
+
+
+def topic_cache_stats():
+    stats = _cache.stats() if _cache is not None else {}
+    return dict(stats, enabled=TOPIC_CACHE_ENABLED, threshold=TOPIC_CACHE_THRESHOLD, window_s=TOPIC_CACHE_WINDOW_S)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the near-duplicate topic cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    match_parser = commands.add_parser("match", help="Stored newsletters most similar to a topic")
+    match_parser.add_argument("topic")
+    match_parser.add_argument("--limit", type=int, default=5)
+    compare_parser = commands.add_parser("compare", help="Similarity of two topics")
+    compare_parser.add_argument("first")
+    compare_parser.add_argument("second")
+    commands.add_parser("prune", help="Drop newsletters past every freshness limit")
+    commands.add_parser("stats", help="Number of stored newsletters")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        print(f"{similarity(args.first, args.second):.3f} (threshold {TOPIC_CACHE_THRESHOLD})")
+        return 0
+    cache = TopicCache()
+    if args.command == "match":
+        now = time.time()
+        for score, entry in cache.candidates(args.topic)[:args.limit]:
+            print(f"{score:.3f}  {entry['topic']!r}  run {entry['run_id']}  {entry['research_mode']}"
+                  f"  written {(now - entry['finished_at']) / 60:.0f} min ago")
+    elif args.command == "prune":
+        print(f"Deleted {cache.prune()} newsletters")
+    else:
+        print(json.dumps(cache.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from common import env_flag, get_ist_timestamp_str
+
+# --- Run tracing ---
+# TRACING=on records a span for every task, agent LLM call and tool invocation
+# of a run: wall time, token counts, retries and bytes written. Each run writes
+# one JSON trace to outputs/ and prints a summary table. The active trace and
+# span live in context variables, so concurrent runs (batch workers) keep
+# separate traces; thread pools that work for a run must copy the context
+# (see run_in_context). With tracing off, span() returns a shared no-op object.
+
+# Counters summed per span name in the summary table
+SUMMED_COUNTERS = ("prompt_tokens", "completion_tokens", "retries", "bytes_written", "bytes_sent", "throttled_s")
+
+
+def is_enabled():
+    return env_flag("TRACING", "off")
+
+
+_current_trace = contextvars.ContextVar("newsletter_trace", default=None)
+_current_span = contextvars.ContextVar("newsletter_span", default=None)
+
+
+class _NullSpan:
+    """Stand-in returned when no trace is active; every method is a no-op."""
+    id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, counter, amount=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, trace, name, kind, parent, attrs):
+        self.trace = trace
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.attrs = dict(attrs)
+        self.counters = {}
+        self.status = "ok"
+        self.started = None
+        self.seconds = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, counter, amount=1):
+        """Adds to a numeric counter such as 'retries' or 'bytes_written' (safe from several threads)."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.status = "error"
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.trace.record(self)
+        return False
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "kind": self.kind,
+            "thread": threading.current_thread().name,
+            "start_s": round(self.started - self.trace.started, 6),
+            "seconds": round(self.seconds, 6),
+            "status": self.status,
+            **self.counters,
+            **self.attrs,
+        }
+
+
+class Trace:
+    """Spans of one newsletter run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = get_ist_timestamp_str("%Y-%m-%d %H:%M:%S")
+        self.spans = []
+        self.path = None  # set once the trace is written
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        span_dict = span.to_dict()
+        with self._lock:
+            self.spans.append(span_dict)
+
+    def summary(self):
+        """Per (kind, name): count, total and max seconds, errors and summed counters."""
+        rows = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault((span["kind"], span["name"]), {
+                "kind": span["kind"], "name": span["name"], "count": 0, "total_s": 0.0, "max_s": 0.0, "errors": 0,
+            })
+            row["count"] += 1
+            row["total_s"] += span["seconds"]
+            row["max_s"] = max(row["max_s"], span["seconds"])
+            row["errors"] += span["status"] == "error"
+            for counter in SUMMED_COUNTERS:
+                if counter in span:
+                    row[counter] = row.get(counter, 0) + span[counter]
+        return sorted(rows.values(), key=lambda r: r["total_s"], reverse=True)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_s"])
+        return {
+            "trace": self.name,
+            "started_at": self.started_at,
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "spans": spans,
+            "summary": self.summary(),
+        }
+
+    def write(self, output_dir="outputs"):
+        """Writes the trace as JSON to `output_dir/trace_<name>.json` and returns the path."""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"trace_{self.name}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+        return path
+
+
+def format_summary(trace):
+    """Summary table of a trace as printable text."""
+    lines = [f"{'kind':<6} {'name':<28} {'count':>5} {'total s':>9} {'max s':>8} {'tokens in/out':>15} {'bytes':>10} {'retries':>7}"]
+    for row in trace.summary():
+        tokens = f"{row.get('prompt_tokens', 0)}/{row.get('completion_tokens', 0)}" if row["kind"] == "llm" else ""
+        written = row.get("bytes_written", 0) + row.get("bytes_sent", 0)
+        lines.append(
+            f"{row['kind']:<6} {row['name'][:28]:<28} {row['count']:>5} {row['total_s']:>9.3f} {row['max_s']:>8.3f} "
+            f"{tokens:>15} {written or '':>10} {row.get('retries', 0) or '':>7}"
+        )
+    return "\n".join(lines)
+
+
+@contextmanager
+def start_trace(name, output_dir="outputs", enabled=None):
+    """
+    Traces everything run inside the block. On exit the trace is written to
+    `output_dir` and its summary printed. Yields the Trace, or None when tracing is off.
+    """
+    if not (is_enabled() if enabled is None else enabled):
+        yield None
+        return
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.path = trace.write(output_dir)
+        print(f"\n[{get_ist_timestamp_str()}] Trace written to {trace.path}\n{format_summary(trace)}")
+
+
+def span(name, kind="tool", **attrs):
+    """Context manager for one span under the current one; a no-op when no trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return NULL_SPAN
+    parent = _current_span.get()
+    return Span(trace, name, kind, parent.id if parent is not None else None, attrs)
+
+
+def current_span():
+    """The innermost open span (or the no-op span), for adding counters from deep inside a call."""
+    return _current_span.get() or NULL_SPAN
+
+
+def traced(kind="tool", name=None):
+    """Decorator that runs the function inside a span named after it."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name, kind=kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run_in_context(func):
+    """Wraps `func` so that it runs in a copy of the caller's context, for handing work to thread pools."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,195 @@
+import io
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache_store import CACHE_DIR, DiskCache, make_key
+from artifacts import atomic_path
+import tracing
+
+# --- Chunked, parallel text-to-speech ---
+# The article is split on paragraph/sentence boundaries, the chunks are
+# synthesized in parallel and their MP3 frames are joined in order. Each chunk
+# is cached by content, so re-generating an edited newsletter only synthesizes
+# the paragraphs that changed. The backend is pluggable (TTS_BACKEND).
+# prewarm() synthesizes the chunks of a streamed article section ahead of the
+# audio task (see streaming.py); the audio task then waits for those chunks
+# instead of synthesizing them again.
+
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", 1200))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 4))
+TTS_RETRIES = int(os.getenv("TTS_RETRIES", 2))
+
+tts_cache = DiskCache(
+    os.path.join(CACHE_DIR, "tts.sqlite"),
+    namespace="chunks",
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", 500)) * 1024 * 1024,
+)
+
+
+# --- Backends ---
+class GTTSBackend:
+    """Google Translate text-to-speech (needs network access)."""
+    name = "gtts"
+
+    def synthesize(self, text, lang="en"):
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class NullTTSBackend:
+    """
+    Offline stand-in that returns silent MP3 frames, roughly one second per 15
+    characters, so tests and benchmarks exercise the full pipeline without gTTS.
+    """
+    name = "null"
+    # MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames of ~26 ms
+    SILENT_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+    def synthesize(self, text, lang="en"):
+        frames = max(1, len(text) * 38 // 15)
+        return self.SILENT_FRAME * frames
+
+
+TTS_BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    NullTTSBackend.name: NullTTSBackend,
+}
+
+def register_tts_backend(backend_class):
+    """Makes a backend class (with `name` and `synthesize(text, lang)`) selectable through TTS_BACKEND."""
+    TTS_BACKENDS[backend_class.name] = backend_class
+
+def get_tts_backend(name=None):
+    name = (name or os.getenv("TTS_BACKEND", GTTSBackend.name)).strip().lower()
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS_BACKEND '{name}'. Available: {', '.join(sorted(TTS_BACKENDS))}")
+    return TTS_BACKENDS[name]()
+
+
+# --- Text splitting ---
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def split_text(text, max_chars=TTS_CHUNK_CHARS):
+    """Splits text into chunks of at most max_chars, preferring paragraph, then sentence, then word boundaries."""
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            chunks.append(paragraph)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def _strip_id3(data):
+    # Only the first chunk may keep its ID3v2 tag; later ones would land mid-stream
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return data[10 + size:]
+    return data
+
+
+# Chunk key -> Future of a chunk being synthesized by prewarm()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _chunk_key(backend, text, lang):
+    return make_key("tts-chunk-v1", backend.name, lang, text)
+
+
+def _synthesize_chunk(backend, text, lang, wait_inflight=True):
+    key = _chunk_key(backend, text, lang)
+    with tracing.span("tts_chunk", kind="step", backend=backend.name, chars=len(text)) as span:
+        with _inflight_lock:
+            pending = _inflight.get(key) if wait_inflight else None
+        if pending is not None:
+            try:
+                audio, _ = pending.result()
+                span.set(cache="prewarmed")
+                return audio, True
+            except Exception:
+                pass  # synthesize it here
+        cached = tts_cache.get_bytes(key)
+        if cached is not None:
+            span.set(cache="hit")
+            return cached, True
+        span.set(cache="miss")
+        for attempt in range(TTS_RETRIES + 1):
+            try:
+                audio = backend.synthesize(text, lang)
+                break
+            except Exception:
+                if attempt >= TTS_RETRIES:
+                    raise
+                span.add("retries")
+                time.sleep(0.5 * 2 ** attempt)  # transient failures only cost this chunk a retry
+        tts_cache.set_bytes(key, audio)
+        return audio, False
+
+
+def prewarm(text, executor, backend=None, lang="en"):
+    """
+    Starts synthesizing the chunks of `text` into the chunk cache on `executor`, so a
+    later synthesize_to_file() of a text made of such pieces finds them ready.
+    `text` must end at a paragraph boundary. Returns the number of chunks started.
+    """
+    backend = backend or get_tts_backend()
+    started = 0
+    for chunk in split_text(text):
+        key = _chunk_key(backend, chunk, lang)
+        with _inflight_lock:
+            if key in _inflight:
+                continue
+            future = executor.submit(tracing.run_in_context(_synthesize_chunk), backend, chunk, lang, False)
+            _inflight[key] = future
+        future.add_done_callback(lambda f, key=key: _forget_inflight(key, f))
+        started += 1
+    return started
+
+def _forget_inflight(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def synthesize_to_file(text, filepath, backend=None, lang="en", workers=None):
+    """
+    Synthesizes `text` into the MP3 file `filepath`.
+    Returns a dict with the number of chunks and how many came from the cache.
+    """
+    backend = backend or get_tts_backend()
+    chunks = split_text(text)
+    if not chunks:
+        raise ValueError("No text to synthesize")
+    workers = max(1, min(workers or TTS_WORKERS, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as executor:
+        synthesize = tracing.run_in_context(lambda chunk: _synthesize_chunk(backend, chunk, lang))
+        results = list(executor.map(synthesize, chunks))
+
+    with atomic_path(filepath) as tmp_path, open(tmp_path, "wb") as file:
+        for index, (audio, _) in enumerate(results):
+            file.write(audio if index == 0 else _strip_id3(audio))
+    cached = sum(1 for _, hit in results if hit)
+    return {"chunks": len(chunks), "cached": cached, "synthesized": len(chunks) - cached, "backend": backend.name}